@@ -0,0 +1,451 @@
+"""
+Planning pipeline benchmark.
+
+    python benchmark.py                         # quick suite, direct + HTTP
+    python benchmark.py --suite full --save bench_baseline.json
+    python benchmark.py --compare bench_baseline.json
+    python benchmark.py --traffic 1000000       # flow classifier throughput
+    python benchmark.py --simulate 10000        # resilience scenarios per second
+    python benchmark.py --startup --repeat 5    # cold start of main.py and index.py
+
+Workloads are synthetic PlanningRequests, generated from a fixed seed, for
+every TECH_MATRIX terrain plus the DEFAULT_TECH fallback. Direct mode calls
+generate_grid / optimize_network / analyze_critical_links / build_plan
+in-process. HTTP mode posts to /calculate-plan through FastAPI's TestClient
+(needs httpx) with the plan cache cleared and PLANNER on its thread fallback,
+so no network or worker processes are involved.
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import numpy as np
+
+import connectivity
+import distance
+import grid
+import main
+import partition
+import placement
+import planning
+import simulate
+import spatial
+import topology
+import traffic
+import weather
+from planning import PlanningRequest, Point, TECH_MATRIX
+
+# --- BENCH CONFIG ---
+TERRAINS = list(TECH_MATRIX) + ["default", "mixed"]  # "default" plans with DEFAULT_TECH; "mixed" cycles TECH_MATRIX per polygon
+BASE_LAT, BASE_LNG = 30.3, 78.0              # Uttarakhand, where the demo regions live
+REGRESSION_TOLERANCE = 0.25                  # Allowed slowdown / growth before --compare fails
+NOISE_FLOOR = {"wall_sec": 0.005, "peak_mb": 0.5}  # Absolute changes below this never count as regressions
+
+# (polygons, vertices per polygon, polygon radius km, critical nodes)
+SUITES = {
+    "quick": {
+        "small": (1, 6, 2.0, 2),
+        "multi": (4, 8, 1.5, 4),
+    },
+    "full": {
+        "small": (1, 6, 2.0, 2),
+        "multi": (4, 8, 1.5, 4),
+        "jagged": (2, 64, 3.0, 4),
+        "wide": (1, 12, 12.0, 8),
+        "many": (16, 10, 1.0, 16),
+    },
+}
+
+
+# --- SYNTHETIC REGIONS ---
+def star_polygon(rng, lat, lng, radius_km, n_vertices):
+    """Simple polygon: vertices at sorted angles around (lat, lng), radii jittered 60-100%."""
+    angles = sorted(rng.uniform(0, 2 * math.pi) for _ in range(n_vertices))
+    k_lng = spatial.KM_PER_DEG * math.cos(math.radians(lat))
+    return [
+        Point(lat=lat + r * math.sin(a) / spatial.KM_PER_DEG, lng=lng + r * math.cos(a) / k_lng)
+        for a, r in ((a, radius_km * rng.uniform(0.6, 1.0)) for a in angles)
+    ]
+
+
+def synthetic_request(terrain, n_polygons, n_vertices, radius_km, n_critical, seed=0, algorithm="greedy"):
+    """
+    Polygons on a jittered row-major layout spaced 3 radii apart, critical
+    nodes scattered within 80% of the radius of a random polygon centre.
+    Terrain "mixed" tags the polygons with the TECH_MATRIX terrains in turn.
+    """
+    rng = random.Random(f"{seed}:{terrain}:{n_polygons}:{n_vertices}:{radius_km}:{n_critical}")
+    cols = max(1, math.ceil(math.sqrt(n_polygons)))
+    spacing = 3 * radius_km / spatial.KM_PER_DEG
+    centres = []
+    for i in range(n_polygons):
+        r, c = divmod(i, cols)
+        centres.append((BASE_LAT + r * spacing + rng.uniform(-0.1, 0.1) * spacing,
+                        BASE_LNG + c * spacing + rng.uniform(-0.1, 0.1) * spacing))
+    polygons = [star_polygon(rng, lat, lng, radius_km, n_vertices) for lat, lng in centres]
+
+    critical = []
+    for _ in range(n_critical):
+        lat, lng = rng.choice(centres)
+        a, r = rng.uniform(0, 2 * math.pi), radius_km * 0.8 * math.sqrt(rng.random())
+        critical.append(Point(lat=lat + r * math.sin(a) / spatial.KM_PER_DEG,
+                              lng=lng + r * math.cos(a) / (spatial.KM_PER_DEG * math.cos(math.radians(lat)))))
+    if terrain == "mixed":
+        tags = [list(TECH_MATRIX)[i % len(TECH_MATRIX)] for i in range(n_polygons)]
+        return PlanningRequest(polygons=polygons, critical_nodes=critical, terrain_type=tags[0], polygon_terrains=tags,
+                               algorithm=algorithm, seed=seed)
+    return PlanningRequest(polygons=polygons, critical_nodes=critical, terrain_type=terrain, algorithm=algorithm, seed=seed)
+
+
+def workloads(suite, seed=0, algorithm="greedy"):
+    for name, shape in SUITES[suite].items():
+        for terrain in TERRAINS:
+            yield f"{name}/{terrain}", synthetic_request(terrain, *shape, seed=seed, algorithm=algorithm)
+
+
+# --- HAVERSINE COUNTER ---
+class HaversineCounter:
+    """Counts distance kernel calls and the point pairs they evaluate."""
+    def __init__(self):
+        self.calls = 0
+        self.pairs = 0
+
+    def wrap(self, fn, pairs):
+        def counted(*args, **kwargs):
+            self.calls += 1
+            self.pairs += pairs(*args)
+            return fn(*args, **kwargs)
+        return counted
+
+    def snapshot(self):
+        return {"haversine_calls": self.calls, "haversine_pairs": self.pairs}
+
+
+KERNELS = {
+    "haversine_km": lambda lat, lng, lats, *rest: int(np.size(lats)),
+    "within_km": lambda lat, lng, lats, *rest: int(np.size(lats)),
+    "haversine_pairwise": lambda a, b, c, *rest: int(np.size(a)) * int(np.size(c)),
+    "within_pairwise": lambda a, b, c, *rest: int(np.size(a)) * int(np.size(c)),
+}
+
+
+@contextmanager
+def count_haversine():
+    """Patch every module-level reference to the distance kernels for the duration."""
+    counter = HaversineCounter()
+    wrapped = {name: counter.wrap(getattr(distance, name), pairs) for name, pairs in KERNELS.items()}
+    patches = [(mod, name, wrapped[name])
+               for mod in (distance, spatial, grid, partition, placement, connectivity, topology, planning)
+               for name in KERNELS if hasattr(mod, name)]
+    saved = [(mod, name, getattr(mod, name)) for mod, name, _ in patches]
+    for mod, name, fn in patches:
+        setattr(mod, name, fn)
+    try:
+        yield counter
+    finally:
+        for mod, name, fn in saved:
+            setattr(mod, name, fn)
+
+
+@contextmanager
+def measure(out, stage):
+    """Record wall time and peak traced memory of one stage into out[stage]."""
+    tracemalloc.reset_peak()
+    start = time.perf_counter()
+    yield
+    wall = time.perf_counter() - start
+    out[stage] = {"wall_sec": round(wall, 4), "peak_mb": round(tracemalloc.get_traced_memory()[1] / 2**20, 2)}
+
+
+# --- RUNNERS ---
+def run_direct(data):
+    stages = {}
+    with count_haversine() as counter:
+        with measure(stages, "generate_grid"):
+            nodes = planning.generate_grid(data.polygons, data.critical_nodes, data.terrain_type, data.grid, data.polygon_terrains)
+        n_nodes = len(nodes)
+        with measure(stages, "optimize_network"):
+            towers, _, nodes = planning.optimize_network(nodes, data.polygons, data.terrain_type, data.algorithm, data.seed,
+                                                     terrains=data.polygon_terrains)
+        with measure(stages, "analyze_critical_links"):
+            planning.analyze_critical_links(nodes, towers)
+        with measure(stages, "build_plan"):
+            plan = planning.build_plan(data)
+    return {"stages": stages, "nodes": n_nodes, "towers": plan["kpis"]["total_towers"], **counter.snapshot()}
+
+
+def run_http(client, data):
+    stages = {}
+    planning.PLAN_CACHE.clear()
+    body = data.model_dump() if hasattr(data, "model_dump") else data.dict()
+    with count_haversine() as counter:
+        with measure(stages, "calculate_plan"):
+            response = client.post("/calculate-plan", json=body)
+    response.raise_for_status()
+    return {"stages": stages, "towers": response.json()["kpis"]["total_towers"], **counter.snapshot()}
+
+
+def http_client():
+    try:
+        from fastapi.testclient import TestClient
+    except ImportError:   # TestClient needs httpx, which is not a deploy dependency
+        return None
+    # Thread mode keeps plan builds in this process, where the counters are installed
+    planning.PLANNER.shutdown()
+    planning.PLANNER.workers = 0
+    return TestClient(main.app)
+
+
+def run_suite(suite, modes, seed=0, algorithm="greedy", repeat=1):
+    client = http_client() if "http" in modes else None
+    results = {}
+    tracemalloc.start()
+    try:
+        for name, data in workloads(suite, seed, algorithm):
+            entry = {}
+            for _ in range(repeat):
+                runs = {}
+                if "direct" in modes:
+                    runs["direct"] = run_direct(data)
+                if client is not None:
+                    runs["http"] = run_http(client, data)
+                entry = best_of(entry, runs)
+            results[name] = entry
+            print(format_row(name, entry), flush=True)
+    finally:
+        tracemalloc.stop()
+        planning.PLANNER.shutdown()
+    return {
+        "meta": {
+            "suite": suite, "seed": seed, "algorithm": algorithm, "repeat": repeat,
+            "python": platform.python_version(), "numpy": np.__version__, "machine": platform.machine(),
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+
+
+def best_of(prev, runs):
+    """Keep the fastest wall time per stage across repeats; counts are deterministic."""
+    if not prev:
+        return runs
+    for mode, run in runs.items():
+        for stage, m in run["stages"].items():
+            old = prev[mode]["stages"][stage]
+            if m["wall_sec"] < old["wall_sec"]:
+                prev[mode]["stages"][stage] = m
+    return prev
+
+
+def format_row(name, entry):
+    parts = [f"{name:<18}"]
+    if "direct" in entry:
+        d = entry["direct"]
+        parts.append(f"plan {d['stages']['build_plan']['wall_sec']:>8.3f}s  grid {d['stages']['generate_grid']['wall_sec']:>7.3f}s"
+                     f"  nodes {d['nodes']:>7}  towers {d['towers']:>4}  hav {d['haversine_calls']:>6}"
+                     f"  peak {d['stages']['build_plan']['peak_mb']:>7.1f}MB")
+    if "http" in entry:
+        parts.append(f"http {entry['http']['stages']['calculate_plan']['wall_sec']:>8.3f}s")
+    return "  ".join(parts)
+
+
+# --- BASELINES ---
+def compare(current, baseline, tolerance=REGRESSION_TOLERANCE):
+    """
+    Print current vs baseline per workload, stage and counter.
+    Returns the list of regressions: wall time, peak memory or a counter grown by more
+    than `tolerance` (and, for time and memory, by more than NOISE_FLOOR).
+    """
+    regressions = []
+    for name, entry in current["results"].items():
+        base_entry = baseline["results"].get(name)
+        if base_entry is None:
+            print(f"{name:<18}  (no baseline)")
+            continue
+        for mode, run in entry.items():
+            base = base_entry.get(mode)
+            if base is None:
+                continue
+            checks = [(f"{stage}.{k}", k, m[k], base["stages"][stage][k])
+                      for stage, m in run["stages"].items() if stage in base["stages"]
+                      for k in ("wall_sec", "peak_mb")]
+            checks += [(k, k, run[k], base[k]) for k in ("nodes", "towers", "haversine_calls", "haversine_pairs") if k in run and k in base]
+            for metric, kind, now, then in checks:
+                ratio = now / then if then else (1.0 if not now else float("inf"))
+                flag = ""
+                if ratio > 1 + tolerance and now - then > NOISE_FLOOR.get(kind, 0):
+                    flag = "  REGRESSION"
+                    regressions.append((name, mode, metric, then, now))
+                print(f"{name:<18}  {mode:<6}  {metric:<36}  {then:>12}  ->  {now:>12}  x{ratio:.2f}{flag}")
+    return regressions
+
+
+# --- TRAFFIC CLASSIFIER ---
+def synthetic_log(n_lines, n_hosts=20000, listed_share=0.3, seed=0):
+    """
+    Relay log lines `<ts> <client> sni=<host> bytes=<n>`. `listed_share` of the
+    flows go to subdomains of EMERGENCY_SERVICES / APP_DOMAINS entries, the
+    rest to a pool of `n_hosts` unlisted hosts.
+    """
+    rng = random.Random(seed)
+    listed = [d for ds in planning.EMERGENCY_SERVICES.values() for d in ds] + [d for ds in traffic.APP_DOMAINS.values() for d in ds]
+    listed = [f"{p}.{d}" for d in listed for p in ("www", "api", "cdn1", "edge.r3")] + listed
+    other = [f"h{i}.site{i % 997}.{rng.choice(['com', 'in', 'net', 'org'])}" for i in range(n_hosts)]
+    return [
+        f"1700000000.{i} 10.0.{i % 250}.{i % 199} sni={rng.choice(listed) if rng.random() < listed_share else rng.choice(other)} bytes={rng.randint(100, 100000)}"
+        .encode()
+        for i in range(n_lines)
+    ]
+
+
+def run_traffic(n_lines, seed=0):
+    """Classifications per second: the log-stream path, the host cache, and the bare trie walk."""
+    lines = synthetic_log(n_lines, seed=seed)
+    hosts = [traffic.log_host(l.decode()) for l in lines]
+    policies = traffic.TrafficPolicies(planning.EMERGENCY_SERVICES)
+    results = {}
+    for label, net_policy in (("sos", weather.SOS_POLICIES["Flash Flood Warning"]), ("standard", weather.STANDARD_POLICY)):
+        policy = policies.get(net_policy)
+        start = time.perf_counter()
+        tally = traffic.FlowTally()
+        traffic.classify_lines(policy, lines, tally)
+        t_stream = time.perf_counter() - start
+        start = time.perf_counter()
+        for h in hosts:
+            policy.classify(h)
+        t_cached = time.perf_counter() - start
+        match = policy.matcher.match
+        start = time.perf_counter()
+        for h in hosts:
+            match(h)
+        t_trie = time.perf_counter() - start
+        results[label] = {"log_lines_per_sec": n_lines / t_stream, "cached_per_sec": n_lines / t_cached,
+                          "trie_per_sec": n_lines / t_trie, "by_class": tally.by_class}
+        print(f"traffic/{label:<9} log {n_lines / t_stream:>12,.0f}/s  cached {n_lines / t_cached:>12,.0f}/s  "
+              f"trie {n_lines / t_trie:>12,.0f}/s  {tally.by_class}")
+    return results
+
+
+# --- RESILIENCE SIMULATION ---
+def run_simulation(runs, seed=0):
+    """Scenarios per second of the disaster simulator (one process) against each terrain's medium plan."""
+    results = {}
+    for terrain in TERRAINS:
+        data = synthetic_request(terrain, 8, 12, 6.0, 6, seed)
+        towers = planning.build_plan(data, seed)["towers"]
+        critical = [(c.lat, c.lng) for c in data.critical_nodes]
+        start = time.perf_counter()
+        out = simulate.simulate_batches(towers, critical, seed, simulate.plan_batches(runs, 1)[0], runs,
+                                        simulate.DISASTER_TYPES, planning.DRONE_CONFIG["max_per_tower"])
+        wall = time.perf_counter() - start
+        drones = out["relays"] + out["dispatched"]
+        results[terrain] = {"towers": len(towers), "wall_sec": round(wall, 3), "runs_per_sec": round(runs / wall),
+                            "mean_drones": round(float(drones.mean()), 3)}
+        print(f"simulate/{terrain:<9} towers {len(towers):>4}  {wall:>7.2f}s  {runs / wall:>9,.0f} runs/s  "
+              f"mean drones {drones.mean():.2f}")
+    return results
+
+
+# --- COLD START ---
+# Runs in a fresh interpreter per sample: import an entry point, then time its
+# first light request and its first plan (PLANNER as configured, so process
+# mode includes starting the workers).
+STARTUP_PROBE = r"""
+import json, sys, time
+start = time.perf_counter()
+entry = __import__(sys.argv[1])
+imported = time.perf_counter() - start
+loaded = {m for m in ("numpy", "fastapi", "msgpack", "brotli", "multiprocessing") if m in sys.modules}
+from fastapi.testclient import TestClient
+client = TestClient(entry.app)
+start = time.perf_counter()
+client.get("/planner/stats").raise_for_status()
+first_request = time.perf_counter() - start
+start = time.perf_counter()
+client.post("/calculate-plan", json=json.loads(sys.stdin.read())).raise_for_status()
+first_plan = time.perf_counter() - start
+entry.PLANNER.shutdown()
+print(json.dumps({"import_sec": imported, "first_request_sec": first_request, "first_plan_sec": first_plan,
+                  "loaded_at_import": sorted(loaded)}))
+"""
+STARTUP_ENTRIES = ("index", "main")   # Serverless (vercel.json) and uvicorn entry points
+
+
+def run_startup(repeat=3, seed=0):
+    """Median cold-start timings per entry point over `repeat` fresh interpreters."""
+    import statistics
+    import subprocess
+    data = synthetic_request("valley", 1, 8, 2.0, 1, seed)
+    body = json.dumps(data.model_dump())
+    here = os.path.dirname(os.path.abspath(__file__))
+    results = {}
+    for entry in STARTUP_ENTRIES:
+        samples = []
+        for _ in range(max(1, repeat)):
+            out = subprocess.run([sys.executable, "-c", STARTUP_PROBE, entry], input=body, capture_output=True,
+                                 text=True, cwd=here, check=True)
+            samples.append(json.loads(out.stdout.strip().splitlines()[-1]))
+        row = {key: round(statistics.median(s[key] for s in samples), 4)
+               for key in ("import_sec", "first_request_sec", "first_plan_sec")}
+        row["loaded_at_import"] = samples[0]["loaded_at_import"]
+        results[entry] = row
+        print(f"startup/{entry:<6} import {row['import_sec']:>7.3f}s  first request {row['first_request_sec']:>7.3f}s  "
+              f"first plan {row['first_plan_sec']:>7.3f}s  loaded {', '.join(row['loaded_at_import'])}")
+    return results
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the VyomSetu planning pipeline.")
+    parser.add_argument("--suite", choices=sorted(SUITES), default="quick")
+    parser.add_argument("--mode", choices=["direct", "http", "both"], default="both")
+    parser.add_argument("--algorithm", choices=placement.ALGORITHMS, default="greedy")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per workload; the fastest is kept")
+    parser.add_argument("--save", metavar="PATH", help="Write results as a JSON baseline")
+    parser.add_argument("--compare", metavar="PATH", help="Compare against a saved baseline; exit 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=REGRESSION_TOLERANCE)
+    parser.add_argument("--traffic", type=int, metavar="LINES", help="Benchmark the flow classifier on LINES log lines instead")
+    parser.add_argument("--simulate", type=int, metavar="RUNS", help="Benchmark the resilience simulator on RUNS scenarios instead")
+    parser.add_argument("--startup", action="store_true", help="Time cold imports and first requests of main.py and index.py instead")
+    args = parser.parse_args(argv)
+
+    if args.startup:
+        run_startup(args.repeat, args.seed)
+        return 0
+
+    if args.simulate:
+        run_simulation(args.simulate, args.seed)
+        return 0
+
+    if args.traffic:
+        run_traffic(args.traffic, args.seed)
+        return 0
+
+    modes = ("direct", "http") if args.mode == "both" else (args.mode,)
+    current = run_suite(args.suite, modes, args.seed, args.algorithm, args.repeat)
+    if "http" in modes and not any("http" in e for e in current["results"].values()):
+        print("http mode skipped: fastapi.testclient needs httpx (pip install httpx)")
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(current, f, indent=2)
+        print(f"baseline written to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(current, baseline, args.tolerance)
+        print(f"{len(regressions)} regressions over {args.tolerance:.0%}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
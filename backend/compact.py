@@ -0,0 +1,188 @@
+import base64
+import gzip
+import json
+import math
+
+import numpy as np
+from starlette.responses import Response
+
+from distance import KM_PER_DEG
+from grid import points_in_polygon
+from spatial import SpatialIndex
+
+try:
+    import msgpack
+except ImportError:   # Optional: MessagePack bodies are only offered when it is installed
+    msgpack = None
+try:
+    import brotli
+except ImportError:   # Optional: without it, compressed responses fall back to gzip
+    brotli = None
+
+# --- COMPACT RESPONSE CONFIG ---
+COORD_DECIMALS = 6          # ~0.1m, the precision plan_cache already keys on
+RASTER_CELL_KM = 0.1        # Coverage raster cell edge, grown until the raster fits RASTER_MAX_CELLS
+RASTER_MAX_CELLS = 1 << 20  # 128 KB per bitmap
+COMPRESS_MIN_BYTES = 1024   # Smaller bodies go out uncompressed
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+MSGPACK_TYPES = ("application/msgpack", "application/x-msgpack")
+
+TOWER_TYPES = ["master_hub", "standard_tower"]
+LINK_STATUSES = ["Connected", "Offline"]
+
+
+def _round(values):
+    return [round(v, COORD_DECIMALS) for v in values]
+
+
+def compact_plan(plan):
+    """
+    Columnar form of a plan response:
+    towers as parallel arrays with tech / type as indexes into small tables,
+    links as critical-node coordinates plus the index of the tower they reach,
+    critical analysis as arrays, and one KPI block (`metrics` and
+    `terrain_breakdown` are derivable from `kpis` and `techs`).
+    """
+    towers = plan["towers"]
+    techs, tech_ix = [], {}
+    def tech_key(t):
+        return t["tech"], t["range"], t["cost"], t.get("legacy_cost")
+
+    for t in towers:
+        key = tech_key(t)
+        if key not in tech_ix:
+            tech_ix[key] = len(techs)
+            techs.append(dict(zip(("tech", "range", "cost", "legacy_cost"), key)))
+    at = {t["id"]: i for i, t in enumerate(towers)}
+
+    links = plan["links"]
+    analysis = plan["critical_analysis"]
+    out = {
+        "format": "compact",
+        "kpis": plan["kpis"],
+        "techs": techs,
+        "tower_types": TOWER_TYPES,
+        "towers": {
+            "id": [t["id"] for t in towers],
+            "lat": _round(t["lat"] for t in towers),
+            "lng": _round(t["lng"] for t in towers),
+            "type": [TOWER_TYPES.index(t["type"]) for t in towers],
+            "tech": [tech_ix[tech_key(t)] for t in towers],
+        },
+        "links": {
+            "from_lat": _round(l["from"][0] for l in links),
+            "from_lng": _round(l["from"][1] for l in links),
+            "to": [at[l["to_id"]] for l in links],
+        },
+        "link_statuses": LINK_STATUSES,
+        "critical_analysis": {
+            "name": [c["name"] for c in analysis],
+            "status": [LINK_STATUSES.index(c["status"]) for c in analysis],
+            "dist_km": [float(c["dist"][:-2]) if c["dist"].endswith("km") else None for c in analysis],
+        },
+        "logs": plan["logs"],
+    }
+    for key in ("plan_id", "timing"):
+        if key in plan:
+            out[key] = plan[key]
+    return out
+
+
+def coverage_raster(polygons, towers, cell_km=RASTER_CELL_KM, max_cells=RASTER_MAX_CELLS):
+    """
+    Regular raster over the polygons' bounding box, rows south to north and
+    columns west to east, one bit per cell centre (np.packbits order, MSB first):
+    `inside` - the centre lies in a planning polygon,
+    `covered` - it is inside and within range of a tower.
+    Uncovered area is inside & ~covered.
+    """
+    polys = [p for p in polygons if len(p) >= 3]
+    if not polys:
+        return None
+    lats = [pt.lat for p in polys for pt in p]
+    lngs = [pt.lng for p in polys for pt in p]
+    lat0, lat1, lng0, lng1 = min(lats), max(lats), min(lngs), max(lngs)
+    cos_ref = math.cos(math.radians((lat0 + lat1) / 2))
+    height_km = max((lat1 - lat0) * KM_PER_DEG, 1e-6)
+    width_km = max((lng1 - lng0) * KM_PER_DEG * cos_ref, 1e-6)
+    cell_km = max(cell_km, math.sqrt(height_km * width_km / max_cells))
+    rows, cols = math.ceil(height_km / cell_km), math.ceil(width_km / cell_km)
+    while rows * cols > max_cells:
+        cell_km *= 1.01
+        rows, cols = math.ceil(height_km / cell_km), math.ceil(width_km / cell_km)
+    dlat, dlng = cell_km / KM_PER_DEG, cell_km / (KM_PER_DEG * cos_ref)
+
+    c_lat = np.repeat(lat0 + (np.arange(rows) + 0.5) * dlat, cols)
+    c_lng = np.tile(lng0 + (np.arange(cols) + 0.5) * dlng, rows)
+    inside = np.zeros(rows * cols, dtype=bool)
+    for p in polys:
+        inside |= points_in_polygon(c_lat, c_lng, np.array([pt.lat for pt in p]), np.array([pt.lng for pt in p]))
+
+    covered = np.zeros(rows * cols, dtype=bool)
+    cells = np.flatnonzero(inside)
+    if len(cells) and towers:
+        index = SpatialIndex(c_lat[cells], c_lng[cells], max(t["range"] for t in towers))
+        for t in towers:
+            covered[cells[index.query_radius(t["lat"], t["lng"], t["range"])]] = True
+
+    return {
+        "origin": [lat0, lng0],
+        "cell_deg": [dlat, dlng],
+        "cell_km": round(cell_km, 6),
+        "rows": rows,
+        "cols": cols,
+        "inside": np.packbits(inside).tobytes(),
+        "covered": np.packbits(covered).tobytes(),
+        "inside_cells": int(inside.sum()),
+        "covered_cells": int(covered.sum()),
+    }
+
+
+def _bytes_to_b64(obj):
+    if isinstance(obj, (bytes, bytearray)):
+        return base64.b64encode(obj).decode("ascii")
+    raise TypeError(f"{type(obj).__name__} is not JSON serializable")
+
+
+def _accepted_codings(header):
+    """Content codings from an Accept-Encoding header, minus those refused with q=0."""
+    codings = set()
+    for part in (header or "").split(","):
+        name, *params = [p.strip() for p in part.split(";")]
+        q = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if name and q > 0:
+            codings.add(name.lower())
+    return codings
+
+
+def encode_response(payload, accept="", accept_encoding=""):
+    """
+    Serialize a response body by content negotiation: MessagePack when the
+    client accepts it (and msgpack is installed), compact JSON otherwise, with
+    bitmaps as raw bytes or base64 respectively. Bodies over COMPRESS_MIN_BYTES
+    are brotli- or gzip-compressed when Accept-Encoding allows.
+    """
+    if msgpack is not None and any(t in (accept or "") for t in MSGPACK_TYPES):
+        body, media_type = msgpack.packb(payload, use_bin_type=True), "application/msgpack"
+    else:
+        body = json.dumps(payload, separators=(",", ":"), ensure_ascii=False, default=_bytes_to_b64).encode()
+        media_type = "application/json"
+
+    headers = {"Vary": "Accept, Accept-Encoding"}
+    if len(body) >= COMPRESS_MIN_BYTES:
+        codings = _accepted_codings(accept_encoding)
+        if brotli is not None and "br" in codings:
+            body = brotli.compress(body, quality=BROTLI_QUALITY)
+            headers["Content-Encoding"] = "br"
+        elif "gzip" in codings or "*" in codings:
+            body = gzip.compress(body, compresslevel=GZIP_LEVEL)
+            headers["Content-Encoding"] = "gzip"
+    return Response(content=body, media_type=media_type, headers=headers)
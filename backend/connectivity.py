@@ -0,0 +1,332 @@
+import heapq
+import math
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+
+import numpy as np
+
+from distance import EARTH_RADIUS_KM
+
+# --- REPAIR CONFIG ---
+RELAY_RANGE_KM = 2.5   # Drone relay reach; one drone bridges up to 2x this of uncovered gap
+PAIR_BLOCK = 1 << 20   # Max tower pairs per distance block when searching repair links
+
+# --- INCIDENT CONFIG ---
+MAX_INCIDENTS = 1024      # Multi-failure incidents kept per worker
+INCIDENT_TTL_SEC = 3600   # An incident untouched for this long expires
+
+
+class UnionFind:
+    def __init__(self, n):
+        self.parent = list(range(n))
+
+    def find(self, i):
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+
+    def union(self, a, b):
+        ra, rb = self.find(a), self.find(b)
+        if ra == rb:
+            return False
+        self.parent[max(ra, rb)] = min(ra, rb)
+        return True
+
+
+class NetworkState:
+    """
+    Live/dead state of a Topology's towers with connected components kept current.
+    Components start from a union-find pass over the adjacency. A failure can only
+    split the failed tower's own component: BFS runs from each live neighbour in
+    lockstep, searches that meet are merged, and once a single search is still
+    growing every other (exhausted) search is a new component. The work is bounded
+    by the size of the pieces split off, not by the network.
+    """
+    def __init__(self, topo):
+        self.topo = topo
+        n = len(topo)
+        self.alive = np.ones(n, dtype=bool)
+        uf = UnionFind(n)
+        for i in range(n):
+            for j in topo.neighbors(i).tolist():
+                uf.union(i, j)
+
+        self.comp = np.array([uf.find(i) for i in range(n)], dtype=np.int64)
+        self.members = {}
+        for i, c in enumerate(self.comp.tolist()):
+            self.members.setdefault(c, set()).add(i)
+        self.hubs = {c: int(topo.is_hub[list(m)].sum()) for c, m in self.members.items()}
+        self._next_label = n
+        self.failed = []
+
+    @classmethod
+    def from_components(cls, topo, alive, comp):
+        """
+        State for a known live mask and component labels (any non-negative ints,
+        equal within a component; dead rows are ignored), skipping the union-find pass.
+        """
+        state = cls.__new__(cls)
+        state.topo = topo
+        state.alive = np.asarray(alive, dtype=bool).copy()
+        state.comp = np.where(state.alive, comp, -1).astype(np.int64)
+        state.members = {}
+        for i in np.flatnonzero(state.alive).tolist():
+            state.members.setdefault(int(state.comp[i]), set()).add(i)
+        state.hubs = {c: int(topo.is_hub[list(m)].sum()) for c, m in state.members.items()}
+        state._next_label = int(state.comp.max()) + 1 if len(state.comp) else 0
+        state.failed = np.flatnonzero(~state.alive).tolist()
+        return state
+
+    def fail(self, row):
+        """Mark tower `row` dead and split its component if needed. Returns False if already dead."""
+        if not self.alive[row]:
+            return False
+        self.alive[row] = False
+        self.failed.append(row)
+        old = int(self.comp[row])
+        self.members[old].discard(row)
+        self.hubs[old] -= int(self.topo.is_hub[row])
+        self.comp[row] = -1
+        if not self.members[old]:
+            del self.members[old]
+            del self.hubs[old]
+            return True
+
+        starts = [j for j in self.topo.neighbors(row).tolist() if self.alive[j]]
+        for piece in self._split(starts):
+            label = self._next_label
+            self._next_label += 1
+            self.members[old] -= piece
+            self.members[label] = piece
+            rows = list(piece)
+            self.comp[rows] = label
+            hubs = int(self.topo.is_hub[rows].sum())
+            self.hubs[label] = hubs
+            self.hubs[old] -= hubs
+        return True
+
+    def _split(self, starts):
+        """Lockstep BFS from `starts`; returns the node sets of every search that ran dry before the last."""
+        owner = {}
+        uf = UnionFind(len(starts))
+        seen, frontier = [], []
+        for s, j in enumerate(starts):
+            if j in owner:
+                uf.union(s, owner[j])
+                seen.append(set())
+                frontier.append(deque())
+                continue
+            owner[j] = s
+            seen.append({j})
+            frontier.append(deque([j]))
+
+        def active_roots():
+            return {uf.find(s) for s in range(len(starts)) if frontier[s]}
+
+        while len(active_roots()) > 1:
+            for s in range(len(starts)):
+                if not frontier[s]:
+                    continue
+                i = frontier[s].popleft()
+                for j in self.topo.neighbors(i).tolist():
+                    if not self.alive[j]:
+                        continue
+                    o = owner.get(j)
+                    if o is None:
+                        owner[j] = s
+                        seen[s].add(j)
+                        frontier[s].append(j)
+                    else:
+                        uf.union(o, s)
+
+        # A group with nothing left to expand has reached everything connected to it
+        survivors = active_roots()
+        groups = {}
+        for s in range(len(starts)):
+            groups.setdefault(uf.find(s), set()).update(seen[s])
+        pieces = [nodes for r, nodes in groups.items() if r not in survivors]
+        if not survivors:
+            # Every search ran dry: the largest piece keeps the old label
+            pieces.remove(max(pieces, key=len))
+        return pieces
+
+    def isolated(self):
+        """Labels of live components without a master hub."""
+        return sorted(c for c, h in self.hubs.items() if h == 0)
+
+    def repair_plan(self):
+        """
+        Cheapest set of bridges joining every hubless component to a hub.
+        Kruskal over components, with all hub components pre-joined; a bridge
+        between towers a and b costs its uncovered gap d - range_a - range_b.
+        Returns a list of (row_a, row_b, distance_km, gap_km) bridges.
+        """
+        isolated = self.isolated()
+        if not isolated or not any(h > 0 for h in self.hubs.values()):
+            return []
+        live = np.flatnonzero(self.alive)
+        src = np.array(sorted(i for c in isolated for i in self.members[c]), dtype=np.int64)
+        best = {}   # (comp_a, comp_b) -> (gap, row_a, row_b, d)
+        block = max(1, PAIR_BLOCK // max(1, len(live)))
+        topo = self.topo
+        by_comp = np.argsort(self.comp[live], kind="stable")
+        starts = np.flatnonzero(np.r_[True, np.diff(self.comp[live][by_comp]) != 0])
+        seg_len = np.diff(np.r_[starts, len(live)])
+        for s in range(0, len(src), block):
+            rows = src[s:s + block]
+            d = topo.distances(rows, live)
+            gap = d - topo.range[rows][:, None] - topo.range[live][None, :]
+            ca = self.comp[rows][:, None]
+            cb = self.comp[live][None, :]
+            gap = np.where(ca == cb, np.inf, gap)
+            # Closest tower of each other component per source row (lowest row index on a tie), then
+            # the best pair per component pair in this block: smallest gap, then lowest rows
+            seg_gap = np.minimum.reduceat(gap[:, by_comp], starts, axis=1)
+            hit = gap[:, by_comp] == np.repeat(seg_gap, seg_len, axis=1)
+            first = np.minimum.reduceat(np.where(hit, np.arange(len(live))[None, :], len(live)), starts, axis=1)
+            r, c = np.nonzero(np.isfinite(seg_gap))
+            k = by_comp[first[r, c]]
+            a, b = self.comp[rows][r], self.comp[live][k]
+            lo, hi = np.minimum(a, b), np.maximum(a, b)
+            order = np.lexsort((k, r, gap[r, k], hi, lo))
+            lo, hi = lo[order], hi[order]
+            first = order[np.r_[True, (lo[1:] != lo[:-1]) | (hi[1:] != hi[:-1])]]
+            for i in first.tolist():
+                key = (int(min(a[i], b[i])), int(max(a[i], b[i])))
+                cand = (float(gap[r[i], k[i]]), int(rows[r[i]]), int(live[k[i]]), float(d[r[i], k[i]]))
+                if key not in best or cand < best[key]:
+                    best[key] = cand
+
+        labels = sorted(self.members)
+        pos = {c: i for i, c in enumerate(labels)}
+        uf = UnionFind(len(labels) + 1)
+        root = len(labels)
+        for c in labels:
+            if self.hubs[c] > 0:
+                uf.union(pos[c], root)
+
+        bridges = []
+        for (a, b), (gap, ra, rb, d) in sorted(best.items(), key=lambda kv: kv[1]):
+            if uf.union(pos[a], pos[b]):
+                bridges.append((ra, rb, d, max(gap, 0.0)))
+        return bridges
+
+
+class IncidentStore:
+    """
+    Thread-safe LRU of multi-failure incidents: a NetworkState per random token.
+    Each incident keeps the topology it started on, so two clients on the same
+    plan never share failures and a topology evicted from TopologyStore does
+    not reset an incident in progress. Incidents idle for `ttl_sec` expire.
+    """
+    def __init__(self, max_entries=MAX_INCIDENTS, ttl_sec=INCIDENT_TTL_SEC):
+        self.max_entries = max_entries
+        self.ttl_sec = ttl_sec
+        self._entries = OrderedDict()   # token -> (NetworkState, expires_at monotonic)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def start(self, topo, token=None):
+        """New incident over `topo` (no failures yet); under `token` to restart that incident."""
+        token = token or uuid.uuid4().hex
+        state = NetworkState(topo)
+        with self._lock:
+            self._entries[token] = (state, time.monotonic() + self.ttl_sec)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return token, state
+
+    def get(self, token):
+        """The incident's state, its TTL renewed; None if unknown or expired."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            if now >= entry[1]:
+                del self._entries[token]
+                return None
+            self._entries[token] = (entry[0], now + self.ttl_sec)
+            self._entries.move_to_end(token)
+            return entry[0]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "incidents": len(self._entries),
+                "max_incidents": self.max_entries,
+                "ttl_sec": self.ttl_sec,
+            }
+
+
+def relay_positions(lat_a, lng_a, range_a, lat_b, lng_b, range_b, dist_km, relay_range=RELAY_RANGE_KM):
+    """Drone positions spread evenly over the uncovered stretch between two towers' coverage."""
+    gap = dist_km - range_a - range_b
+    if gap <= 0 or dist_km <= 0:
+        return []
+    n = math.ceil(gap / (2 * relay_range))
+    out = []
+    for k in range(n):
+        t = (range_a + gap * (k + 0.5) / n) / dist_km
+        out.append([lat_a + (lat_b - lat_a) * t, lng_a + (lng_b - lng_a) * t])
+    return out
+
+
+def assign_drones(affected, topo, capacity, dead=None):
+    """
+    Capacity-limited nearest assignment: (node, tower) pairs are taken shortest
+    first while the node is unserved and the tower has drones left. Each node
+    walks its towers nearest first through the topology's spatial index, in
+    rings that double in radius, and a heap holds every unserved node's next
+    tower, so only the towers a node gets to are ever measured. Towers flagged
+    in the `dead` mask, and affected nodes that are towers themselves, cannot
+    dispatch. Returns (tower row, km) or (None, inf) per node.
+    """
+    result = [(None, float('inf'))] * len(affected)
+    if not affected or not len(topo) or capacity <= 0:
+        return result
+    blocked = np.zeros(len(topo), dtype=bool) if dead is None else np.array(dead, dtype=bool)
+    blocked[[topo.row[n["id"]] for n in affected if n["id"] in topo.row]] = True
+    if blocked.all():
+        return result
+    max_radius = math.pi * EARTH_RADIUS_KM
+
+    def towers_by_distance(lat, lng):
+        # (km, row) nearest first, ties by row; each ring adds the towers past the last one
+        inner, radius = -1.0, topo.index.cell_km
+        while inner < max_radius:
+            idx, d = topo.index.query_radius(lat, lng, radius, return_dist=True)
+            ring = (d > inner) & ~blocked[idx]
+            idx, d = idx[ring], d[ring]
+            order = np.lexsort((idx, d))
+            yield from zip(d[order].tolist(), idx[order].tolist())
+            inner, radius = radius, min(radius * 2, max_radius)
+
+    walks = [towers_by_distance(n["lat"], n["lng"]) for n in affected]
+    heap = []
+    for i, walk in enumerate(walks):
+        pair = next(walk, None)
+        if pair is not None:
+            heap.append((pair[0], i, pair[1]))
+    heapq.heapify(heap)
+
+    load = np.zeros(len(topo), dtype=np.int64)
+    while heap:
+        d, i, k = heapq.heappop(heap)
+        if load[k] < capacity:
+            result[i] = (k, d)
+            load[k] += 1
+            continue
+        # Tower full: the node moves on to its next nearest tower
+        pair = next(walks[i], None)
+        while pair is not None and load[pair[1]] >= capacity:
+            pair = next(walks[i], None)
+        if pair is not None:
+            heapq.heappush(heap, (pair[0], i, pair[1]))
+    return result
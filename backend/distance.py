@@ -0,0 +1,107 @@
+import math
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEG = EARTH_RADIUS_KM * math.pi / 180
+
+# --- FAST PATH CONFIG ---
+FAST_PATH_MAX_KM = 5.0     # Radius checks up to this use the equirectangular test first
+FAST_PATH_MAX_LAT = 80.0   # Above this cos(lat) varies too fast across 5 km for the bound below
+
+
+def cos_lat(lats):
+    """cos(latitude) per point; pass the result as `cos_lats` to skip recomputing it per call."""
+    return np.cos(np.radians(lats))
+
+
+def _hav_a(lat, lng, lats, lngs, cos_lats):
+    """Haversine `a` term: sin^2 of half the central angle, one point to many."""
+    dlat = np.radians(lats - lat)
+    dlng = np.radians(lngs - lng)
+    if cos_lats is None:
+        cos_lats = np.cos(np.radians(lats))
+    return np.sin(dlat / 2)**2 + math.cos(math.radians(lat)) * cos_lats * np.sin(dlng / 2)**2
+
+
+def _hav_a_pairwise(lat_a, lng_a, lat_b, lng_b, cos_a, cos_b):
+    lat_a = np.asarray(lat_a)[:, None]
+    lng_a = np.asarray(lng_a)[:, None]
+    lat_b = np.asarray(lat_b)[None, :]
+    lng_b = np.asarray(lng_b)[None, :]
+    cos_a = np.cos(np.radians(lat_a)) if cos_a is None else np.asarray(cos_a)[:, None]
+    cos_b = np.cos(np.radians(lat_b)) if cos_b is None else np.asarray(cos_b)[None, :]
+    dlat = np.radians(lat_b - lat_a)
+    dlng = np.radians(lng_b - lng_a)
+    return np.sin(dlat / 2)**2 + cos_a * cos_b * np.sin(dlng / 2)**2
+
+
+def _a_limit(radius_km):
+    """Largest haversine `a` still within radius_km (d <= r  <=>  a <= sin^2(r / 2R))."""
+    return math.sin(min(radius_km / EARTH_RADIUS_KM, math.pi) / 2)**2
+
+
+def _to_km(a):
+    return EARTH_RADIUS_KM * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def haversine_km(lat, lng, lats, lngs, cos_lats=None):
+    """Haversine distance from one point to arrays of points."""
+    return _to_km(_hav_a(lat, lng, lats, lngs, cos_lats))
+
+
+def haversine_pairwise(lat_a, lng_a, lat_b, lng_b, cos_a=None, cos_b=None):
+    """Haversine distance matrix, shape (len(a), len(b))."""
+    return _to_km(_hav_a_pairwise(lat_a, lng_a, lat_b, lng_b, cos_a, cos_b))
+
+
+def haversine_rows(lat_a, lng_a, lat_b, lng_b):
+    """Haversine distance between matching rows of two point arrays."""
+    lat_a, lng_a = np.asarray(lat_a, dtype=np.float64), np.asarray(lng_a, dtype=np.float64)
+    lat_b, lng_b = np.asarray(lat_b, dtype=np.float64), np.asarray(lng_b, dtype=np.float64)
+    dlat = np.radians(lat_b - lat_a)
+    dlng = np.radians(lng_b - lng_a)
+    return _to_km(np.sin(dlat / 2)**2 + np.cos(np.radians(lat_a)) * np.cos(np.radians(lat_b)) * np.sin(dlng / 2)**2)
+
+
+def equirect_band(lat, radius_km):
+    """
+    Relative error bound of the equirectangular distance (x scaled by the query
+    point's cos(lat)) for points within about radius_km: the cos(lat) drift across
+    the radius dominates, the flat-earth term is second order.
+    """
+    span = radius_km / EARTH_RADIUS_KM
+    return 2 * span * (1 + math.tan(math.radians(min(abs(lat), 89.0)) + span)) + 1e-9
+
+
+def within_km(lat, lng, lats, lngs, radius_km, cos_lats=None):
+    """
+    Boolean mask of points within radius_km of (lat, lng); no sqrt/atan2.
+    Radii up to FAST_PATH_MAX_KM are decided by the equirectangular distance,
+    and only points inside its error band get the exact haversine test, so the
+    mask matches `haversine_km(...) <= radius_km`.
+    """
+    if radius_km < 0:
+        return np.zeros(np.shape(lats), dtype=bool)
+    cos0 = math.cos(math.radians(lat))
+    span = radius_km / KM_PER_DEG
+    if (radius_km > FAST_PATH_MAX_KM or abs(lat) > FAST_PATH_MAX_LAT
+            or 180.0 - abs(lng) <= 2 * span / cos0):
+        # Large radius, polar cap or a circle reaching the antimeridian: exact test only
+        return _hav_a(lat, lng, lats, lngs, cos_lats) <= _a_limit(radius_km)
+
+    y = lats - lat
+    x = (lngs - lng) * cos0
+    d2 = x * x + y * y
+    band = equirect_band(lat, radius_km)
+    inside = d2 <= (span * (1 - band))**2
+    unsure = (d2 <= (span * (1 + band))**2) & ~inside
+    if unsure.any():
+        c = None if cos_lats is None else cos_lats[unsure]
+        inside[unsure] = _hav_a(lat, lng, lats[unsure], lngs[unsure], c) <= _a_limit(radius_km)
+    return inside
+
+
+def within_pairwise(lat_a, lng_a, lat_b, lng_b, radius_km, cos_a=None, cos_b=None):
+    """Boolean (len(a), len(b)) matrix of pairs within radius_km; no sqrt/atan2."""
+    return _hav_a_pairwise(lat_a, lng_a, lat_b, lng_b, cos_a, cos_b) <= _a_limit(radius_km)
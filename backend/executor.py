@@ -0,0 +1,215 @@
+import asyncio
+import itertools
+import os
+import threading
+from concurrent.futures import BrokenExecutor
+
+# Same exception FastAPI handles; keeps fastapi out of worker process imports
+from starlette.exceptions import HTTPException
+
+# --- EXECUTOR CONFIG (env overridable) ---
+# PLANNER_WORKERS=0 runs jobs on a thread instead of a process pool (e.g. serverless hosts without /dev/shm)
+PLANNER_WORKERS = int(os.environ.get("PLANNER_WORKERS", min(4, os.cpu_count() or 1)))
+PLANNER_MAX_PENDING = int(os.environ.get("PLANNER_MAX_PENDING", max(1, PLANNER_WORKERS) * 4))
+PLANNER_TIMEOUT_SEC = float(os.environ.get("PLANNER_TIMEOUT_SEC", 60))
+RETRY_AFTER_SEC = 5
+PROGRESS_DRAIN_SEC = 5   # How long run_many waits for trailing worker events after its jobs return
+
+
+# --- PROGRESS RELAY ---
+# Worker processes push (token, kind, payload) onto a queue handed over at pool start;
+# a drain thread in the parent routes each message to the listener registered for its token.
+_progress_queue = None
+
+
+def _init_worker(queue):
+    global _progress_queue
+    _progress_queue = queue
+
+
+def _run_with_progress(token, fn, args, sink=None):
+    put = sink or _progress_queue.put
+
+    def report(kind, payload):
+        put((token, kind, payload))
+    try:
+        return fn(*args, progress=report)
+    finally:
+        # Results travel on a different pipe, so mark the end of this job's event stream explicitly
+        put((token, "end", None))
+
+
+class PlanningExecutor:
+    """
+    Runs CPU-bound planning jobs off the event loop.
+    At most `max_pending` jobs may be queued or running; beyond that callers get
+    a 429 so the worker stays responsive. Each job is awaited for at most `timeout`.
+    """
+    def __init__(self, workers=PLANNER_WORKERS, max_pending=PLANNER_MAX_PENDING, timeout=PLANNER_TIMEOUT_SEC):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._pool = None
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._queue = None
+        self._listeners = {}
+        self._tokens = itertools.count(1)
+
+    @property
+    def pending(self):
+        return self._pending
+
+    def _get_pool(self):
+        # Pool machinery loads with the first job, not at import (serverless cold starts)
+        if self._pool is None:
+            if self.workers > 0:
+                import multiprocessing
+                from concurrent.futures import ProcessPoolExecutor
+                try:
+                    self._queue = multiprocessing.Queue()
+                    self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker, initargs=(self._queue,))
+                    threading.Thread(target=self._drain, args=(self._queue,), daemon=True, name="planner-progress").start()
+                except (OSError, NotImplementedError):
+                    # No multiprocessing support on this host; degrade to a thread
+                    self.workers = 0
+            if self._pool is None:
+                from concurrent.futures import ThreadPoolExecutor
+                self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="planner")
+        return self._pool
+
+    def _drain(self, queue):
+        while True:
+            msg = queue.get()
+            if msg is None:
+                return
+            self._dispatch(msg)
+
+    def _dispatch(self, msg):
+        token, kind, payload = msg
+        listener = self._listeners.get(token)
+        if kind == "end":
+            self._listeners.pop(token, None)
+        if listener:
+            listener(kind, payload)
+
+    def _acquire(self, n):
+        with self._lock:
+            if self._pending + n > self.max_pending:
+                raise HTTPException(
+                    status_code=429,
+                    detail=f"Planner busy: {self._pending} jobs queued. Retry shortly.",
+                    headers={"Retry-After": str(RETRY_AFTER_SEC)},
+                )
+            self._pending += n
+
+    def _release(self, _future):
+        with self._lock:
+            self._pending -= 1
+
+    async def run(self, fn, *args, timeout=None, progress=None):
+        """
+        Run fn(*args) on the pool; raises HTTPException 429/504/503 on overload, timeout or crash.
+        With `progress`, fn is called as fn(*args, progress=report) and every report(kind, payload)
+        is forwarded to progress(kind, payload) on a background thread, followed by ("end", None).
+        """
+        self._acquire(1)
+        try:
+            pool = self._get_pool()
+            if progress is None:
+                future = pool.submit(fn, *args)
+            else:
+                token = next(self._tokens)
+                self._listeners[token] = progress
+                sink = self._dispatch if self.workers == 0 else None
+                future = pool.submit(_run_with_progress, token, fn, args, sink)
+        except BaseException:
+            self._release(None)
+            raise
+        future.add_done_callback(self._release)
+
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout or self.timeout)
+        except asyncio.TimeoutError:
+            # Queued jobs are dropped; a job already running finishes in the background
+            future.cancel()
+            raise HTTPException(status_code=504, detail=f"Planning exceeded {timeout or self.timeout:.0f}s limit.")
+        except BrokenExecutor:   # BrokenProcessPool
+            self.shutdown()
+            raise HTTPException(status_code=503, detail="Planner worker crashed. Retry the request.")
+
+    async def run_many(self, fn, arg_list, timeout=None, progress=None):
+        """
+        Run fn(*args) for every tuple in arg_list concurrently; results come back in order.
+        All jobs are admitted together or not at all, and share one `timeout`.
+        With `progress`, every job's report(kind, payload) is forwarded to progress(kind, payload)
+        as in `run`, and the call returns only once all of them are delivered; no "end" is forwarded.
+        """
+        self._acquire(len(arg_list))
+        futures = []
+        drained = None
+        try:
+            pool = self._get_pool()
+            if progress is not None:
+                loop = asyncio.get_running_loop()
+                drained = asyncio.Event()
+                left = [len(arg_list)]
+
+                def relay(kind, payload):
+                    if kind != "end":
+                        progress(kind, payload)
+                        return
+                    left[0] -= 1
+                    if not left[0]:
+                        loop.call_soon_threadsafe(drained.set)
+                sink = self._dispatch if self.workers == 0 else None
+            for args in arg_list:
+                if progress is None:
+                    futures.append(pool.submit(fn, *args))
+                else:
+                    token = next(self._tokens)
+                    self._listeners[token] = relay
+                    futures.append(pool.submit(_run_with_progress, token, fn, args, sink))
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            with self._lock:
+                self._pending -= len(arg_list)
+            raise
+        for future in futures:
+            future.add_done_callback(self._release)
+
+        try:
+            results = await asyncio.wait_for(asyncio.gather(*(asyncio.wrap_future(f) for f in futures)), timeout or self.timeout)
+        except asyncio.TimeoutError:
+            for future in futures:
+                future.cancel()
+            raise HTTPException(status_code=504, detail=f"Planning exceeded {timeout or self.timeout:.0f}s limit.")
+        except BrokenExecutor:   # BrokenProcessPool
+            self.shutdown()
+            raise HTTPException(status_code=503, detail="Planner worker crashed. Retry the request.")
+        if drained is not None:
+            # Results and progress travel on different pipes; let the events catch up first
+            try:
+                await asyncio.wait_for(drained.wait(), PROGRESS_DRAIN_SEC)
+            except asyncio.TimeoutError:
+                pass
+        return results
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "mode": "process" if self.workers > 0 else "thread",
+            "pending": self._pending,
+            "max_pending": self.max_pending,
+            "timeout_sec": self.timeout,
+        }
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+        if self._queue is not None:
+            self._queue.put(None)
+            self._queue = None
+        self._listeners.clear()
@@ -0,0 +1,303 @@
+import math
+
+import numpy as np
+
+from distance import KM_PER_DEG, haversine_km
+from spatial import SpatialIndex
+
+# --- GRID CONFIG ---
+GRID_STEP = 0.0008       # Lattice spacing in degrees (~89m N-S)
+MAX_BLOCK_POINTS = 1 << 20  # Max lattice points tested per polygon batch
+
+# --- ADAPTIVE GRID CONFIG ---
+COARSE_FRACTION = 1 / 3   # Interior cell size as a fraction of the tower range
+REFINE_LEVELS = 2         # Halvings near edges / critical nodes (finest cell = range / 12)
+CRITICAL_REFINE = 0.5     # Refine cells within this fraction of the range of a critical node
+
+GRID_MODES = ("adaptive", "fixed")
+
+
+class NodeSet:
+    """
+    Array-backed node pool used by the planner.
+    Critical nodes always occupy the first `n_critical` rows, area points follow.
+    `weight` is the area in km^2 each node stands for (0 for critical nodes).
+    `terrain`, set for multi-terrain plans, is the caller's terrain code of the
+    polygon each node samples (-1 for critical nodes).
+    `blocks`, set by node_set_from_blocks, keeps the per-polygon samples the
+    area rows came from (kept for incremental replans).
+    """
+    def __init__(self, lat, lng, is_critical, covered=None, weight=None, terrain=None):
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.lng = np.asarray(lng, dtype=np.float64)
+        self.is_critical = np.asarray(is_critical, dtype=bool)
+        self.covered = np.zeros(len(self.lat), dtype=bool) if covered is None else np.asarray(covered, dtype=bool)
+        if weight is None:
+            weight = (~self.is_critical).astype(np.float64)
+        self.weight = np.where(self.is_critical, 0.0, np.asarray(weight, dtype=np.float64))
+        self.n_critical = int(self.is_critical.sum())
+        self.terrain = None if terrain is None else np.asarray(terrain, dtype=np.int16)
+        self.blocks = None
+        self._index = None
+
+    def __len__(self):
+        return len(self.lat)
+
+    def __getstate__(self):
+        # Ship only the arrays between planner processes; the index is rebuilt on demand
+        return {**self.__dict__, "_index": None}
+
+    @property
+    def area_count(self):
+        return len(self) - self.n_critical
+
+    @property
+    def area_km2(self):
+        return float(self.weight.sum())
+
+    def uncovered_share(self):
+        """Share of the area weight not yet covered (the 95% rule reads this)."""
+        total = self.area_km2
+        if total <= 0:
+            return 0.0
+        return float(self.weight[~self.covered].sum()) / total
+
+    def name(self, i):
+        return f"Critical #{i+1}" if self.is_critical[i] else "Area Point"
+
+    def critical_indices(self):
+        return np.flatnonzero(self.is_critical)
+
+    def uncovered_area_indices(self):
+        return np.flatnonzero(~self.is_critical & ~self.covered)
+
+    def dist_km(self, lat, lng, idx=None):
+        """Haversine distance from (lat, lng) to every node (or the rows in `idx`)."""
+        if idx is None:
+            return haversine_km(lat, lng, self.lat, self.lng)
+        return haversine_km(lat, lng, self.lat[idx], self.lng[idx])
+
+    def spatial_index(self, cell_km):
+        """Bucket index over all nodes; rebuilt only when the cell size changes."""
+        if self._index is None or self._index.cell_km != cell_km:
+            self._index = SpatialIndex(self.lat, self.lng, cell_km)
+        return self._index
+
+    def within(self, lat, lng, radius):
+        return self.spatial_index(radius).query_radius(lat, lng, radius)
+
+    def mark_covered(self, lat, lng, radius):
+        self.covered[self.within(lat, lng, radius)] = True
+
+
+# --- LATTICE HELPERS ---
+def lattice_axis(lo, hi, step=GRID_STEP):
+    """
+    Sample points lo, lo+step, ... < hi.
+    Values are accumulated sequentially (not lo + k*step) so they match the
+    original `curr += step` walk bit-for-bit.
+    """
+    if not lo < hi:
+        return np.empty(0)
+    n = int((hi - lo) / step) + 2
+    vals = np.add.accumulate(np.concatenate(([lo], np.full(n, step))))
+    return vals[vals < hi]
+
+
+def points_in_polygon(lat, lng, poly_lat, poly_lng):
+    """Batched even-odd test; same edge rules and float ops as main.is_inside."""
+    inside = np.zeros(lat.shape, dtype=bool)
+    n = len(poly_lat)
+    if n < 3:
+        return inside
+    for i in range(n):
+        p1x, p1y = poly_lat[i], poly_lng[i]
+        p2x, p2y = poly_lat[(i + 1) % n], poly_lng[(i + 1) % n]
+        if p1y == p2y:
+            continue  # Horizontal edges can never toggle
+        hit = (lng > min(p1y, p2y)) & (lng <= max(p1y, p2y)) & (lat <= max(p1x, p2x))
+        if p1x != p2x:
+            idx = np.flatnonzero(hit)
+            xinters = (lng[idx] - p1y) * (p2x - p1x) / (p2y - p1y) + p1x
+            idx = idx[lat[idx] <= xinters]
+            inside[idx] = ~inside[idx]
+        else:
+            inside[hit] = ~inside[hit]
+    return inside
+
+
+def polygon_lattice(poly_lat, poly_lng, step=GRID_STEP):
+    """Return (lat, lng) arrays of lattice points inside one polygon, row-major."""
+    lats = lattice_axis(min(poly_lat), max(poly_lat), step)
+    lngs = lattice_axis(min(poly_lng), max(poly_lng), step)
+    if not len(lats) or not len(lngs):
+        return np.empty(0), np.empty(0)
+
+    rows_per_block = max(1, MAX_BLOCK_POINTS // len(lngs))
+    out_lat, out_lng = [], []
+    for r in range(0, len(lats), rows_per_block):
+        row_lats = lats[r:r + rows_per_block]
+        blat = np.repeat(row_lats, len(lngs))
+        blng = np.tile(lngs, len(row_lats))
+        mask = points_in_polygon(blat, blng, poly_lat, poly_lng)
+        out_lat.append(blat[mask])
+        out_lng.append(blng[mask])
+    return np.concatenate(out_lat), np.concatenate(out_lng)
+
+
+def build_node_set(polygons, critical_nodes, step=GRID_STEP, terrains=None):
+    """
+    Critical nodes first, then the fixed lattice of every polygon in request order.
+    `terrains` (one code per polygon) tags each node with its polygon's terrain.
+    """
+    blocks = [polygon_nodes(poly, "fixed", step=step) for poly in polygons]
+    return node_set_from_blocks(critical_nodes, blocks, terrains)
+
+
+def polygon_nodes(poly, mode="adaptive", radius=None, crit_lat=None, crit_lng=None, step=GRID_STEP):
+    """
+    (lat, lng, weight_km2) sample of one polygon, or None if it has under 3 vertices.
+    "fixed" is the `step` lattice; "adaptive" the quadtree for tower range
+    `radius`, refined near the critical nodes (crit_lat, crit_lng).
+    """
+    if len(poly) <= 2:
+        return None
+    poly_lat, poly_lng = [p.lat for p in poly], [p.lng for p in poly]
+    if mode == "fixed":
+        plat, plng = polygon_lattice(poly_lat, poly_lng, step)
+        return plat, plng, cell_area_km2(plat, step, step)
+    return adaptive_polygon_nodes(poly_lat, poly_lng, radius, crit_lat, crit_lng)
+
+
+def node_set_from_blocks(critical_nodes, blocks, terrains=None):
+    """NodeSet of the critical nodes followed by per-polygon samples from polygon_nodes (None = skipped)."""
+    lat_parts = [np.array([c.lat for c in critical_nodes], dtype=np.float64)]
+    lng_parts = [np.array([c.lng for c in critical_nodes], dtype=np.float64)]
+    w_parts = [np.zeros(len(critical_nodes))]
+    t_parts = [np.full(len(critical_nodes), -1)]
+    for i, block in enumerate(blocks):
+        if block is not None:
+            plat, plng, pw = block
+            lat_parts.append(plat)
+            lng_parts.append(plng)
+            w_parts.append(pw)
+            if terrains is not None:
+                t_parts.append(np.full(len(plat), terrains[i]))
+    nodes = _node_set(lat_parts, lng_parts, w_parts, len(critical_nodes), t_parts if terrains is not None else None)
+    nodes.blocks = list(blocks)
+    return nodes
+
+
+def _node_set(lat_parts, lng_parts, w_parts, n_critical, t_parts=None):
+    lat = np.concatenate(lat_parts)
+    lng = np.concatenate(lng_parts)
+    is_critical = np.zeros(len(lat), dtype=bool)
+    is_critical[:n_critical] = True
+    terrain = None if t_parts is None else np.concatenate(t_parts)
+    return NodeSet(lat, lng, is_critical, weight=np.concatenate(w_parts), terrain=terrain)
+
+
+# --- ADAPTIVE SAMPLER ---
+def cell_area_km2(lat, dlat, dlng):
+    """Area of dlat x dlng degree cells centred on `lat`."""
+    return (dlat * KM_PER_DEG) * (dlng * KM_PER_DEG) * np.cos(np.radians(lat))
+
+
+def _local_xy(poly_lat, poly_lng, lat=None, lng=None):
+    """Equirectangular km coordinates around the polygon's vertex mean (the vertices by default)."""
+    lat0, lng0 = float(np.mean(poly_lat)), float(np.mean(poly_lng))
+    lat = np.asarray(poly_lat if lat is None else lat, dtype=np.float64)
+    lng = np.asarray(poly_lng if lng is None else lng, dtype=np.float64)
+    return (lng - lng0) * KM_PER_DEG * math.cos(math.radians(lat0)), (lat - lat0) * KM_PER_DEG
+
+
+def edge_distance_km(lat, lng, poly_lat, poly_lng):
+    """Distance from each point to the nearest polygon edge, on a local flat projection."""
+    px, py = _local_xy(poly_lat, poly_lng)
+    x, y = _local_xy(poly_lat, poly_lng, lat, lng)
+    best = np.full(lat.shape, np.inf)
+    n = len(px)
+    for i in range(n):
+        j = (i + 1) % n
+        ax, ay, bx, by = px[i], py[i], px[j], py[j]
+        ex, ey = bx - ax, by - ay
+        length2 = ex * ex + ey * ey
+        if length2 > 0:
+            t = np.clip(((x - ax) * ex + (y - ay) * ey) / length2, 0.0, 1.0)
+        else:
+            t = 0.0
+        np.minimum(best, np.hypot(x - (ax + t * ex), y - (ay + t * ey)), out=best)
+    return best
+
+
+def polygon_area_km2(poly_lat, poly_lng):
+    """Shoelace area on the same local projection as edge_distance_km."""
+    x, y = _local_xy(poly_lat, poly_lng)
+    return 0.5 * abs(float(np.dot(x, np.roll(y, -1)) - np.dot(y, np.roll(x, -1))))
+
+
+def adaptive_polygon_nodes(poly_lat, poly_lng, radius, crit_lat, crit_lng):
+    """
+    Quadtree sample of one polygon: (lat, lng, weight_km2) arrays.
+    Cells start at COARSE_FRACTION * radius and are split in four, up to
+    REFINE_LEVELS times, while a polygon edge or a critical node is close.
+    A cell no edge comes near lies wholly inside or outside the polygon,
+    so its centre decides for all of it.
+    """
+    poly_lat = np.asarray(poly_lat, dtype=np.float64)
+    poly_lng = np.asarray(poly_lng, dtype=np.float64)
+    lat_lo, lat_hi = float(poly_lat.min()), float(poly_lat.max())
+    lng_lo, lng_hi = float(poly_lng.min()), float(poly_lng.max())
+    cos_ref = max(math.cos(math.radians(max(abs(lat_lo), abs(lat_hi)))), 1e-6)
+
+    dlat = radius * COARSE_FRACTION / KM_PER_DEG
+    dlng = radius * COARSE_FRACTION / (KM_PER_DEG * cos_ref)
+    rows = max(1, math.ceil((lat_hi - lat_lo) / dlat))
+    cols = max(1, math.ceil((lng_hi - lng_lo) / dlng))
+    lat = np.repeat(lat_lo + (np.arange(rows) + 0.5) * dlat, cols)
+    lng = np.tile(lng_lo + (np.arange(cols) + 0.5) * dlng, rows)
+    crit_index = SpatialIndex(crit_lat, crit_lng, radius) if len(crit_lat) else None
+
+    out_lat, out_lng, out_w = [], [], []
+    for level in range(REFINE_LEVELS + 1):
+        half_diag = 0.5 * math.hypot(dlat * KM_PER_DEG, dlng * KM_PER_DEG * cos_ref)
+        refine = edge_distance_km(lat, lng, poly_lat, poly_lng) <= half_diag
+        if crit_index is not None:
+            near = crit_index.sum_within(lat, lng, radius * CRITICAL_REFINE + half_diag, np.ones(len(crit_lat), dtype=bool))
+            refine |= near > 0
+        if level == REFINE_LEVELS:
+            refine[:] = False
+
+        keep = ~refine
+        keep[keep] = points_in_polygon(lat[keep], lng[keep], poly_lat, poly_lng)
+        out_lat.append(lat[keep])
+        out_lng.append(lng[keep])
+        out_w.append(cell_area_km2(lat[keep], dlat, dlng))
+
+        lat, lng = lat[refine], lng[refine]
+        if not len(lat):
+            break
+        dlat, dlng = dlat / 2, dlng / 2
+        # Children of each split cell, offset a quarter cell from its centre
+        lat = np.concatenate([lat - dlat / 2, lat - dlat / 2, lat + dlat / 2, lat + dlat / 2])
+        lng = np.concatenate([lng - dlng / 2, lng + dlng / 2, lng - dlng / 2, lng + dlng / 2])
+
+    lat, lng, w = np.concatenate(out_lat), np.concatenate(out_lng), np.concatenate(out_w)
+    if not len(lat):
+        # Thinner than the finest cell: one node at the vertex mean stands for the whole polygon
+        return np.array([poly_lat.mean()]), np.array([poly_lng.mean()]), np.array([polygon_area_km2(poly_lat, poly_lng)])
+    order = np.lexsort((lng, lat))
+    return lat[order], lng[order], w[order]
+
+
+def build_adaptive_node_set(polygons, critical_nodes, radius, terrains=None):
+    """
+    Critical nodes first, then the adaptive sample of every polygon in request order.
+    `radius` is one tower range or one per polygon; `terrains` (one code per
+    polygon) tags each node with its polygon's terrain.
+    """
+    radii = radius if isinstance(radius, (list, tuple)) else [radius] * len(polygons)
+    crit_lat = np.array([c.lat for c in critical_nodes], dtype=np.float64)
+    crit_lng = np.array([c.lng for c in critical_nodes], dtype=np.float64)
+    blocks = [polygon_nodes(poly, "adaptive", radii[i], crit_lat, crit_lng) for i, poly in enumerate(polygons)]
+    return node_set_from_blocks(critical_nodes, blocks, terrains)
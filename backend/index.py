@@ -1,14 +1,14 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List, Optional
-import math
-import random
+from typing import Literal, Optional
 
 import weather
-from main import (
-    Point, PlanningRequest, RerouteRequest, TECH_MATRIX, DEFAULT_TECH,
-    generate_grid, optimize_network, get_dist_km
+import metrics
+# The app-free planning core: importing main.py would build its app and routes as well
+from planning import (
+    PlanningRequest, RerouteRequest, WeatherBatchRequest, TrafficClassifyRequest, SimulationRequest, PLAN_CACHE, PLANNER,
+    plan_response, reroute, weather_batch, traffic_classify, traffic_log_summary, simulate_resilience
 )
 
 app = FastAPI()
@@ -26,73 +26,53 @@ async def health_check():
     return {"status": "healthy", "message": "VyomSetu Backend is running"}
 
 @app.post("/calculate-plan")
-async def calculate_plan(data: PlanningRequest):
-    nodes = generate_grid(data.polygons, data.critical_nodes)
-    towers, logs, processed_nodes = optimize_network(nodes, data.polygons, data.terrain_type)
-    
-    links = []
-    critical_analysis = []
-    
-    for n in processed_nodes:
-        if n.is_critical:
-            closest = None
-            min_d = float('inf')
-            for t in towers:
-                d = get_dist_km(t["lat"], t["lng"], n.lat, n.lng)
-                if d <= (t["range"] * 1.05):
-                    if d < min_d:
-                        min_d = d
-                        closest = t
-            
-            if closest:
-                links.append({"from": [n.lat, n.lng], "to": [closest["lat"], closest["lng"]]})
-                critical_analysis.append({"name": n.name, "status": "Connected", "dist": f"{min_d:.2f}km"})
-            else:
-                critical_analysis.append({"name": n.name, "status": "Offline", "dist": "N/A"})
-
-    specs = TECH_MATRIX.get(data.terrain_type, DEFAULT_TECH)
-    
-    total_cost = sum(t["cost"] for t in towers)
-    legacy_total_cost = len(towers) * specs["legacy_cost"]
-    
-    area = len([n for n in processed_nodes if not n.is_critical]) * 0.008
-
-    return {
-        "kpis": {
-            "total_towers": len(towers),
-            "capex": total_cost,
-            "legacy_capex": legacy_total_cost,
-            "area": round(area, 2)
-        },
-        "metrics": {"cost": total_cost, "count": len(towers), "area": round(area, 2), "tech": towers[0]["tech"] if towers else "N/A"},
-        "critical_analysis": critical_analysis,
-        "terrain_breakdown": {"tech": towers[0]["tech"] if towers else "N/A", "radius": towers[0]["range"] if towers else 0},
-        "links": links,
-        "logs": logs,
-        "towers": towers
-    }
+@metrics.timed_endpoint("calculate_plan")
+async def calculate_plan(data: PlanningRequest, request: Request, timing: bool = False,
+                         format: Literal["full", "compact"] = "full", raster: bool = False):
+    return await plan_response(data, request, timing, format, raster)
+
+@app.get("/plan-cache/stats")
+async def plan_cache_stats():
+    return PLAN_CACHE.stats()
+
+@app.get("/planner/stats")
+async def planner_stats():
+    return PLANNER.stats()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    return PlainTextResponse(metrics.render(PLANNER, PLAN_CACHE), media_type="text/plain; version=0.0.4")
+
+@app.on_event("shutdown")
+def shutdown_planner():
+    PLANNER.shutdown()
 
 @app.get("/weather-resilience/{village_id}")
 async def get_weather_resilience(village_id: str, tech_type: str, simulate: bool = False):
     return weather.check_resilience(village_id, tech_type, simulate)
 
+@app.post("/weather-resilience/batch")
+async def get_weather_resilience_batch(data: WeatherBatchRequest):
+    return weather_batch(data)
+
+@app.get("/weather/stats")
+async def weather_stats():
+    return weather.VILLAGES.stats()
+
+@app.post("/traffic/classify")
+async def classify_traffic(data: TrafficClassifyRequest):
+    return traffic_classify(data)
+
+@app.post("/traffic/classify/stream")
+async def classify_traffic_stream(request: Request, village_id: Optional[str] = None):
+    return await traffic_log_summary(request, village_id)
+
+@app.post("/simulate-resilience")
+@metrics.timed_endpoint("simulate_resilience")
+async def simulate_resilience_endpoint(data: SimulationRequest):
+    return await simulate_resilience(data)
+
 @app.post("/reroute-network")
+@metrics.timed_endpoint("reroute_network")
 async def reroute_network(data: RerouteRequest):
-    dead_node = next((t for t in data.towers if t["id"] == data.dead_node_id), None)
-    if not dead_node:
-        return {"error": "Node not found"}
-    
-    active_towers = [t for t in data.towers if t["id"] != data.dead_node_id]
-    new_links = []
-    
-    if active_towers:
-        nearest_neighbor = min(active_towers, key=lambda t: get_dist_km(t["lat"], t["lng"], dead_node["lat"], dead_node["lng"]))
-        new_links.append({
-            "from": [nearest_neighbor["lat"], nearest_neighbor["lng"]],
-            "to": [dead_node["lat"], dead_node["lng"]]
-        })
-    
-    return {
-        "status": "REROUTED",
-        "new_links": new_links
-    }
+    return reroute(data)
@@ -0,0 +1,159 @@
+import asyncio
+import json
+import time
+import uuid
+from collections import OrderedDict
+
+# --- JOB STORE CONFIG ---
+MAX_JOBS = 256        # Jobs retained for polling / stream replay
+JOB_TTL_SEC = 3600    # Finished jobs older than this are dropped first
+DRAIN_WAIT_SEC = 5    # How long to wait for trailing worker events after a job returns
+
+
+class PlanJob:
+    """
+    One asynchronous plan build and its ordered event log.
+    Events are {"seq", "type", "data"} with type log | tower | refine | merged | result | error;
+    a refine or merged event carries the full tower list that replaces the towers streamed so far.
+    Multi-cluster plans stream each cluster's towers (with a "cluster" field) as they
+    are placed and end with a merged event after the duplicate hubs are dropped.
+    All mutation happens on the event loop; worker threads go through `relay`.
+    """
+    def __init__(self, key):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.status = "queued"   # queued -> running -> done | failed
+        self.created = time.time()
+        self.finished_at = None
+        self.events = []
+        self.towers_placed = 0
+        self.result = None
+        self.error = None
+        self._loop = asyncio.get_running_loop()
+        self._changed = asyncio.Event()
+        self._drained = asyncio.Event()
+        self.task = None
+
+    @property
+    def finished(self):
+        return self.status in ("done", "failed")
+
+    def push(self, kind, data):
+        if kind == "tower":
+            self.towers_placed += 1
+        elif kind in ("refine", "merged"):
+            self.towers_placed = len(data)
+        if self.status == "queued":
+            self.status = "running"
+        self.events.append({"seq": len(self.events), "type": kind, "data": data})
+        self._changed.set()
+
+    def relay(self, kind, payload):
+        """Progress callback for PlanningExecutor; safe to call from any thread."""
+        if kind == "end":
+            self._loop.call_soon_threadsafe(self._drained.set)
+        else:
+            self._loop.call_soon_threadsafe(self.push, kind, payload)
+
+    async def wait_drained(self):
+        try:
+            await asyncio.wait_for(self._drained.wait(), DRAIN_WAIT_SEC)
+        except asyncio.TimeoutError:
+            pass
+
+    def replay(self, result):
+        """Emit the events of an already computed plan (cache hit)."""
+        for line in result["logs"]:
+            self.push("log", line)
+        for tower in result["towers"]:
+            self.push("tower", tower)
+
+    def finish(self, result):
+        self.result = result
+        self.push("result", {k: v for k, v in result.items() if k not in ("logs", "towers")})
+        self.status = "done"
+        self.finished_at = time.time()
+        self._changed.set()
+
+    def fail(self, message):
+        self.error = message
+        self.push("error", {"message": message})
+        self.status = "failed"
+        self.finished_at = time.time()
+        self._changed.set()
+
+    def summary(self):
+        out = {
+            "job_id": self.id,
+            "status": self.status,
+            "created": self.created,
+            "finished": self.finished_at,
+            "towers_placed": self.towers_placed,
+            "events": len(self.events),
+        }
+        if self.result is not None:
+            out["result"] = self.result
+        if self.error is not None:
+            out["error"] = self.error
+        return out
+
+    async def follow(self, since=0):
+        """Yield events from `since` onwards, waiting for new ones until the job finishes."""
+        i = max(0, since)
+        while True:
+            while i < len(self.events):
+                yield self.events[i]
+                i += 1
+            if self.finished:
+                return
+            self._changed.clear()
+            await self._changed.wait()
+
+
+class PlanJobStore:
+    """
+    Bounded registry of plan jobs; oldest finished jobs are evicted first.
+    Unfinished jobs are never evicted, so a store full of them refuses new ones.
+    """
+    def __init__(self, max_jobs=MAX_JOBS, ttl=JOB_TTL_SEC):
+        self.max_jobs = max_jobs
+        self.ttl = ttl
+        self._jobs = OrderedDict()
+
+    def __len__(self):
+        return len(self._jobs)
+
+    @property
+    def live(self):
+        """Jobs not finished yet (queued, running, or answered from cache but not yet replayed)."""
+        return sum(not j.finished for j in self._jobs.values())
+
+    def create(self, key):
+        """Register a new job; raises OverflowError when max_jobs unfinished jobs are held."""
+        self._evict()
+        if len(self._jobs) >= self.max_jobs:
+            raise OverflowError("too many unfinished plan jobs")
+        job = PlanJob(key)
+        self._jobs[job.id] = job
+        return job
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def _evict(self):
+        now = time.time()
+        for job_id in [j.id for j in self._jobs.values() if j.finished and now - j.finished_at > self.ttl]:
+            del self._jobs[job_id]
+        while len(self._jobs) >= self.max_jobs:
+            oldest = next((j.id for j in self._jobs.values() if j.finished), None)
+            if oldest is None:
+                return
+            del self._jobs[oldest]
+
+
+def ndjson_line(event):
+    return json.dumps(event, separators=(",", ":")) + "\n"
+
+
+def sse_frame(event):
+    return f"id: {event['seq']}\nevent: {event['type']}\ndata: {json.dumps(event['data'], separators=(',', ':'))}\n\n"
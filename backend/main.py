@@ -1,10 +1,26 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List, Optional
-import math
-import random
+from starlette.exceptions import HTTPException  # Base of fastapi's; the planning core raises this one
+from typing import Literal, Optional
+import asyncio
+import json
 import weather 
+import metrics
+from jobs import PlanJobStore, ndjson_line, sse_frame
+from connectivity import IncidentStore, assign_drones
+from executor import RETRY_AFTER_SEC
+from plan_cache import plan_key, key_seed
+from weather_push import WeatherHub
+from tables import DRONE_CONFIG, DRONE_INFO, IMPACT_TIME_SEC, SERVICES_STATUS
+# The planning core (models, stores, shared handlers) is app-free, so index.py and worker processes import it without this app
+from planning import (
+    PlanningRequest, ReplanRequest, RerouteRequest, MultiRerouteRequest, DroneDeploymentRequest, BatchDroneDeploymentRequest,
+    SimulationRequest, WeatherBatchRequest, TrafficClassifyRequest,
+    PLAN_CACHE, PLANNER, TOPOLOGIES, PLAN_STATES,
+    run_plan, plan_response, shaped_response, replanned_plan, network_topology, node_location, drone_timeline,
+    drone_deployment, reroute, repair_response, weather_batch, traffic_classify, traffic_log_summary, simulate_resilience
+)
 
 app = FastAPI()
 
@@ -12,332 +28,246 @@ app.add_middleware(
     CORSMiddleware, allow_origins=["*"], allow_credentials=True, allow_methods=["*"], allow_headers=["*"],
 )
 
-# --- DATA MODELS ---
-class Point(BaseModel):
-    lat: float
-    lng: float
-
-class PlanningRequest(BaseModel):
-    polygons: List[List[Point]] 
-    critical_nodes: List[Point]
-    terrain_type: str = "valley" 
-
-class RerouteRequest(BaseModel):
-    towers: List[dict]
-    dead_node_id: str
-
-class DroneDeploymentRequest(BaseModel):
-    affected_node_id: str
-    affected_node_lat: float
-    affected_node_lng: float
-    towers: List[dict]
-
-# --- CONFIG: TECH MATRIX (MARKET-ACCURATE TCO) ---
-# Costs in INR (₹). Represents CAPEX + 1 Year Critical Maintenance/License.
-TECH_MATRIX = {
-    "valley": {
-        "tech": "Optical Fiber (GPON)",   
-        "range": 0.8,  
-        "cost": 350000,       # ₹3.5L: Aerial Fiber Rollout (Pole-to-Pole) in rural flats.
-        "legacy_tech": "Standard Macro Tower",
-        "legacy_cost": 2500000 # ₹25L: Cost of 40m GBT Tower + Civil Work + Diesel GenSet.
-    }, 
-    "snow": {
-        "tech": "L-Band Satellite Mesh",      
-        "range": 2.0,  
-        "cost": 1250000,      # ₹12.5L: VSAT Terminal + 5-Year High-Bandwidth Emergency Plan.
-        "legacy_tech": "Deep-Earth Fiber Trenching",
-        "legacy_cost": 8500000 # ₹85L: Specialized excavation in permafrost/avalanche zones.
-    },
-    "rocky": {
-        "tech": "Microwave Backhaul",         
-        "range": 1.5,  
-        "cost": 650000,       # ₹6.5L: E-Band P2P Radios + Spectrum License Fees.
-        "legacy_tech": "Bedrock Cabling",
-        "legacy_cost": 4500000 # ₹45L: Diamond drilling through hard rock for cabling.
-    }
-}
-
-# Fallback for undefined terrains
-DEFAULT_TECH = {
-    "tech": "Standard Tower", 
-    "range": 5.0, 
-    "cost": 2500000, 
-    "legacy_cost": 3000000 
-}
-
-# --- DRONE CONFIGURATION ---
-DRONE_CONFIG = {
-    "type": "Mesh-Relay Drone",
-    "speed_kmh": 50,  # ~14 m/s for rural deployment
-    "range": 2.5,  # Can relay up to 2.5km
-    "cost": 150000,  # ₹1.5L per deployment
-    "setup_time_sec": 5  # Time to deploy
-}
-
-# --- EMERGENCY SERVICES & BANDWIDTH PRIORITY ---
-EMERGENCY_SERVICES = {
-    "critical": [
-        "emergency.gov.in",
-        "ndma.gov.in", 
-        "icmr.gov.in",
-        "helpline.in",
-        "police.gov.in",
-        "ambulance.gov.in",
-        "sos-alert.com",
-        "disaster-alert.in"
-    ],
-    "blocked": [
-        "netflix.com",
-        "youtube.com", 
-        "instagram.com",
-        "facebook.com",
-        "twitter.com",
-        "tiktok.com",
-        "gaming.com",
-        "streaming.com"
-    ],
-    "throttled": [
-        "gmail.com",
-        "whatsapp.com",
-        "telegram.com",
-        "email-services.com"
-    ]
-}
-
-# --- GEOMETRY HELPERS ---
-def get_dist_km(lat1, lng1, lat2, lng2):
-    R = 6371.0 
-    dlat = math.radians(lat2 - lat1)
-    dlng = math.radians(lng2 - lng1)
-    a = math.sin(dlat / 2)**2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlng / 2)**2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-    return R * c
-
-def get_centroid(poly):
-    if not poly or len(poly) < 3: return None
-    lat = sum(p.lat for p in poly) / len(poly)
-    lng = sum(p.lng for p in poly) / len(poly)
-    return {"lat": lat, "lng": lng}
-
-def is_inside(lat, lng, poly):
-    if len(poly) < 3: return False
-    n = len(poly)
-    inside = False
-    p1x, p1y = poly[0].lat, poly[0].lng
-    for i in range(n + 1):
-        p2x, p2y = poly[i % n].lat, poly[i % n].lng
-        if lng > min(p1y, p2y):
-            if lng <= max(p1y, p2y):
-                if lat <= max(p1x, p2x):
-                    if p1y != p2y:
-                        xinters = (lng - p1y) * (p2x - p1x) / (p2y - p1y) + p1x
-                    if p1x == p2x or lat <= xinters:
-                        inside = not inside
-        p1x, p1y = p2x, p2y
-    return inside
-
-# --- SIMULATION LOGIC ---
-class SimNode:
-    def __init__(self, lat, lng, is_critical=False, name="Area Point"):
-        self.lat = lat
-        self.lng = lng
-        self.is_critical = is_critical
-        self.name = name
-        self.covered = False
-
-def generate_grid(polygons, critical_nodes):
-    nodes = []
-    for i, c in enumerate(critical_nodes):
-        nodes.append(SimNode(c.lat, c.lng, is_critical=True, name=f"Critical #{i+1}"))
-    
-    for poly in polygons:
-        if len(poly) > 2:
-            lats = [p.lat for p in poly]
-            lngs = [p.lng for p in poly]
-            step = 0.0008 
-            curr_lat = min(lats)
-            while curr_lat < max(lats):
-                curr_lng = min(lngs)
-                while curr_lng < max(lngs):
-                    if is_inside(curr_lat, curr_lng, poly):
-                        nodes.append(SimNode(curr_lat, curr_lng, is_critical=False))
-                    curr_lng += step
-                curr_lat += step
-    return nodes
-
-def optimize_network(nodes, polygons, terrain_type):
-    towers = []
-    logs = []
-    specs = TECH_MATRIX.get(terrain_type, DEFAULT_TECH)
-    radius = specs["range"]
-    
-    logs.append(f"INIT: Radius Limit: {radius}km | Tech: {specs['tech']}")
+# --- PLAN JOBS ---
+# Background plan builds for POST /plans, kept for status polling and event replay.
+PLAN_JOBS = PlanJobStore()
 
-    criticals = [n for n in nodes if n.is_critical]
-    tower_id = 1
-    
-    for crit in criticals:
-        target_center = None
-        min_dist = float('inf')
-        
-        if polygons:
-            for poly in polygons:
-                cent = get_centroid(poly)
-                if cent:
-                    d = get_dist_km(crit.lat, crit.lng, cent["lat"], cent["lng"])
-                    if d < min_dist:
-                        min_dist = d
-                        target_center = cent
-        
-        final_lat, final_lng = crit.lat, crit.lng
-        
-        if target_center:
-            if min_dist <= (radius * 0.95):
-                final_lat = target_center["lat"]
-                final_lng = target_center["lng"]
-                logs.append(f"OPTIMAL: Anchor covered by Central Tower.")
-            else:
-                ratio = (radius * 0.95) / min_dist
-                final_lat = crit.lat + (target_center["lat"] - crit.lat) * ratio
-                final_lng = crit.lng + (target_center["lng"] - crit.lng) * ratio
-                logs.append(f"STRETCH: Anchor far. Tower placed at edge ({radius}km).")
-
-        is_duplicate = any(get_dist_km(t["lat"], t["lng"], final_lat, final_lng) < 0.05 for t in towers)
-        
-        if not is_duplicate:
-            towers.append({
-                "id": f"TWR-{tower_id:02d}",
-                "lat": final_lat, "lng": final_lng,
-                "type": "master_hub", 
-                "range": radius,
-                "cost": specs["cost"],
-                "tech": specs["tech"]
-            })
-            tower_id += 1
-        
-        for n in nodes:
-            if get_dist_km(final_lat, final_lng, n.lat, n.lng) <= radius:
-                n.covered = True
-
-    while True:
-        uncovered = [n for n in nodes if not n.is_critical and not n.covered]
-        total_area_nodes = len([n for n in nodes if not n.is_critical])
-        
-        if total_area_nodes > 0 and (len(uncovered) / total_area_nodes) < 0.05: break
-        if not uncovered: break
-        
-        candidates = uncovered
-        if len(candidates) > 50: candidates = random.sample(candidates, 50)
-        
-        best_cand = None
-        max_gain = -1
-        
-        for cand in candidates:
-            gain = 0
-            for n in uncovered:
-                if get_dist_km(cand.lat, cand.lng, n.lat, n.lng) <= radius:
-                    gain += 1
-            if gain > max_gain:
-                max_gain = gain
-                best_cand = cand
-        
-        if best_cand and max_gain > 0:
-            towers.append({
-                "id": f"TWR-{tower_id:02d}",
-                "lat": best_cand.lat, "lng": best_cand.lng,
-                "type": "standard_tower",
-                "range": radius,
-                "cost": specs["cost"],
-                "tech": specs["tech"]
-            })
-            tower_id += 1
-            logs.append(f"FILL: Added tower covering {max_gain} nodes.")
-            
-            for n in nodes:
-                if get_dist_km(best_cand.lat, best_cand.lng, n.lat, n.lng) <= radius:
-                    n.covered = True
-        else:
-            break
+# --- WEATHER PUSH ---
+# Subscriptions to village readings, fed by one shared scheduler (see weather_push.py).
+WEATHER_HUB = WeatherHub(weather.VILLAGES)
 
-    return towers, logs, nodes
+# --- REROUTE INCIDENTS ---
+# Failure state of /reroute-network/multi incidents, by the token their first call returns.
+INCIDENTS = IncidentStore()
 
+# --- PLANNING ---
 @app.post("/calculate-plan")
-async def calculate_plan(data: PlanningRequest):
-    nodes = generate_grid(data.polygons, data.critical_nodes)
-    towers, logs, processed_nodes = optimize_network(nodes, data.polygons, data.terrain_type)
-    
-    links = []
-    critical_analysis = []
-    
-    for n in processed_nodes:
-        if n.is_critical:
-            closest = None
-            min_d = float('inf')
-            for t in towers:
-                d = get_dist_km(t["lat"], t["lng"], n.lat, n.lng)
-                if d <= (t["range"] * 1.05):
-                    if d < min_d:
-                        min_d = d
-                        closest = t
-            
-            if closest:
-                links.append({"from": [n.lat, n.lng], "to": [closest["lat"], closest["lng"]]})
-                critical_analysis.append({ "name": n.name, "status": "Connected", "dist": f"{min_d:.2f}km" })
-            else:
-                critical_analysis.append({ "name": n.name, "status": "Offline", "dist": "N/A" })
-
-    # --- COST CALCULATION ---
-    specs = TECH_MATRIX.get(data.terrain_type, DEFAULT_TECH)
-    
-    total_cost = sum(t["cost"] for t in towers)
-    # Legacy cost is calculated for the same number of towers, but using the expensive legacy tech
-    legacy_total_cost = len(towers) * specs["legacy_cost"]
-    
-    area = len([n for n in processed_nodes if not n.is_critical]) * 0.008 
+@metrics.timed_endpoint("calculate_plan")
+async def calculate_plan(data: PlanningRequest, request: Request, timing: bool = False,
+                         format: Literal["full", "compact"] = "full", raster: bool = False):
+    return await plan_response(data, request, timing, format, raster)
+
+@app.post("/calculate-plan/replan")
+@metrics.timed_endpoint("replan")
+async def replan_plan(edit: ReplanRequest, request: Request, timing: bool = False,
+                      format: Literal["full", "compact"] = "full", raster: bool = False):
+    """Edit a served plan (polygons / critical nodes added, removed or moved) and replan only what changed."""
+    result = await replanned_plan(edit, timing)
+    polygons = PLAN_STATES.get(result["plan_id"]).data.polygons if raster else None
+    return shaped_response(result, polygons, request, format, raster)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    return PlainTextResponse(metrics.render(PLANNER, PLAN_CACHE), media_type="text/plain; version=0.0.4")
+
+@app.get("/plan-cache/stats")
+async def plan_cache_stats():
+    return PLAN_CACHE.stats()
+
+@app.get("/planner/stats")
+async def planner_stats():
+    return PLANNER.stats()
+
+@app.get("/topology/stats")
+async def topology_stats():
+    return {**TOPOLOGIES.stats(), "incidents": INCIDENTS.stats()}
+
+@app.get("/replan/stats")
+async def replan_stats():
+    return PLAN_STATES.stats()
 
+@app.on_event("shutdown")
+def shutdown_planner():
+    PLANNER.shutdown()
+
+# --- ASYNC PLAN JOBS ---
+async def run_plan_job(job, data):
+    try:
+        result = PLAN_CACHE.get(job.key)
+        if result is not None:
+            job.replay(result)
+        else:
+            seed = data.seed if data.seed is not None else key_seed(job.key)
+            result, blocks, _ = await run_plan(data, seed, progress=job.relay)
+            result = {**result, "plan_id": job.key}
+            await job.wait_drained()
+            PLAN_CACHE.put(job.key, result)
+            PLAN_STATES.ensure(job.key, data, result["towers"], blocks)
+        TOPOLOGIES.ensure(job.key, result["towers"])
+        PLAN_STATES.ensure(job.key, data, result["towers"])
+        job.finish(result)
+    except HTTPException as e:
+        job.fail(e.detail)
+    except Exception as e:
+        job.fail(f"Planning failed: {e}")
+
+@app.post("/plans", status_code=202)
+async def create_plan_job(data: PlanningRequest):
+    """Queue a plan build and return immediately; follow it via /plans/{id}/events."""
+    # Jobs not yet on the planner (just queued, or answered from cache) count too
+    busy = HTTPException(status_code=429, detail="Planner busy. Retry shortly.", headers={"Retry-After": str(RETRY_AFTER_SEC)})
+    if max(PLANNER.pending, PLAN_JOBS.live) >= PLANNER.max_pending:
+        raise busy
+    try:
+        job = PLAN_JOBS.create(plan_key(data))
+    except OverflowError:
+        raise busy
+    job.task = asyncio.create_task(run_plan_job(job, data))
     return {
-        "kpis": { 
-            "total_towers": len(towers), 
-            "capex": total_cost, 
-            "legacy_capex": legacy_total_cost, # NEW FIELD
-            "area": round(area, 2) 
-        },
-        "metrics": { "cost": total_cost, "count": len(towers), "area": round(area, 2), "tech": towers[0]["tech"] if towers else "N/A" },
-        "critical_analysis": critical_analysis,
-        "terrain_breakdown": { "tech": towers[0]["tech"] if towers else "N/A", "radius": towers[0]["range"] if towers else 0 },
-        "links": links,
-        "logs": logs,
-        "towers": towers
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": f"/plans/{job.id}",
+        "events_url": f"/plans/{job.id}/events"
     }
 
+@app.get("/plans/{job_id}")
+async def get_plan_job(job_id: str):
+    job = PLAN_JOBS.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.summary()
+
+@app.get("/plans/{job_id}/events")
+async def stream_plan_job(job_id: str, request: Request, since: int = 0):
+    """
+    Stream job events as NDJSON (default) or server-sent events (Accept: text/event-stream):
+    log lines and towers as they are placed, then one result (KPIs, links) or error event.
+    """
+    job = PLAN_JOBS.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    if "text/event-stream" in request.headers.get("accept", ""):
+        frame, media_type = sse_frame, "text/event-stream"
+    else:
+        frame, media_type = ndjson_line, "application/x-ndjson"
+
+    async def body():
+        async for event in job.follow(since):
+            yield frame(event)
+    return StreamingResponse(body(), media_type=media_type)
+
+# --- WEATHER & TRAFFIC ---
 @app.get("/weather-resilience/{village_id}")
 async def get_weather_resilience(village_id: str, tech_type: str, simulate: bool = False):
     return weather.check_resilience(village_id, tech_type, simulate)
 
-# --- PHASE 2: DRONE DEPLOYMENT LOGIC ---
+@app.post("/weather-resilience/batch")
+async def get_weather_resilience_batch(data: WeatherBatchRequest):
+    return weather_batch(data)
+
+@app.get("/weather/stats")
+async def weather_stats():
+    return {**weather.VILLAGES.stats(), "push": WEATHER_HUB.stats()}
+
+@app.post("/traffic/classify")
+async def classify_traffic(data: TrafficClassifyRequest):
+    return traffic_classify(data)
+
+@app.post("/traffic/classify/stream")
+async def classify_traffic_stream(request: Request, village_id: Optional[str] = None):
+    return await traffic_log_summary(request, village_id)
+
+def weather_subscription(village_ids):
+    if len(village_ids) > weather.MAX_BATCH_VILLAGES:
+        raise HTTPException(status_code=422, detail=f"At most {weather.MAX_BATCH_VILLAGES} villages per subscription.")
+    try:
+        return WEATHER_HUB.subscribe(village_ids)
+    except OverflowError:
+        raise HTTPException(status_code=503, detail="Too many weather subscribers. Retry shortly.",
+                            headers={"Retry-After": str(RETRY_AFTER_SEC)})
+
+@app.get("/weather/stream")
+async def stream_weather(request: Request, villages: str):
+    """
+    Push village readings as NDJSON (default) or server-sent events (Accept: text/event-stream):
+    a snapshot per village (comma-separated `villages`), then only state transitions.
+    """
+    sub = weather_subscription([v for v in villages.split(",") if v])
+    if "text/event-stream" in request.headers.get("accept", ""):
+        frame, media_type = sse_frame, "text/event-stream"
+    else:
+        frame, media_type = ndjson_line, "application/x-ndjson"
+
+    async def body():
+        try:
+            async for event in WEATHER_HUB.follow(sub):
+                yield frame(event)
+        finally:
+            WEATHER_HUB.unsubscribe(sub)
+    return StreamingResponse(body(), media_type=media_type)
+
+@app.websocket("/weather/ws")
+async def weather_socket(ws: WebSocket):
+    """
+    Same events as /weather/stream over a WebSocket. The client changes its
+    villages with {"subscribe": [...]} / {"unsubscribe": [...]} messages; a bad
+    message gets an "error" event, numbered like the rest, and changes nothing.
+    """
+    await ws.accept()
+    try:
+        sub = WEATHER_HUB.subscribe()
+    except OverflowError:
+        await ws.close(code=1013)   # Try again later
+        return
+
+    async def send():
+        async for event in WEATHER_HUB.follow(sub):
+            await ws.send_json(event)
+
+    def error(message):
+        # Through the subscriber's queue, so errors are numbered in order with the other events
+        sub.push({"type": "error", "data": {"message": message}})
+
+    sender = asyncio.create_task(send())
+    try:
+        while True:
+            message = await ws.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            if message.get("text") is None:
+                await ws.close(code=1003)   # Unsupported data: the protocol is JSON text frames
+                break
+            # A bad message gets an error event; the subscription carries on
+            try:
+                msg = json.loads(message["text"])
+            except ValueError:
+                error("Messages must be JSON.")
+                continue
+            if not isinstance(msg, dict):
+                error('Messages must be objects like {"subscribe": [...]} or {"unsubscribe": [...]}.')
+                continue
+            add, remove = msg.get("subscribe") or [], msg.get("unsubscribe") or []
+            if not isinstance(add, list) or not isinstance(remove, list):
+                error('"subscribe" and "unsubscribe" must be lists of village ids.')
+                continue
+            add, remove = [str(v) for v in add], [str(v) for v in remove]
+            if len((sub.villages | set(add)) - set(remove)) > weather.MAX_BATCH_VILLAGES:
+                error(f"At most {weather.MAX_BATCH_VILLAGES} villages per subscription.")
+                continue
+            WEATHER_HUB.update(sub, add=add, remove=remove)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        sender.cancel()
+        WEATHER_HUB.unsubscribe(sub)
+
+# --- PHASE 2: DRONE DEPLOYMENT ---
 @app.post("/drone-deploy")
+@metrics.timed_endpoint("drone_deploy")
 async def deploy_drone(data: DroneDeploymentRequest):
     """
     Phase 2: Deploy drone from nearest neighbor tower to affected node.
     Simulates 15 sec impact time + drone travel + bandwidth throttling.
     """
-    affected_node = {
-        "id": data.affected_node_id,
-        "lat": data.affected_node_lat,
-        "lng": data.affected_node_lng
-    }
+    topo = network_topology(data.plan_id, data.towers)
+    lat, lng = node_location(topo, data.affected_node_id, data.affected_node_lat, data.affected_node_lng)
+    affected_node = {"id": data.affected_node_id, "lat": lat, "lng": lng}
     
     # Find nearest neighbor tower (not affected)
-    nearest_tower = None
-    min_distance = float('inf')
-    
-    for tower in data.towers:
-        if tower["id"] != data.affected_node_id:
-            dist = get_dist_km(tower["lat"], tower["lng"], affected_node["lat"], affected_node["lng"])
-            if dist < min_distance:
-                min_distance = dist
-                nearest_tower = tower
+    row = topo.row.get(data.affected_node_id)
+    k, min_distance = topo.nearest(lat, lng, [row] if row is not None else [])
+    nearest_tower = topo.tower(k) if k is not None else None
     
     if not nearest_tower:
         return {
@@ -346,78 +276,107 @@ async def deploy_drone(data: DroneDeploymentRequest):
             "services": {"critical": [], "blocked": [], "throttled": []}
         }
     
-    # Calculate drone travel time (in seconds)
-    drone_travel_distance = min_distance
-    drone_speed_km_per_sec = DRONE_CONFIG["speed_kmh"] / 3600
-    drone_travel_time = (drone_travel_distance / drone_speed_km_per_sec) if drone_speed_km_per_sec > 0 else 5
-    
-    # Impact timeline
-    impact_time = 15  # 15 seconds before impact
-    total_deployment_time = impact_time + DRONE_CONFIG["setup_time_sec"] + drone_travel_time
-    
-    # Bandwidth status during emergency
-    services_status = {
-        "critical": [
-            {"service": s, "status": "ONLINE", "priority": "CRITICAL", "bandwidth": "UNLIMITED"} 
-            for s in EMERGENCY_SERVICES["critical"]
-        ],
-        "blocked": [
-            {"service": s, "status": "BLOCKED", "priority": "NON-ESSENTIAL", "bandwidth": "0%"} 
-            for s in EMERGENCY_SERVICES["blocked"]
-        ],
-        "throttled": [
-            {"service": s, "status": "THROTTLED", "priority": "LOW", "bandwidth": "25%"} 
-            for s in EMERGENCY_SERVICES["throttled"]
-        ]
-    }
+    timeline = drone_timeline(min_distance)
     
     return {
         "status": "DRONE_DEPLOYED",
-        "timeline": {
-            "impact_seconds": impact_time,
-            "drone_setup_sec": DRONE_CONFIG["setup_time_sec"],
-            "drone_travel_distance_km": round(drone_travel_distance, 2),
-            "drone_travel_time_sec": round(drone_travel_time, 2),
-            "total_deployment_time_sec": round(total_deployment_time, 2)
-        },
-        "drone_info": {
-            "type": DRONE_CONFIG["type"],
-            "speed_kmh": DRONE_CONFIG["speed_kmh"],
-            "relay_range_km": DRONE_CONFIG["range"],
-            "cost": DRONE_CONFIG["cost"],
-            "status": "EN_ROUTE"
-        },
-        "deployment": {
-            "from_tower": nearest_tower["id"],
-            "from_location": [nearest_tower["lat"], nearest_tower["lng"]],
-            "to_node": affected_node["id"],
-            "to_location": [affected_node["lat"], affected_node["lng"]],
-            "drone_path": [
-                [nearest_tower["lat"], nearest_tower["lng"]],
-                [affected_node["lat"], affected_node["lng"]]
-            ]
-        },
-        "services": services_status,
-        "message": f"DRONE DISPATCHED: Impact in {impact_time}s. Drone ETA: {round(drone_travel_time, 1)}s. Emergency services online. Non-essential streaming blocked."
+        "timeline": timeline,
+        "drone_info": DRONE_INFO,
+        "deployment": drone_deployment(nearest_tower, affected_node),
+        "services": SERVICES_STATUS,
+        "message": f"DRONE DISPATCHED: Impact in {IMPACT_TIME_SEC}s. Drone ETA: {round(timeline['drone_travel_time_sec'], 1)}s. Emergency services online. Non-essential streaming blocked."
+    }
+
+@app.post("/drone-deploy/batch")
+@metrics.timed_endpoint("drone_deploy_batch")
+async def deploy_drones_batch(data: BatchDroneDeploymentRequest):
+    """
+    Dispatch drones to many affected nodes at once, nearest pairs first, with no
+    tower sending more than `max_drones_per_tower`. Affected nodes that are
+    themselves towers cannot dispatch. Nodes left without a tower are UNSERVED;
+    nodes sent without lat/lng that are not towers of the plan are UNKNOWN_LOCATION,
+    and the rest of the batch is still served.
+    """
+    capacity = data.max_drones_per_tower if data.max_drones_per_tower is not None else DRONE_CONFIG["max_per_tower"]
+    topo = network_topology(data.plan_id, data.towers)
+    affected, located = [], []
+    for n in data.affected_nodes:
+        try:
+            lat, lng = node_location(topo, n.id, n.lat, n.lng)
+        except HTTPException:
+            located.append(False)
+            continue
+        located.append(True)
+        affected.append({"id": n.id, "lat": lat, "lng": lng})
+    assignment = iter(zip(affected, assign_drones(affected, topo, capacity)))
+
+    deployments = []
+    load = {}
+    for n, found in zip(data.affected_nodes, located):
+        if not found:
+            deployments.append({"to_node": n.id, "to_location": None, "status": "UNKNOWN_LOCATION"})
+            continue
+        node, (k, dist) = next(assignment)
+        if k is None:
+            deployments.append({"to_node": node["id"], "to_location": [node["lat"], node["lng"]], "status": "UNSERVED"})
+            continue
+        tower = topo.tower(k)
+        load[tower["id"]] = load.get(tower["id"], 0) + 1
+        deployments.append({**drone_deployment(tower, node), "status": "EN_ROUTE", "timeline": drone_timeline(dist)})
+
+    dispatched = sum(load.values())
+    unserved = len(affected) - dispatched
+    unknown = len(data.affected_nodes) - len(affected)
+    eta = max((d["timeline"]["drone_travel_time_sec"] for d in deployments if "timeline" in d), default=0)
+    return {
+        "status": "DRONES_DEPLOYED" if not unserved and not unknown else ("PARTIAL" if dispatched else "ERROR"),
+        "dispatched": dispatched,
+        "unserved": unserved,
+        "unknown_location": unknown,
+        "max_drones_per_tower": capacity,
+        "tower_load": load,
+        "total_cost": dispatched * DRONE_CONFIG["cost"],
+        "deployments": deployments,
+        "drone_info": DRONE_INFO,
+        "services": SERVICES_STATUS,
+        "message": f"{dispatched} DRONES DISPATCHED, {unserved} unserved. Impact in {IMPACT_TIME_SEC}s. Last drone ETA: {round(eta, 1)}s."
     }
 
-# --- PHASE 3: REROUTE LOGIC ---
+# --- RESILIENCE SIMULATION ---
+@app.post("/simulate-resilience")
+@metrics.timed_endpoint("simulate_resilience")
+async def simulate_resilience_endpoint(data: SimulationRequest):
+    return await simulate_resilience(data)
+
+# --- PHASE 3: REROUTE ---
 @app.post("/reroute-network")
+@metrics.timed_endpoint("reroute_network")
 async def reroute_network(data: RerouteRequest):
-    dead_node = next((t for t in data.towers if t["id"] == data.dead_node_id), None)
-    if not dead_node: return {"error": "Node not found"}
-    
-    active_towers = [t for t in data.towers if t["id"] != data.dead_node_id]
-    new_links = []
-    
-    if active_towers:
-        nearest_neighbor = min(active_towers, key=lambda t: get_dist_km(t["lat"], t["lng"], dead_node["lat"], dead_node["lng"]))
-        new_links.append({
-            "from": [nearest_neighbor["lat"], nearest_neighbor["lng"]], 
-            "to": [dead_node["lat"], dead_node["lng"]]
-        })
-        
-    return {
-        "status": "REROUTED",
-        "new_links": new_links
-    }
\ No newline at end of file
+    return reroute(data)
+
+@app.post("/reroute-network/multi")
+@metrics.timed_endpoint("reroute_network_multi")
+async def reroute_network_multi(data: MultiRerouteRequest):
+    """
+    Fail a set of towers and bridge every piece of the network left without a
+    master_hub back to one. The first call (plan_id or towers) opens an incident
+    and returns its incident_id; calls that send it back add their failures to
+    it (a cascading incident), and only the split components are recomputed.
+    """
+    if data.incident_id is not None:
+        state = INCIDENTS.get(data.incident_id)
+        if state is None:
+            raise HTTPException(status_code=404, detail="Incident not found or expired. Start a new one without incident_id.")
+        incident_id = data.incident_id
+        if data.reset:
+            _, state = INCIDENTS.start(state.topo, incident_id)
+    else:
+        incident_id, state = INCIDENTS.start(network_topology(data.plan_id, data.towers))
+    topo = state.topo
+
+    unknown = [tid for tid in data.dead_node_ids if tid not in topo.row]
+    for tid in data.dead_node_ids:
+        if tid in topo.row:
+            state.fail(topo.row[tid])
+
+    return {**repair_response(topo, state, unknown), "incident_id": incident_id}
@@ -0,0 +1,177 @@
+import contextvars
+import functools
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+# --- METRICS CONFIG (env overridable) ---
+# METRICS_ENABLED=0 turns every hook below into a no-op; /metrics then only reports scrape-time gauges
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1") != "0"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+NODE_BUCKETS = (100, 500, 1000, 5000, 10000, 50000, 100000, 500000, 1000000)
+TOWER_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by a tuple of label values."""
+    def __init__(self, name, help_text, buckets, labels=()):
+        self.name = name
+        self.help = help_text
+        self.buckets = buckets
+        self.labels = labels
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted(self._series.items())
+        for label_values, series in items:
+            base = [f'{k}="{v}"' for k, v in zip(self.labels, label_values)]
+            for bound, n in zip(self.buckets + ("+Inf",), series[:len(self.buckets)] + [series[-1]]):
+                le = 'le="%s"' % bound
+                lines.append(f"{self.name}_bucket{_labels(base + [le])} {n}")
+            lines.append(f"{self.name}_sum{_labels(base)} {series[-2]:.6f}")
+            lines.append(f"{self.name}_count{_labels(base)} {series[-1]}")
+        return lines
+
+
+def _labels(pairs):
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def gauge_lines(name, help_text, value, kind="gauge"):
+    return [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}", f"{name} {value}"]
+
+
+STAGE_SECONDS = Histogram("vyomsetu_plan_stage_seconds", "Time spent per planning stage.", LATENCY_BUCKETS, ("stage",))
+REQUEST_SECONDS = Histogram("vyomsetu_request_seconds", "Handler latency per endpoint.", LATENCY_BUCKETS, ("endpoint",))
+PLAN_NODES = Histogram("vyomsetu_plan_nodes", "Planning nodes generated per plan.", NODE_BUCKETS)
+PLAN_TOWERS = Histogram("vyomsetu_plan_towers", "Towers placed per plan.", TOWER_BUCKETS)
+
+
+# --- PER-PLAN RECORDING ---
+# Planning stages run in worker processes, so they record into a per-call Timings
+# that travels back with the result; the parent folds it into the histograms.
+_recorder = contextvars.ContextVar("plan_timings", default=None)
+
+
+class Timings:
+    def __init__(self):
+        self.stages = {}
+        self.counts = {}
+
+    def add_stage(self, name, seconds):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def add_count(self, name, n):
+        self.counts[name] = self.counts.get(name, 0) + n
+
+    def merge(self, other):
+        for name, seconds in other["stages"].items():
+            self.add_stage(name, seconds)
+        for name, n in other["counts"].items():
+            self.add_count(name, n)
+        return self
+
+    def snapshot(self):
+        return {"stages": {k: round(v, 6) for k, v in self.stages.items()}, "counts": dict(self.counts)}
+
+
+@contextmanager
+def _timed_stage(name):
+    rec = _recorder.get()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if rec is not None:
+            rec.add_stage(name, time.perf_counter() - start)
+
+
+_NULL = nullcontext()
+
+
+def stage(name):
+    """Context manager timing one planning stage into the current plan's Timings."""
+    if not METRICS_ENABLED or _recorder.get() is None:
+        return _NULL
+    return _timed_stage(name)
+
+
+def count(name, n):
+    if METRICS_ENABLED:
+        rec = _recorder.get()
+        if rec is not None:
+            rec.add_count(name, n)
+
+
+def timed_call(fn, *args, progress=None):
+    """
+    Worker entry point: run fn(*args) and return (result, timings snapshot).
+    `progress` is forwarded only when the executor supplies one.
+    """
+    token = _recorder.set(Timings() if METRICS_ENABLED else None)
+    try:
+        result = fn(*args) if progress is None else fn(*args, progress=progress)
+        rec = _recorder.get()
+        return result, rec.snapshot() if rec is not None else None
+    finally:
+        _recorder.reset(token)
+
+
+def observe_plan(timings):
+    """Fold a finished plan's timings (from timed_call) into the process-wide histograms."""
+    if not METRICS_ENABLED or timings is None:
+        return
+    for name, seconds in timings["stages"].items():
+        STAGE_SECONDS.observe(seconds, name)
+    if "nodes" in timings["counts"]:
+        PLAN_NODES.observe(timings["counts"]["nodes"])
+    if "towers" in timings["counts"]:
+        PLAN_TOWERS.observe(timings["counts"]["towers"])
+
+
+def timed_endpoint(endpoint):
+    """Decorator recording an async handler's latency under `endpoint`; identity when disabled."""
+    def decorate(handler):
+        if not METRICS_ENABLED:
+            return handler
+
+        @functools.wraps(handler)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await handler(*args, **kwargs)
+            finally:
+                REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint)
+        return wrapper
+    return decorate
+
+
+def render(planner=None, plan_cache=None):
+    """Prometheus text exposition of all histograms plus scrape-time planner and cache gauges."""
+    lines = []
+    for hist in (REQUEST_SECONDS, STAGE_SECONDS, PLAN_NODES, PLAN_TOWERS):
+        lines += hist.render()
+    if planner is not None:
+        lines += gauge_lines("vyomsetu_planner_inflight", "Plan jobs queued or running.", planner.pending)
+        lines += gauge_lines("vyomsetu_planner_max_pending", "Plan jobs admitted before 429.", planner.max_pending)
+    if plan_cache is not None:
+        stats = plan_cache.stats()
+        lines += gauge_lines("vyomsetu_plan_cache_entries", "Plans held in the cache.", stats["entries"])
+        lines += gauge_lines("vyomsetu_plan_cache_hits_total", "Plan cache hits.", stats["hits"], "counter")
+        lines += gauge_lines("vyomsetu_plan_cache_misses_total", "Plan cache misses.", stats["misses"], "counter")
+    return "\n".join(lines) + "\n"
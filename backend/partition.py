@@ -0,0 +1,148 @@
+import math
+
+import numpy as np
+
+from grid import NodeSet
+from distance import KM_PER_DEG, cos_lat, haversine_km, within_km
+
+# --- PARTITION CONFIG ---
+LINK_FACTOR = 2.0      # Polygons closer than LINK_FACTOR * radius are planned together
+HUB_DEDUPE_KM = 0.05   # Same 50m duplicate rule optimize_network applies to anchor hubs
+
+
+def polygon_bbox(poly):
+    lats = [p.lat for p in poly]
+    lngs = [p.lng for p in poly]
+    return min(lats), max(lats), min(lngs), max(lngs)
+
+
+def bbox_gap_km(a, b):
+    """Lower bound on the distance between two lat/lng boxes."""
+    dlat = max(0.0, max(a[0], b[0]) - min(a[1], b[1]))
+    dlng = max(0.0, max(a[2], b[2]) - min(a[3], b[3]))
+    lat_ref = max(abs(a[0]), abs(a[1]), abs(b[0]), abs(b[1]))
+    return math.hypot(dlat * KM_PER_DEG, dlng * KM_PER_DEG * math.cos(math.radians(lat_ref)))
+
+
+def cluster_polygons(polygons, link_km):
+    """
+    Group plannable polygons (3+ vertices) whose boxes come within link_km of
+    each other. Returns lists of polygon indices, ordered by their first index.
+    """
+    valid = [i for i, poly in enumerate(polygons) if len(poly) > 2]
+    boxes = {i: polygon_bbox(polygons[i]) for i in valid}
+    parent = {i: i for i in valid}
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for a_pos, a in enumerate(valid):
+        for b in valid[a_pos + 1:]:
+            if bbox_gap_km(boxes[a], boxes[b]) < link_km:
+                ra, rb = find(a), find(b)
+                if ra != rb:
+                    parent[max(ra, rb)] = min(ra, rb)
+
+    clusters = {}
+    for i in valid:
+        clusters.setdefault(find(i), []).append(i)
+    return [clusters[root] for root in sorted(clusters)]
+
+
+def assign_critical_nodes(polygons, critical_nodes, clusters, centroid):
+    """
+    Give each critical node to the cluster holding its nearest polygon centroid,
+    the same polygon optimize_network would anchor it to. Returns index lists.
+    """
+    owner = {}
+    for ci, cluster in enumerate(clusters):
+        for pi in cluster:
+            owner[pi] = ci
+
+    cent_owner, cent_lat, cent_lng = [], [], []
+    for pi, poly in enumerate(polygons):
+        cent = centroid(poly)
+        if cent and pi in owner:
+            cent_owner.append(owner[pi])
+            cent_lat.append(cent["lat"])
+            cent_lng.append(cent["lng"])
+    cent_lat, cent_lng = np.array(cent_lat), np.array(cent_lng)
+    cent_cos = cos_lat(cent_lat)
+
+    assigned = [[] for _ in clusters]
+    for k, crit in enumerate(critical_nodes):
+        best = 0
+        if cent_owner:
+            best = cent_owner[int(np.argmin(haversine_km(crit.lat, crit.lng, cent_lat, cent_lng, cent_cos)))]
+        assigned[best].append(k)
+    return assigned
+
+
+def cluster_weight(polygons, cluster):
+    """Bounding-box area in deg^2, a cheap proxy for the cluster's grid size."""
+    total = 0.0
+    for pi in cluster:
+        lat0, lat1, lng0, lng1 = polygon_bbox(polygons[pi])
+        total += (lat1 - lat0) * (lng1 - lng0)
+    return total
+
+
+def balance_groups(weights, n_groups):
+    """Longest-processing-time packing of clusters into at most n_groups worker jobs."""
+    n_groups = max(1, min(n_groups, len(weights)))
+    groups = [[] for _ in range(n_groups)]
+    loads = [0.0] * n_groups
+    for i in sorted(range(len(weights)), key=lambda i: (-weights[i], i)):
+        g = loads.index(min(loads))
+        groups[g].append(i)
+        loads[g] += weights[i]
+    return [sorted(g) for g in groups if g]
+
+
+def merge_partitions(parts, assigned, n_critical):
+    """
+    Merge per-cluster (towers, logs, nodes) results, in cluster order.
+    Hubs come first and drop any within HUB_DEDUPE_KM of an earlier hub;
+    fill towers follow; ids are renumbered TWR-01.. in that order.
+    Returns (towers, logs, merged NodeSet, dropped hub count).
+    """
+    hubs, fills, logs = [], [], []
+    for towers, part_logs, _ in parts:
+        hubs.extend(t for t in towers if t["type"] == "master_hub")
+        fills.extend(t for t in towers if t["type"] != "master_hub")
+        logs.extend(line for line in part_logs if not line.startswith("INIT"))
+
+    kept_hubs, dropped = [], 0
+    for hub in hubs:
+        if kept_hubs:
+            near = within_km(hub["lat"], hub["lng"], np.array([t["lat"] for t in kept_hubs]),
+                             np.array([t["lng"] for t in kept_hubs]), HUB_DEDUPE_KM)
+            if near.any():
+                dropped += 1
+                continue
+        kept_hubs.append(hub)
+
+    towers = [{**t, "id": f"TWR-{i:02d}"} for i, t in enumerate(kept_hubs + fills, start=1)]
+
+    crit_lat = np.zeros(n_critical)
+    crit_lng = np.zeros(n_critical)
+    area_lat, area_lng, area_w, area_t = [], [], [], []
+    for (_, _, nodes), crit_ids in zip(parts, assigned):
+        crit_lat[crit_ids] = nodes.lat[:nodes.n_critical]
+        crit_lng[crit_ids] = nodes.lng[:nodes.n_critical]
+        area_lat.append(nodes.lat[nodes.n_critical:])
+        area_lng.append(nodes.lng[nodes.n_critical:])
+        area_w.append(nodes.weight[nodes.n_critical:])
+        if nodes.terrain is not None:
+            area_t.append(nodes.terrain[nodes.n_critical:])
+
+    lat = np.concatenate([crit_lat] + area_lat)
+    lng = np.concatenate([crit_lng] + area_lng)
+    weight = np.concatenate([np.zeros(n_critical)] + area_w)
+    is_critical = np.zeros(len(lat), dtype=bool)
+    is_critical[:n_critical] = True
+    terrain = np.concatenate([np.full(n_critical, -1)] + area_t) if area_t else None
+    return towers, logs, NodeSet(lat, lng, is_critical, weight=weight, terrain=terrain), dropped
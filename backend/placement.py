@@ -0,0 +1,197 @@
+import heapq
+import math
+import random
+
+import numpy as np
+
+from distance import within_pairwise
+from spatial import SpatialIndex
+
+# --- PLACEMENT CONFIG ---
+MAX_UNCOVERED_SHARE = 0.05 # Stop once less than 5% of the area weight is uncovered (95% rule)
+SAMPLE_SIZE = 50           # Candidates scored per step by the sampled engine
+CANDIDATE_SPACING = 0.25   # Lazy engine: candidate site spacing as a fraction of radius
+
+ALGORITHMS = ("greedy", "lazy_greedy")
+
+
+def sampled_greedy_fill(nodes, radius, rng=None):
+    """
+    Original fill loop: score up to SAMPLE_SIZE random uncovered nodes against
+    every uncovered node and place a tower on the best one.
+    Yields (node_index, gain_km2) for each placed tower.
+    """
+    rng = rng or random
+    while True:
+        uncovered = nodes.uncovered_area_indices()
+
+        if nodes.area_km2 > 0 and nodes.uncovered_share() < MAX_UNCOVERED_SHARE: break
+        if not len(uncovered): break
+
+        candidates = uncovered.tolist()
+        if len(candidates) > SAMPLE_SIZE: candidates = rng.sample(candidates, SAMPLE_SIZE)
+
+        best_cand = None
+        max_gain = -1
+        open_weight = np.where(nodes.covered, 0.0, nodes.weight)
+
+        for cand in candidates:
+            gain = float(open_weight[nodes.within(nodes.lat[cand], nodes.lng[cand], radius)].sum())
+            if gain > max_gain:
+                max_gain = gain
+                best_cand = cand
+
+        if best_cand is None or max_gain <= 0:
+            break
+        nodes.mark_covered(nodes.lat[best_cand], nodes.lng[best_cand], radius)
+        yield best_cand, max_gain
+
+
+def candidate_sites(nodes, radius):
+    """Thin area nodes to roughly one site per (radius * CANDIDATE_SPACING) bucket."""
+    area_idx = np.flatnonzero(~nodes.is_critical)
+    if not len(area_idx):
+        return area_idx
+    buckets = SpatialIndex(nodes.lat[area_idx], nodes.lng[area_idx], radius * CANDIDATE_SPACING)
+    # Stable sort keeps the lowest node index first within each bucket
+    first = np.flatnonzero(np.r_[True, np.diff(buckets.keys) != 0])
+    return np.sort(area_idx[buckets.order[first]])
+
+
+def lazy_greedy_fill(nodes, radius, rng=None):
+    """
+    Lazy-greedy (CELF) weighted set cover over fixed candidate sites.
+    Marginal gains (km^2) are kept current by decrementing only candidates
+    within 2x radius of each new tower; heap entries are re-checked lazily
+    when popped. Ties break by node order, or by a seeded shuffle when `rng`
+    is given. Yields (node_index, gain_km2) for each placed tower.
+    """
+    total = nodes.area_km2
+    if total <= 0:
+        return
+    open_mask = ~nodes.is_critical & ~nodes.covered
+    open_weight = np.where(open_mask, nodes.weight, 0.0)
+    w_open = float(open_weight.sum())
+    if w_open / total < MAX_UNCOVERED_SHARE:
+        return
+
+    node_index = nodes.spatial_index(radius)
+    cand = candidate_sites(nodes, radius)
+    cand_lat, cand_lng = nodes.lat[cand], nodes.lng[cand]
+    cand_index = SpatialIndex(cand_lat, cand_lng, radius)
+    gains = node_index.sum_within(cand_lat, cand_lng, radius, open_weight)
+
+    ranks = list(range(len(cand)))
+    if rng is not None:
+        rng.shuffle(ranks)
+    heap = [(-float(g), ranks[i], i) for i, g in enumerate(gains) if g > 0]
+    heapq.heapify(heap)
+
+    while heap and w_open > 0 and w_open / total >= MAX_UNCOVERED_SHARE:
+        neg_gain, rank, i = heapq.heappop(heap)
+        if -neg_gain != gains[i]:
+            # Stale entry: gain dropped since it was pushed
+            if gains[i] > 0:
+                heapq.heappush(heap, (-float(gains[i]), rank, i))
+            continue
+
+        lat, lng = float(cand_lat[i]), float(cand_lng[i])
+        hit = node_index.query_radius(lat, lng, radius)
+        newly = hit[open_mask[hit]]
+        gain = float(nodes.weight[newly].sum())
+        if not math.isclose(gain, gains[i], rel_tol=1e-9, abs_tol=1e-12):
+            # Boundary round-off between batched and single-point distances,
+            # or drift from the running decrements; trust the exact query
+            gains[i] = gain
+            if gains[i] > 0:
+                heapq.heappush(heap, (-float(gains[i]), rank, i))
+            continue
+
+        open_mask[newly] = False
+        nodes.covered[hit] = True
+        w_open -= gain
+
+        affected = cand_index.query_radius(lat, lng, 2 * radius)
+        if len(affected):
+            hit = within_pairwise(cand_lat[affected], cand_lng[affected], nodes.lat[newly], nodes.lng[newly], radius)
+            gains[affected] -= hit @ nodes.weight[newly]
+        yield int(cand[i]), gain
+
+
+def mixed_lazy_fill(nodes, options, allowed, rng=None):
+    """
+    Lazy-greedy fill over (site, tech option) pairs for multi-terrain plans.
+    `options` are tech specs ("range", "cost"); `allowed[code, o]` says whether
+    option o may be built on a node of terrain `code`. Each option has its own
+    candidate sites (CANDIDATE_SPACING of its range, on allowed terrain), and
+    pairs are ranked by uncovered km^2 per rupee. Gains are decremented and
+    re-checked as in lazy_greedy_fill.
+    Yields (node_index, option_index, gain_km2) for each placed tower.
+    """
+    total = nodes.area_km2
+    if total <= 0:
+        return
+    open_mask = ~nodes.is_critical & ~nodes.covered
+    open_weight = np.where(open_mask, nodes.weight, 0.0)
+    w_open = float(open_weight.sum())
+    if w_open / total < MAX_UNCOVERED_SHARE:
+        return
+
+    pools, node_indexes = [], {}
+    for o, spec in enumerate(options):
+        radius = spec["range"]
+        if radius not in node_indexes:
+            node_indexes[radius] = SpatialIndex(nodes.lat, nodes.lng, radius)
+        node_index = node_indexes[radius]
+        cand = candidate_sites(nodes, radius)
+        cand = cand[allowed[nodes.terrain[cand], o]]
+        cand_lat, cand_lng = nodes.lat[cand], nodes.lng[cand]
+        pools.append({
+            "radius": radius, "cost": spec["cost"], "nodes": node_index, "cand": cand,
+            "lat": cand_lat, "lng": cand_lng, "index": SpatialIndex(cand_lat, cand_lng, radius),
+            "gains": node_index.sum_within(cand_lat, cand_lng, radius, open_weight),
+        })
+
+    pairs = [(o, i) for o, pool in enumerate(pools) for i in range(len(pool["cand"]))]
+    ranks = list(range(len(pairs)))
+    if rng is not None:
+        rng.shuffle(ranks)
+    heap = [(-float(pools[o]["gains"][i]) / pools[o]["cost"], ranks[k], o, i)
+            for k, (o, i) in enumerate(pairs) if pools[o]["gains"][i] > 0]
+    heapq.heapify(heap)
+
+    while heap and w_open > 0 and w_open / total >= MAX_UNCOVERED_SHARE:
+        neg_ratio, rank, o, i = heapq.heappop(heap)
+        pool = pools[o]
+        gains = pool["gains"]
+        if -neg_ratio != gains[i] / pool["cost"]:
+            if gains[i] > 0:
+                heapq.heappush(heap, (-float(gains[i]) / pool["cost"], rank, o, i))
+            continue
+
+        lat, lng = float(pool["lat"][i]), float(pool["lng"][i])
+        hit = pool["nodes"].query_radius(lat, lng, pool["radius"])
+        newly = hit[open_mask[hit]]
+        gain = float(nodes.weight[newly].sum())
+        if not math.isclose(gain, gains[i], rel_tol=1e-9, abs_tol=1e-12):
+            gains[i] = gain
+            if gains[i] > 0:
+                heapq.heappush(heap, (-float(gains[i]) / pool["cost"], rank, o, i))
+            continue
+
+        open_mask[newly] = False
+        nodes.covered[hit] = True
+        w_open -= gain
+
+        for other in pools:
+            affected = other["index"].query_radius(lat, lng, other["radius"] + pool["radius"])
+            if len(affected):
+                near = within_pairwise(other["lat"][affected], other["lng"][affected], nodes.lat[newly], nodes.lng[newly], other["radius"])
+                other["gains"][affected] -= near @ nodes.weight[newly]
+        yield int(pool["cand"][i]), o, gain
+
+
+FILL_ENGINES = {
+    "greedy": sampled_greedy_fill,
+    "lazy_greedy": lazy_greedy_fill,
+}
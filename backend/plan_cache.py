@@ -0,0 +1,96 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+# --- CACHE CONFIG ---
+MAX_ENTRIES = 256
+MAX_BYTES = 64 * 1024 * 1024   # Approximate, measured as serialized JSON size
+COORD_DECIMALS = 6             # ~0.1m; finer edits than this share a cache entry
+
+
+def plan_key(data):
+    """Canonical content hash of a PlanningRequest."""
+    def pt(p):
+        return [round(p.lat, COORD_DECIMALS), round(p.lng, COORD_DECIMALS)]
+
+    canonical = {
+        "polygons": [[pt(p) for p in poly] for poly in data.polygons],
+        "critical_nodes": [pt(c) for c in data.critical_nodes],
+        "terrain_type": data.terrain_type,
+        "algorithm": data.algorithm,
+        "grid": data.grid,
+        "seed": data.seed,
+        "refine_ms": data.refine_ms,
+        "polygon_terrains": data.polygon_terrains,
+    }
+    blob = json.dumps(canonical, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(blob.encode()).hexdigest()
+
+
+def replan_key(plan_id, edit):
+    """Plan id of an incremental replan: a hash of the edited plan's id and the edit (a plain dict)."""
+    blob = json.dumps({"plan_id": plan_id, "edit": edit}, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(blob.encode()).hexdigest()
+
+
+def key_seed(key):
+    """Deterministic RNG seed derived from a plan key."""
+    return int(key[:16], 16)
+
+
+class PlanCache:
+    """Thread-safe LRU cache of plan responses, bounded by entry count and size."""
+    def __init__(self, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (response, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, response):
+        size = len(json.dumps(response, separators=(",", ":")))
+        with self._lock:
+            if size > self.max_bytes:
+                return
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (response, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
@@ -0,0 +1,941 @@
+from typing import List, Literal, Optional
+import random
+import time
+
+import numpy as np
+from pydantic import BaseModel, model_validator
+from starlette.exceptions import HTTPException  # Same exception FastAPI handles; keeps fastapi out of worker imports
+
+import metrics
+import weather
+from grid import build_node_set, build_adaptive_node_set, node_set_from_blocks, polygon_nodes
+from distance import cos_lat, haversine_km, within_km
+from spatial import SpatialIndex
+from placement import FILL_ENGINES, MAX_UNCOVERED_SHARE, mixed_lazy_fill
+from refine import CoverageState, refine_budget, refine_placement
+from plan_cache import PlanCache, plan_key, key_seed, replan_key
+from executor import PlanningExecutor
+from partition import HUB_DEDUPE_KM, LINK_FACTOR, cluster_polygons, assign_critical_nodes, cluster_weight, balance_groups, merge_partitions
+from topology import Topology, TopologyStore
+from connectivity import relay_positions
+from traffic import MAX_JSON_HOSTS, FlowTally, TrafficPolicies, classify_stream
+from simulate import DEFAULT_RUNS, DISASTER_TYPES, MAX_RUNS, merge_results, plan_batches, simulate_batches, summarize
+from replan import PlanState, PlanStateStore, apply_edit, box_distance_km, reusable
+from tables import (
+    TECH_MATRIX, DEFAULT_TECH, TERRAIN_CODES, TECH_OPTIONS, DRONE_CONFIG, IMPACT_TIME_SEC,
+    EMERGENCY_SERVICES
+)
+
+# --- DATA MODELS ---
+class Point(BaseModel):
+    lat: float
+    lng: float
+
+class PlanningRequest(BaseModel):
+    polygons: List[List[Point]] 
+    critical_nodes: List[Point]
+    terrain_type: str = "valley" 
+    algorithm: Literal["greedy", "lazy_greedy"] = "greedy"  # Fill engine, see placement.FILL_ENGINES
+    grid: Literal["adaptive", "fixed"] = "adaptive"  # Node sampler, see grid.GRID_MODES
+    seed: Optional[int] = None  # Fixes the fill engine's randomness for reproducible plans
+    refine_ms: Optional[int] = None  # Local-search budget after the fill (None = server default, 0 = skip), see refine.py
+    polygon_terrains: Optional[List[str]] = None  # Terrain per polygon for mixed-tech plans; None = terrain_type everywhere
+
+    @model_validator(mode="after")
+    def collapse_uniform_terrains(self):
+        # One terrain for every polygon is a plain single-terrain plan (and shares its cache key)
+        if self.polygon_terrains is not None:
+            if len(self.polygon_terrains) != len(self.polygons):
+                raise ValueError("polygon_terrains needs one entry per polygon")
+            if len(set(self.polygon_terrains)) <= 1:
+                self.terrain_type = self.polygon_terrains[0] if self.polygon_terrains else self.terrain_type
+                self.polygon_terrains = None
+        return self
+
+# Network calls take either `plan_id` (from /calculate-plan, served from TOPOLOGIES) or the full `towers` list
+class RerouteRequest(BaseModel):
+    dead_node_id: str
+    plan_id: Optional[str] = None
+    towers: Optional[List[dict]] = None
+
+class MultiRerouteRequest(BaseModel):
+    dead_node_ids: List[str]
+    plan_id: Optional[str] = None
+    towers: Optional[List[dict]] = None
+    incident_id: Optional[str] = None  # From an earlier answer: add these failures to that incident
+    reset: bool = False  # With incident_id: clear its failures before applying these
+
+class DroneDeploymentRequest(BaseModel):
+    affected_node_id: str
+    affected_node_lat: Optional[float] = None  # Looked up when the affected node is a tower of the plan
+    affected_node_lng: Optional[float] = None
+    plan_id: Optional[str] = None
+    towers: Optional[List[dict]] = None
+
+class AffectedNode(BaseModel):
+    id: str
+    lat: Optional[float] = None
+    lng: Optional[float] = None
+
+class BatchDroneDeploymentRequest(BaseModel):
+    affected_nodes: List[AffectedNode]
+    plan_id: Optional[str] = None
+    towers: Optional[List[dict]] = None
+    max_drones_per_tower: Optional[int] = None  # Defaults to DRONE_CONFIG["max_per_tower"]
+
+class SimulationRequest(BaseModel):
+    plan_id: Optional[str] = None
+    towers: Optional[List[dict]] = None
+    critical_nodes: Optional[List[Point]] = None  # Defaults to the critical nodes of the plan behind plan_id
+    runs: int = DEFAULT_RUNS
+    seed: Optional[int] = None  # Fixes the scenarios; the response echoes the seed used
+    disasters: Optional[List[str]] = None  # Subset of simulate.DISASTER_TYPES; None = all
+    max_drones_per_tower: Optional[int] = None  # Defaults to DRONE_CONFIG["max_per_tower"]
+
+class WeatherBatchRequest(BaseModel):
+    village_ids: List[str]
+    tech_type: str = ""
+    simulate: bool = False
+
+class TrafficClassifyRequest(BaseModel):
+    hosts: List[str]
+    village_id: Optional[str] = None  # Classify under this village's current network policy; None = standard access
+
+# Incremental replans: indices refer to the polygons / critical_nodes of the plan being edited
+class PolygonMove(BaseModel):
+    index: int
+    polygon: List[Point]
+
+class CriticalNodeMove(BaseModel):
+    index: int
+    point: Point
+
+class ReplanRequest(BaseModel):
+    plan_id: str
+    add_polygons: List[List[Point]] = []
+    add_polygon_terrains: Optional[List[str]] = None  # One per added polygon; defaults to the plan's terrain_type
+    remove_polygons: List[int] = []
+    move_polygons: List[PolygonMove] = []
+    add_critical_nodes: List[Point] = []
+    remove_critical_nodes: List[int] = []
+    move_critical_nodes: List[CriticalNodeMove] = []
+
+# --- MULTI-TERRAIN PLANS ---
+# Which tech (column) each terrain (row) may build: its own only, so a polygon gets the
+# same tech whatever terrains its neighbours have; the fill ranks sites by coverage per rupee
+TECH_ALLOWED = np.eye(len(TERRAIN_CODES), dtype=bool)
+
+# --- TRAFFIC CLASSIFICATION ---
+# Flow classifiers compiled from EMERGENCY_SERVICES per network policy (see traffic.py).
+TRAFFIC = TrafficPolicies(EMERGENCY_SERVICES)
+
+# --- PLAN CACHE ---
+# Shared by main.py and index.py; responses are stored as-is, treat them as read-only.
+PLAN_CACHE = PlanCache()
+
+# --- PLANNING EXECUTOR ---
+# CPU-bound plan builds run here so the event loop keeps serving weather/drone calls.
+PLANNER = PlanningExecutor()
+
+# --- NETWORK TOPOLOGIES ---
+# Tower networks of served plans, keyed by plan id, so reroute/drone calls need not resend towers.
+TOPOLOGIES = TopologyStore()
+
+# --- PLAN STATES ---
+# Requests (and node samples) of served plans, keyed by plan id, for incremental replans.
+PLAN_STATES = PlanStateStore()
+
+# --- GEOMETRY HELPERS ---
+def get_centroid(poly):
+    if not poly or len(poly) < 3: return None
+    lat = sum(p.lat for p in poly) / len(poly)
+    lng = sum(p.lng for p in poly) / len(poly)
+    return {"lat": lat, "lng": lng}
+
+def is_inside(lat, lng, poly):
+    if len(poly) < 3: return False
+    n = len(poly)
+    inside = False
+    p1x, p1y = poly[0].lat, poly[0].lng
+    for i in range(n + 1):
+        p2x, p2y = poly[i % n].lat, poly[i % n].lng
+        if lng > min(p1y, p2y):
+            if lng <= max(p1y, p2y):
+                if lat <= max(p1x, p2x):
+                    if p1y != p2y:
+                        xinters = (lng - p1y) * (p2x - p1x) / (p2y - p1y) + p1x
+                    if p1x == p2x or lat <= xinters:
+                        inside = not inside
+        p1x, p1y = p2x, p2y
+    return inside
+
+def tower_index(towers):
+    """Spatial index over a tower list (dicts with lat/lng), bucketed by the widest tower range."""
+    cell = max((t.get("range", 0) for t in towers), default=0) or DRONE_CONFIG["range"]
+    return SpatialIndex([t["lat"] for t in towers], [t["lng"] for t in towers], cell)
+
+# --- SIMULATION LOGIC ---
+def terrain_code(terrain):
+    return TERRAIN_CODES.index(terrain if terrain in TECH_MATRIX else "default")
+
+def generate_grid(polygons, critical_nodes, terrain_type="valley", mode="adaptive", terrains=None):
+    """
+    Build the planning node pool as an array-backed NodeSet (criticals first).
+    "adaptive" sizes cells from the terrain's tower range; "fixed" is the 0.0008 deg lattice.
+    With `terrains` (one per polygon) each polygon is sampled for its own terrain
+    and nodes carry its terrain code.
+    """
+    codes = [terrain_code(t) for t in terrains] if terrains else None
+    with metrics.stage("grid"):
+        if mode == "fixed":
+            nodes = build_node_set(polygons, critical_nodes, terrains=codes)
+        elif terrains:
+            radii = [TECH_MATRIX.get(t, DEFAULT_TECH)["range"] for t in terrains]
+            nodes = build_adaptive_node_set(polygons, critical_nodes, radii, codes)
+        else:
+            radius = TECH_MATRIX.get(terrain_type, DEFAULT_TECH)["range"]
+            nodes = build_adaptive_node_set(polygons, critical_nodes, radius)
+    metrics.count("nodes", len(nodes))
+    return nodes
+
+def new_tower(tower_id, lat, lng, kind, specs):
+    return {
+        "id": f"TWR-{tower_id:02d}",
+        "lat": lat, "lng": lng,
+        "type": kind,
+        "range": specs["range"],
+        "cost": specs["cost"],
+        "legacy_cost": specs["legacy_cost"],
+        "tech": specs["tech"]
+    }
+
+def fill_towers(nodes, specs, algorithm, rng):
+    """
+    Run the fill engine; yields (node index, tech specs, gain km²) per tower.
+    Multi-terrain node sets use the mixed engine, which picks the tech per site.
+    """
+    if nodes.terrain is None:
+        for idx, gain in FILL_ENGINES[algorithm](nodes, specs["range"], rng):
+            yield idx, specs, gain
+        return
+    present = np.unique(nodes.terrain[nodes.n_critical:])
+    usable = np.flatnonzero(TECH_ALLOWED[present].any(axis=0))
+    options = [TECH_OPTIONS[o] for o in usable]
+    for idx, o, gain in mixed_lazy_fill(nodes, options, TECH_ALLOWED[:, usable], rng):
+        yield idx, options[o], gain
+
+def fill_site_ok(nodes):
+    """Refinement site filter: mixed-terrain towers only move where their tech can be built."""
+    if nodes.terrain is None:
+        return None
+    code = {spec["tech"]: o for o, spec in enumerate(TECH_OPTIONS)}
+    return lambda i, tower: bool(TECH_ALLOWED[nodes.terrain[i], code[tower["tech"]]])
+
+def init_line(specs, terrains=None):
+    if terrains:
+        return f"INIT: Mixed terrain ({', '.join(sorted(set(terrains)))}) | Own tech per terrain, sites by coverage per ₹"
+    return f"INIT: Radius Limit: {specs['range']}km | Tech: {specs['tech']}"
+
+def anchor_sites(nodes, polygons, specs, terrains=None):
+    """
+    Hub site of every critical node, in node order: the centroid of the nearest
+    polygon if it lies within 95% of the hub's range, else the point on the way
+    there at 95% of the range. Yields (lat, lng, hub specs, log line or None,
+    duplicate); `duplicate` marks sites within HUB_DEDUPE_KM of an earlier hub.
+    """
+    cents, cent_specs = [], []
+    for i, poly in enumerate(polygons or []):
+        cent = get_centroid(poly)
+        if cent:
+            cents.append(cent)
+            cent_specs.append(TECH_MATRIX.get(terrains[i], DEFAULT_TECH) if terrains else specs)
+    cent_lat = np.array([c["lat"] for c in cents], dtype=np.float64)
+    cent_lng = np.array([c["lng"] for c in cents], dtype=np.float64)
+    cent_cos = cos_lat(cent_lat)
+    hub_lat = np.empty(nodes.n_critical)
+    hub_lng = np.empty(nodes.n_critical)
+    n_hubs = 0
+
+    for ci in nodes.critical_indices():
+        crit_lat, crit_lng = float(nodes.lat[ci]), float(nodes.lng[ci])
+        target_center = None
+        hub_specs = specs
+        line = None
+
+        if cents:
+            d = haversine_km(crit_lat, crit_lng, cent_lat, cent_lng, cent_cos)
+            k = int(np.argmin(d))
+            target_center, min_dist, hub_specs = cents[k], float(d[k]), cent_specs[k]
+        reach = hub_specs["range"]
+
+        final_lat, final_lng = crit_lat, crit_lng
+
+        if target_center:
+            if min_dist <= (reach * 0.95):
+                final_lat = target_center["lat"]
+                final_lng = target_center["lng"]
+                line = f"OPTIMAL: Anchor covered by Central Tower."
+            else:
+                ratio = (reach * 0.95) / min_dist
+                final_lat = crit_lat + (target_center["lat"] - crit_lat) * ratio
+                final_lng = crit_lng + (target_center["lng"] - crit_lng) * ratio
+                line = f"STRETCH: Anchor far. Tower placed at edge ({reach}km)."
+
+        is_duplicate = bool(within_km(final_lat, final_lng, hub_lat[:n_hubs], hub_lng[:n_hubs], HUB_DEDUPE_KM).any())
+        if not is_duplicate:
+            hub_lat[n_hubs], hub_lng[n_hubs] = final_lat, final_lng
+            n_hubs += 1
+        yield final_lat, final_lng, hub_specs, line, is_duplicate
+
+def optimize_network(nodes, polygons, terrain_type, algorithm="greedy", seed=None, progress=None, refine_ms=None, terrains=None):
+    """
+    Place anchor towers for critical nodes, fill until the 95% rule holds, then
+    refine the fill towers by local search for up to `refine_ms`.
+    With `terrains` (one per polygon, nodes from generate_grid with the same list)
+    each anchor uses the tech of the polygon it anchors to and the fill picks a
+    tech per site by coverage per rupee.
+    `progress(kind, payload)`, if given, receives each log line ("log") and
+    placed tower ("tower") as soon as it is produced, and the final tower list
+    ("refine") if the refinement changed it.
+    """
+    towers = []
+    logs = []
+    specs = TECH_MATRIX.get(terrain_type, DEFAULT_TECH)
+
+    def log(line):
+        logs.append(line)
+        if progress: progress("log", line)
+
+    def add_tower(tower):
+        towers.append(tower)
+        if progress: progress("tower", tower)
+    
+    log(init_line(specs, terrains))
+
+    tower_id = 1
+    
+    with metrics.stage("anchors"):
+        for lat, lng, hub_specs, line, duplicate in anchor_sites(nodes, polygons, specs, terrains):
+            if line:
+                log(line)
+            if not duplicate:
+                add_tower(new_tower(tower_id, lat, lng, "master_hub", hub_specs))
+                tower_id += 1
+            nodes.mark_covered(lat, lng, hub_specs["range"])
+
+    rng = random.Random(seed) if seed is not None else None
+    with metrics.stage("fill"):
+        for best_cand, tech, max_gain in fill_towers(nodes, specs, algorithm, rng):
+            add_tower(new_tower(tower_id, float(nodes.lat[best_cand]), float(nodes.lng[best_cand]), "standard_tower", tech))
+            tower_id += 1
+            if terrains:
+                log(f"FILL: Added {tech['tech']} tower covering {max_gain:.2f} km².")
+            else:
+                log(f"FILL: Added tower covering {max_gain:.2f} km².")
+
+    towers, changed = refine_towers(nodes, towers, refine_ms, log)
+    if changed and progress:
+        progress("refine", towers)
+    return towers, logs, nodes
+
+def refine_towers(nodes, towers, refine_ms, log):
+    """Local-search pass over a finished placement; towers are renumbered TWR-01.. if it changed anything."""
+    with metrics.stage("refine"):
+        refined, moves = refine_placement(nodes, towers, refine_budget(refine_ms), fill_site_ok(nodes))
+    if not any(moves.values()):
+        return towers, False
+    saved = sum(t["cost"] for t in towers) - sum(t["cost"] for t in refined)
+    log(f"REFINE: {moves['dropped']} dropped, {moves['swapped']} pairs merged, {moves['shifted']} shifted. "
+        f"Saved {len(towers) - len(refined)} towers (₹{saved:,}).")
+    return [{**t, "id": f"TWR-{i:02d}"} for i, t in enumerate(refined, start=1)], True
+
+def analyze_critical_links(nodes, towers):
+    """
+    Link every critical node to its closest tower within 105% of that tower's range.
+    Links carry the tower's id, since two towers may share a position.
+    """
+    links = []
+    critical_analysis = []
+    tindex = tower_index(towers)
+    max_reach = max((t["range"] for t in towers), default=0) * 1.05
+    
+    for ci in nodes.critical_indices():
+        n_lat, n_lng = float(nodes.lat[ci]), float(nodes.lng[ci])
+        closest = None
+        min_d = float('inf')
+        idx, dists = tindex.query_radius(n_lat, n_lng, max_reach, return_dist=True)
+        for k, d in zip(idx.tolist(), dists.tolist()):
+            t = towers[k]
+            if d <= (t["range"] * 1.05):
+                if d < min_d:
+                    min_d = d
+                    closest = t
+        
+        if closest:
+            links.append({"from": [n_lat, n_lng], "to": [closest["lat"], closest["lng"]], "to_id": closest["id"]})
+            critical_analysis.append({ "name": nodes.name(ci), "status": "Connected", "dist": f"{min_d:.2f}km" })
+        else:
+            critical_analysis.append({ "name": nodes.name(ci), "status": "Offline", "dist": "N/A" })
+    
+    return links, critical_analysis
+
+def build_plan(data, seed=None, progress=None):
+    """Full planning pipeline for one PlanningRequest; `seed` overrides data.seed."""
+    return sampled_plan(data, seed, progress)[0]
+
+def sampled_plan(data, seed=None, progress=None):
+    """Worker job: build_plan, also returning each polygon's node sample (PlanState.blocks, reused by replans)."""
+    seed = data.seed if seed is None else seed
+    terrains = data.polygon_terrains
+    nodes = generate_grid(data.polygons, data.critical_nodes, data.terrain_type, data.grid, terrains)
+    towers, logs, processed_nodes = optimize_network(nodes, data.polygons, data.terrain_type, data.algorithm, seed, progress,
+                                                     data.refine_ms, terrains)
+    return assemble_plan(data, towers, logs, processed_nodes), processed_nodes.blocks
+
+def assemble_plan(data, towers, logs, processed_nodes):
+    """Links, cost and KPI blocks around a finished tower placement."""
+    with metrics.stage("links"):
+        links, critical_analysis = analyze_critical_links(processed_nodes, towers)
+    metrics.count("towers", len(towers))
+
+    # --- COST CALCULATION ---
+    total_cost = sum(t["cost"] for t in towers)
+    # Legacy cost is calculated for the same towers, each with its terrain's expensive legacy tech
+    legacy_total_cost = sum(t["legacy_cost"] for t in towers)
+    tech_counts = {}
+    for t in towers:
+        tech_counts[t["tech"]] = tech_counts.get(t["tech"], 0) + 1
+    tech = "N/A" if not towers else towers[0]["tech"] if len(tech_counts) == 1 else "Mixed"
+    
+    area = processed_nodes.area_km2
+    coverage = (1 - processed_nodes.uncovered_share()) * 100 if area > 0 else 0.0
+
+    return {
+        "kpis": { 
+            "total_towers": len(towers), 
+            "capex": total_cost, 
+            "legacy_capex": legacy_total_cost, # NEW FIELD
+            "area": round(area, 2),
+            "coverage_pct": round(coverage, 1)
+        },
+        "metrics": { "cost": total_cost, "count": len(towers), "area": round(area, 2), "tech": tech },
+        "critical_analysis": critical_analysis,
+        # Mixed plans have no single radius; radius_by_tech gives each tech's
+        "terrain_breakdown": { "tech": tech, "radius": None if tech == "Mixed" else towers[0]["range"] if towers else 0,
+                               "radius_by_tech": {t["tech"]: t["range"] for t in towers}, "towers_by_tech": tech_counts },
+        "links": links,
+        "logs": logs,
+        "towers": towers
+    }
+
+# --- PARTITIONED PLANNING ---
+def plan_clusters(data, clusters, crit_ids, seed, progress=None):
+    """
+    Worker job: plan each (cluster_no, polygon indices) on its own node pool with
+    its share of the critical nodes. Returns one (towers, logs, nodes) per cluster.
+    With `progress`, log lines and towers stream as they are placed, tagged with
+    their cluster (see cluster_progress).
+    """
+    parts = []
+    for (ci, cluster), ids in zip(clusters, crit_ids):
+        polys = [data.polygons[i] for i in cluster]
+        terrains = [data.polygon_terrains[i] for i in cluster] if data.polygon_terrains else None
+        nodes = generate_grid(polys, [data.critical_nodes[k] for k in ids], data.terrain_type, data.grid, terrains)
+        part_seed = None if seed is None else seed + ci
+        parts.append(optimize_network(nodes, polys, data.terrain_type, data.algorithm, part_seed,
+                                      cluster_progress(progress, ci), data.refine_ms, terrains))
+    return parts
+
+def cluster_progress(progress, ci):
+    """
+    Progress callback for one cluster: log lines get a "CLUSTER n:" prefix and
+    towers a "cluster" field. Its "refine" list is not forwarded; the merge ends
+    the stream with a "merged" event holding the final towers of every cluster.
+    """
+    if progress is None:
+        return None
+
+    def report(kind, payload):
+        if kind == "log":
+            progress("log", f"CLUSTER {ci}: {payload}")
+        elif kind == "tower":
+            progress("tower", {**payload, "cluster": ci})
+    return report
+
+def merge_plan(data, parts, assigned, seed, progress=None):
+    """
+    Worker job: merge per-cluster placements into one plan.
+    Coverage is recomputed on the merged pool from the kept towers, and the fill
+    engine tops it up if dropping duplicate hubs broke the 95% rule (followed by
+    a refinement pass, since the clusters were refined before the top-up).
+    The clusters streamed their own progress; `progress` gets the merge's log
+    lines and top-up towers, then one "merged" event with the final tower list.
+    """
+    specs = TECH_MATRIX.get(data.terrain_type, DEFAULT_TECH)
+    with metrics.stage("merge"):
+        towers, part_logs, nodes, dropped = merge_partitions(parts, assigned, len(data.critical_nodes))
+        for t in towers:
+            nodes.mark_covered(t["lat"], t["lng"], t["range"])
+    logs = [init_line(specs, data.polygon_terrains)] + part_logs
+
+    def log(line):
+        logs.append(line)
+        if progress: progress("log", line)
+
+    log(f"MERGE: {len(parts)} regions planned in parallel, {dropped} duplicate hubs dropped.")
+
+    rng = random.Random(seed) if seed is not None else None
+    merged = len(towers)
+    with metrics.stage("fill"):
+        for best_cand, tech, max_gain in fill_towers(nodes, specs, data.algorithm, rng):
+            towers.append(new_tower(len(towers) + 1, float(nodes.lat[best_cand]), float(nodes.lng[best_cand]), "standard_tower", tech))
+            if progress: progress("tower", towers[-1])
+            if data.polygon_terrains:
+                log(f"FILL: Added {tech['tech']} tower covering {max_gain:.2f} km².")
+            else:
+                log(f"FILL: Added tower covering {max_gain:.2f} km².")
+    if len(towers) > merged:
+        towers, _ = refine_towers(nodes, towers, data.refine_ms, log)
+
+    if progress:
+        progress("merged", towers)
+    return assemble_plan(data, towers, logs, nodes)
+
+async def run_plan(data, seed, progress=None):
+    """
+    Build a plan on PLANNER. Requests whose polygons fall into 2+ independent
+    clusters are planned per cluster across workers and merged; the rest run
+    build_plan as one job. Returns (plan, per-polygon node samples for
+    PlanState, stage timings or None when metrics are off).
+    """
+    terrains = data.polygon_terrains or [data.terrain_type]
+    radius = max(TECH_MATRIX.get(t, DEFAULT_TECH)["range"] for t in terrains)
+    clusters = cluster_polygons(data.polygons, LINK_FACTOR * radius)
+    if len(clusters) < 2:
+        (result, blocks), timings = await PLANNER.run(metrics.timed_call, sampled_plan, data, seed, progress=progress)
+        metrics.observe_plan(timings)
+        return result, blocks, timings
+
+    assigned = assign_critical_nodes(data.polygons, data.critical_nodes, clusters, get_centroid)
+    weights = [cluster_weight(data.polygons, c) for c in clusters]
+    groups = balance_groups(weights, max(1, PLANNER.workers))
+    group_runs = await PLANNER.run_many(metrics.timed_call, [
+        (plan_clusters, data, [(ci, clusters[ci]) for ci in group], [assigned[ci] for ci in group], seed)
+        for group in groups
+    ], progress=progress)
+
+    # Back to cluster order so the merge (and tower numbering) is independent of the worker count
+    parts = [None] * len(clusters)
+    timings = metrics.Timings()
+    for group, (results, part_timings) in zip(groups, group_runs):
+        for ci, part in zip(group, results):
+            parts[ci] = part
+        if part_timings:
+            timings.merge(part_timings)
+    result, merge_timings = await PLANNER.run(metrics.timed_call, merge_plan, data, parts, assigned, seed, progress=progress)
+    blocks = cluster_samples(data, clusters, assigned, parts)
+    if merge_timings is None:
+        return result, blocks, None
+    timings = timings.merge(merge_timings).snapshot()
+    metrics.observe_plan(timings)
+    return result, blocks, timings
+
+def cluster_samples(data, clusters, assigned, parts):
+    """
+    Per-polygon node samples of a multi-cluster plan, taken from its clusters.
+    A cluster was sampled with its own critical nodes only, so a polygon that
+    another cluster's critical node could have refined is left None.
+    """
+    terrains = data.polygon_terrains or [data.terrain_type] * len(data.polygons)
+    blocks = [None] * len(data.polygons)
+    for cluster, ids, (_, _, nodes) in zip(clusters, assigned, parts):
+        own = set(ids)
+        others = [c for k, c in enumerate(data.critical_nodes) if k not in own]
+        for pi, block in zip(cluster, nodes.blocks):
+            radius = TECH_MATRIX.get(terrains[pi], DEFAULT_TECH)["range"]
+            if reusable(data.polygons[pi], radius, data.grid, others):
+                blocks[pi] = block
+    return blocks
+
+# --- INCREMENTAL REPLANNING ---
+def tower_number(tower):
+    return int(tower["id"].rsplit("-", 1)[-1])
+
+def edit_request(state, edit):
+    """The stored plan's request with `edit` applied, plus what replan_network needs to know about the change."""
+    old = state.data
+    terrains = old.polygon_terrains or [old.terrain_type] * len(old.polygons)
+    try:
+        polys, terrains, crits, origin, boxes, moved_critical = apply_edit(
+            old.polygons, terrains, old.critical_nodes, edit, old.terrain_type)
+        data = PlanningRequest(polygons=polys, critical_nodes=crits, terrain_type=old.terrain_type, polygon_terrains=terrains,
+                               algorithm=old.algorithm, grid=old.grid, seed=old.seed, refine_ms=old.refine_ms)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return data, origin, boxes, moved_critical
+
+def replan_network(state, data, origin, boxes, moved_critical, seed):
+    """
+    Worker job: replan a stored plan (`state`) for its edited request `data`
+    (from edit_request) without starting over.
+    Only polygons whose geometry changed, or whose adaptive sample an edited
+    critical node reaches, are resampled. Hubs follow the anchor rule on the
+    new inputs, reusing the old hub (and its id) on the same site. Fill towers
+    are kept unless they no longer cover anything of their own, or stand by the
+    edit and the 95% rule holds without them; the fill engine then covers what
+    the edit left open, numbering new towers after the highest old id.
+    The local-search pass is skipped so kept towers stay where they were.
+    Returns (plan, PlanState of the result).
+    """
+    terrains = data.polygon_terrains or [data.terrain_type] * len(data.polygons)
+    specs = TECH_MATRIX.get(data.terrain_type, DEFAULT_TECH)
+    radii = [TECH_MATRIX.get(t, DEFAULT_TECH)["range"] for t in terrains]
+    crit_lat = np.array([c.lat for c in data.critical_nodes], dtype=np.float64)
+    crit_lng = np.array([c.lng for c in data.critical_nodes], dtype=np.float64)
+
+    with metrics.stage("grid"):
+        blocks, resampled = [], 0
+        for i, poly in enumerate(data.polygons):
+            k = origin[i]
+            if state.blocks is not None and k is not None and state.blocks[k] is not None and \
+                    reusable(poly, radii[i], data.grid, moved_critical):
+                blocks.append(state.blocks[k])
+            else:
+                blocks.append(polygon_nodes(poly, data.grid, radii[i], crit_lat, crit_lng))
+                resampled += 1
+        codes = [terrain_code(t) for t in terrains] if data.polygon_terrains else None
+        nodes = node_set_from_blocks(data.critical_nodes, blocks, codes)
+    metrics.count("nodes", len(nodes))
+
+    next_id = max((tower_number(t) for t in state.towers), default=0) + 1
+    old_hubs = [t for t in state.towers if t["type"] == "master_hub"]
+    old_lat = np.array([t["lat"] for t in old_hubs], dtype=np.float64)
+    old_lng = np.array([t["lng"] for t in old_hubs], dtype=np.float64)
+    free = np.ones(len(old_hubs), dtype=bool)
+    towers = []
+    with metrics.stage("anchors"):
+        for lat, lng, hub_specs, _, duplicate in anchor_sites(nodes, data.polygons, specs, data.polygon_terrains):
+            if duplicate:
+                continue
+            same = free & within_km(lat, lng, old_lat, old_lng, HUB_DEDUPE_KM)
+            same &= np.array([t["tech"] == hub_specs["tech"] for t in old_hubs], dtype=bool)
+            if same.any():
+                k = int(np.flatnonzero(same)[0])
+                free[k] = False
+                towers.append(old_hubs[k])
+            else:
+                towers.append(new_tower(next_id, lat, lng, "master_hub", hub_specs))
+                next_id += 1
+
+    with metrics.stage("retire"):
+        n_hubs = len(towers)
+        towers += [t for t in state.towers if t["type"] != "master_hub"]
+        cover = CoverageState(nodes, towers)
+        threshold = MAX_UNCOVERED_SHARE * nodes.area_km2
+        t_lat = np.array([t["lat"] for t in towers], dtype=np.float64)
+        t_lng = np.array([t["lng"] for t in towers], dtype=np.float64)
+        t_range = np.array([t["range"] for t in towers], dtype=np.float64)
+        by_edit = np.zeros(len(towers), dtype=bool)
+        for box in boxes:
+            by_edit |= box_distance_km(t_lat, t_lng, box) <= t_range
+
+        def own_area(r):
+            m = cover.members[r]
+            return float(nodes.weight[m[cover.count[m] == 1]].sum())
+
+        retired = set()
+        for r in sorted(range(n_hubs, len(towers)), key=lambda r: (own_area(r), -r)):
+            lost, crit = cover.release([r])
+            if not len(crit) and (lost <= 0 or (by_edit[r] and cover.uncovered + lost < threshold)):
+                cover.uncovered += lost
+                retired.add(r)
+            else:
+                cover.restore([r])
+        nodes.covered = cover.count > 0
+        towers = [t for i, t in enumerate(towers) if i not in retired]
+
+    kept = sum(t["id"] in {o["id"] for o in state.towers} for t in towers)
+    fills = []
+    rng = random.Random(seed) if seed is not None else None
+    with metrics.stage("fill"):
+        for best_cand, tech, max_gain in fill_towers(nodes, specs, data.algorithm, rng):
+            towers.append(new_tower(next_id, float(nodes.lat[best_cand]), float(nodes.lng[best_cand]), "standard_tower", tech))
+            next_id += 1
+            if data.polygon_terrains:
+                fills.append(f"FILL: Added {tech['tech']} tower covering {max_gain:.2f} km².")
+            else:
+                fills.append(f"FILL: Added tower covering {max_gain:.2f} km².")
+
+    logs = [init_line(specs, data.polygon_terrains),
+            f"REPLAN: {resampled} of {len(data.polygons)} polygons resampled. "
+            f"Kept {kept} towers, retired {len(state.towers) - kept}, added {len(towers) - kept}."] + fills
+    return assemble_plan(data, towers, logs, nodes), PlanState(data, towers, blocks)
+
+async def replanned_plan(edit, timing=False):
+    """
+    Serve an incremental replan of a plan this instance holds (see replan_network).
+    The result gets a plan id of its own, derived from the edited plan's id and
+    the edit, and is cached and stored like a full plan so it can be edited again.
+    """
+    start = time.perf_counter()
+    key = replan_key(edit.plan_id, edit.model_dump(exclude={"plan_id"}))
+    result = PLAN_CACHE.get(key)
+    cache, timings = "hit", None
+    if result is None or PLAN_STATES.get(key) is None:
+        state = PLAN_STATES.get(edit.plan_id)
+        if state is None:
+            raise HTTPException(status_code=404, detail="Plan not found. Recalculate the plan and edit its new plan_id.")
+        data, origin, boxes, moved_critical = edit_request(state, edit)
+        seed = data.seed if data.seed is not None else key_seed(key)
+        cache = "miss"
+        (result, new_state), timings = await PLANNER.run(metrics.timed_call, replan_network,
+                                                         state, data, origin, boxes, moved_critical, seed)
+        metrics.observe_plan(timings)
+        result = {**result, "plan_id": key}
+        PLAN_CACHE.put(key, result)
+        PLAN_STATES.put(key, new_state)
+    TOPOLOGIES.ensure(key, result["towers"])
+    if not timing:
+        return result
+    return {**result, "timing": {"cache": cache, "total_sec": round(time.perf_counter() - start, 6), **(timings or {})}}
+
+async def cached_plan(data, timing=False):
+    """
+    Serve a plan from PLAN_CACHE, building it on PLANNER on a miss.
+    Unseeded requests are seeded from their cache key, so a cached answer is
+    exactly what a fresh computation would return.
+    With `timing`, a copy of the plan carries a "timing" block (cache, total, per-stage seconds).
+    """
+    start = time.perf_counter()
+    key = plan_key(data)
+    result = PLAN_CACHE.get(key)
+    cache, timings = "hit", None
+    if result is None:
+        cache = "miss"
+        result, blocks, timings = await run_plan(data, data.seed if data.seed is not None else key_seed(key))
+        result = {**result, "plan_id": key}
+        PLAN_CACHE.put(key, result)
+        PLAN_STATES.ensure(key, data, result["towers"], blocks)
+    TOPOLOGIES.ensure(key, result["towers"])
+    PLAN_STATES.ensure(key, data, result["towers"])
+    if not timing:
+        return result
+    return {**result, "timing": {"cache": cache, "total_sec": round(time.perf_counter() - start, 6), **(timings or {})}}
+
+async def plan_response(data, request, timing=False, format="full", raster=False):
+    """
+    /calculate-plan body. The default is the plain JSON plan. `format=compact`
+    (columnar towers/links, see compact.py) or `raster` (a packed coverage
+    bitmap) go through content negotiation: MessagePack or JSON, then brotli
+    or gzip, as the client's Accept and Accept-Encoding headers allow.
+    """
+    result = await cached_plan(data, timing)
+    return shaped_response(result, data.polygons, request, format, raster)
+
+def shaped_response(result, polygons, request, format="full", raster=False):
+    if format == "full" and not raster:
+        return result
+    # Loaded on first use: pulls in the optional msgpack / brotli encoders
+    from compact import compact_plan, coverage_raster, encode_response
+    body = compact_plan(result) if format == "compact" else dict(result)
+    if raster:
+        body["raster"] = coverage_raster(polygons, result["towers"])
+    return encode_response(body, request.headers.get("accept", ""), request.headers.get("accept-encoding", ""))
+
+def weather_batch(data):
+    """Readings for every village in a WeatherBatchRequest, keyed by village id."""
+    if len(data.village_ids) > weather.MAX_BATCH_VILLAGES:
+        raise HTTPException(status_code=422, detail=f"At most {weather.MAX_BATCH_VILLAGES} villages per request.")
+    return {"villages": weather.check_many(data.village_ids, data.tech_type, data.simulate)}
+
+def traffic_policy(village_id):
+    """Compiled classifier for a village's current network policy, or standard access without a village."""
+    policy = weather.VILLAGES.current(village_id)["network_policy"] if village_id else weather.STANDARD_POLICY
+    return TRAFFIC.get(policy)
+
+def traffic_classify(data):
+    """Class (critical / throttled / blocked / standard) and bandwidth share per hostname, as parallel arrays."""
+    if len(data.hosts) > MAX_JSON_HOSTS:
+        raise HTTPException(status_code=422, detail=f"At most {MAX_JSON_HOSTS} hosts per request; post logs to /traffic/classify/stream.")
+    policy = traffic_policy(data.village_id)
+    decisions = policy.classify_many(data.hosts)
+    return {
+        "policy": policy.status,
+        "class": [d[0] for d in decisions],
+        "bandwidth_pct": [d[1] for d in decisions],
+    }
+
+async def traffic_log_summary(request, village_id):
+    """
+    Classify a relay log posted as the raw request body, one flow per line
+    (sni= / host= field or first token), read chunk by chunk so memory stays
+    flat. Returns flow counts per class and the busiest hosts of each.
+    """
+    policy = traffic_policy(village_id)
+    tally = await classify_stream(policy, request.stream(), FlowTally())
+    return {"policy": policy.status, **tally.summary()}
+
+# --- NETWORK LOOKUP ---
+def network_topology(plan_id, towers):
+    """Topology of a served plan by id, or an ad-hoc one over a posted tower list."""
+    if plan_id is not None:
+        topo = TOPOLOGIES.get(plan_id)
+        if topo is None:
+            raise HTTPException(status_code=404, detail="Plan not found. Recalculate the plan or send its towers.")
+        return topo
+    if towers is None:
+        raise HTTPException(status_code=422, detail="Send either plan_id or towers.")
+    return Topology(towers)
+
+def node_location(topo, node_id, lat, lng):
+    """Position of an affected node: as posted, else that of the plan tower with the same id."""
+    if lat is not None and lng is not None:
+        return float(lat), float(lng)
+    row = topo.row.get(node_id)
+    if row is None:
+        raise HTTPException(status_code=422, detail=f"Node {node_id} is not a tower of this plan; send its lat/lng.")
+    return float(topo.lat[row]), float(topo.lng[row])
+
+# --- PHASE 2: DRONE DEPLOYMENT LOGIC ---
+def drone_timeline(distance_km):
+    travel_time = distance_km / (DRONE_CONFIG["speed_kmh"] / 3600) if DRONE_CONFIG["speed_kmh"] > 0 else 5
+    return {
+        "impact_seconds": IMPACT_TIME_SEC,
+        "drone_setup_sec": DRONE_CONFIG["setup_time_sec"],
+        "drone_travel_distance_km": round(distance_km, 2),
+        "drone_travel_time_sec": round(travel_time, 2),
+        "total_deployment_time_sec": round(IMPACT_TIME_SEC + DRONE_CONFIG["setup_time_sec"] + travel_time, 2)
+    }
+
+def drone_deployment(tower, node):
+    return {
+        "from_tower": tower["id"],
+        "from_location": [tower["lat"], tower["lng"]],
+        "to_node": node["id"],
+        "to_location": [node["lat"], node["lng"]],
+        "drone_path": [
+            [tower["lat"], tower["lng"]],
+            [node["lat"], node["lng"]]
+        ]
+    }
+
+# --- RESILIENCE SIMULATION ---
+async def simulate_resilience(data):
+    """
+    Monte Carlo run of randomized disasters against a plan's towers, spread over
+    PLANNER in batches (see simulate.py). Shared by main.py and index.py.
+    """
+    if not 1 <= data.runs <= MAX_RUNS:
+        raise HTTPException(status_code=422, detail=f"runs must be between 1 and {MAX_RUNS}.")
+    types = list(dict.fromkeys(data.disasters)) if data.disasters else DISASTER_TYPES
+    unknown = [t for t in types if t not in DISASTER_TYPES]
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown disaster {unknown[0]!r}; choose from {DISASTER_TYPES}.")
+    topo = network_topology(data.plan_id, data.towers)
+    if not len(topo):
+        raise HTTPException(status_code=422, detail="The plan has no towers.")
+    critical = data.critical_nodes
+    if critical is None:
+        state = PLAN_STATES.get(data.plan_id) if data.plan_id is not None else None
+        if state is None:
+            raise HTTPException(status_code=422, detail="Send critical_nodes; they are only known for plans served by this instance.")
+        critical = state.data.critical_nodes
+    critical = [(c.lat, c.lng) for c in critical]
+    capacity = data.max_drones_per_tower if data.max_drones_per_tower is not None else DRONE_CONFIG["max_per_tower"]
+    seed = data.seed if data.seed is not None else random.getrandbits(32)
+
+    start = time.perf_counter()
+    towers = [topo.tower(i) for i in range(len(topo))]
+    parts = await PLANNER.run_many(simulate_batches, [
+        (towers, critical, seed, batches, data.runs, types, capacity)
+        for batches in plan_batches(data.runs, max(1, PLANNER.workers))
+    ])
+    return {
+        "seed": seed,
+        "towers": len(topo),
+        "disasters": types,
+        "max_drones_per_tower": capacity,
+        **summarize(merge_results(parts), types, critical, DRONE_CONFIG["cost"]),
+        "elapsed_sec": round(time.perf_counter() - start, 3),
+    }
+
+# --- PHASE 3: REROUTE LOGIC ---
+def reroute(data):
+    """
+    Link a dead tower to its nearest live neighbour (shared by main.py and index.py).
+    The link is range-checked: the nearest tower whose coverage overlaps the dead
+    one's is used; with none in range, the nearest tower gets the link and drone
+    relays close the gap. Bridging whole components is /reroute-network/multi.
+    """
+    topo = network_topology(data.plan_id, data.towers)
+    row = topo.row.get(data.dead_node_id)
+    if row is None: return {"error": "Node not found"}
+    dead_node = topo.tower(row)
+
+    near = topo.neighbors(row)
+    if len(near):
+        d = topo.distances([row], near)[0]
+        k, dist = int(near[np.argmin(d)]), float(d.min())
+    else:
+        k, dist = topo.nearest(dead_node["lat"], dead_node["lng"], [row])
+    new_links = []
+
+    if k is not None:
+        nearest_neighbor = topo.tower(k)
+        relays = relay_positions(nearest_neighbor["lat"], nearest_neighbor["lng"], nearest_neighbor["range"],
+                                 dead_node["lat"], dead_node["lng"], dead_node["range"], dist)
+        new_links.append({
+            "from": [nearest_neighbor["lat"], nearest_neighbor["lng"]],
+            "to": [dead_node["lat"], dead_node["lng"]],
+            "from_id": nearest_neighbor["id"],
+            "to_id": dead_node["id"],
+            "distance_km": round(dist, 3),
+            "in_range": not relays,
+            "relays": relays
+        })
+
+    drones = sum(len(link["relays"]) for link in new_links)
+    return {
+        "status": "REROUTED",
+        "new_links": new_links,
+        "drones_needed": drones,
+        "drone_cost": drones * DRONE_CONFIG["cost"]
+    }
+
+def repair_response(topo, state, unknown=()):
+    """
+    Reroute answer for a NetworkState's failures: the bridges of repair_plan,
+    each with the drone relays that close its gap, so every link is in range.
+    """
+    isolated = state.isolated()
+    has_hub = any(h > 0 for h in state.hubs.values())
+    new_links = []
+    for a, b, dist, _ in state.repair_plan():
+        relays = relay_positions(float(topo.lat[a]), float(topo.lng[a]), float(topo.range[a]),
+                                 float(topo.lat[b]), float(topo.lng[b]), float(topo.range[b]), dist)
+        new_links.append({
+            "from": [float(topo.lat[b]), float(topo.lng[b])],
+            "to": [float(topo.lat[a]), float(topo.lng[a])],
+            "from_id": topo.ids[b],
+            "to_id": topo.ids[a],
+            "distance_km": round(dist, 3),
+            "relays": relays
+        })
+
+    if not isolated:
+        status = "CONNECTED"
+    elif not has_hub:
+        status = "NO_HUB"
+    else:
+        status = "REROUTED"
+    drones = sum(len(link["relays"]) for link in new_links)
+    return {
+        "status": status,
+        "failed": [topo.ids[r] for r in state.failed],
+        "unknown": list(unknown),
+        "components": len(state.members),
+        "isolated_components": [sorted(topo.ids[r] for r in state.members[c]) for c in isolated],
+        "new_links": new_links,
+        "drones_needed": drones,
+        "drone_cost": drones * DRONE_CONFIG["cost"]
+    }
@@ -0,0 +1,202 @@
+import os
+
+import numpy as np
+
+from distance import haversine_km
+from placement import MAX_UNCOVERED_SHARE, candidate_sites
+from spatial import SpatialIndex
+
+# --- REFINE CONFIG (env overridable) ---
+# REFINE_BUDGET_MS=0 skips the pass; a request may ask for up to REFINE_MAX_BUDGET_MS
+REFINE_BUDGET_MS = float(os.environ.get("REFINE_BUDGET_MS", 200))
+REFINE_MAX_BUDGET_MS = float(os.environ.get("REFINE_MAX_BUDGET_MS", 2000))
+EVALS_PER_MS = 60    # Move evaluations a budget millisecond buys (about one core's rate); fixed so seeded plans repeat
+MAX_ROUNDS = 8       # Local-search sweeps over the fill towers, on top of the evaluation budget
+MOVE_SITES = 24      # Candidate sites tried per shift / swap move, nearest first
+SWAP_PARTNERS = 4    # Nearest fill towers tried as the second tower of a swap
+
+
+def refine_budget(requested_ms=None):
+    """
+    Move evaluations for one plan: the request's budget in ms (capped) or the
+    server default, converted at EVALS_PER_MS. Counting work instead of reading
+    the clock keeps a seeded plan the same under any machine load.
+    """
+    ms = REFINE_BUDGET_MS if requested_ms is None else min(max(requested_ms, 0), REFINE_MAX_BUDGET_MS)
+    return int(ms * EVALS_PER_MS)
+
+
+class CoverageState:
+    """
+    Per-node tower counts for one placement. A move releases some towers and
+    adds one, and its effect on the uncovered area and on critical nodes is
+    read off the nodes those towers reach; nothing is recomputed globally.
+    """
+    def __init__(self, nodes, towers):
+        self.nodes = nodes
+        self.indexes = {}
+        self.count = np.zeros(len(nodes), dtype=np.int32)
+        self.members = []
+        for t in towers:
+            m = self.reach(t["lat"], t["lng"], t["range"])
+            self.members.append(m)
+            self.count[m] += 1
+        self.uncovered = float(nodes.weight[self.count == 0].sum())
+
+    def reach(self, lat, lng, radius):
+        """Nodes within `radius` of (lat, lng), from a node index per distinct tower range."""
+        index = self.indexes.get(radius)
+        if index is None:
+            # The node set keeps one index (the fill's); extra ranges get their own
+            index = self.nodes.spatial_index(radius) if not self.indexes else SpatialIndex(self.nodes.lat, self.nodes.lng, radius)
+            self.indexes[radius] = index
+        return index.query_radius(lat, lng, radius)
+
+    def release(self, rows):
+        """Take towers `rows` out. Returns (area lost in km^2, critical node rows left uncovered)."""
+        for r in rows:
+            self.count[self.members[r]] -= 1
+        touched = np.unique(np.concatenate([self.members[r] for r in rows]))
+        lost = touched[self.count[touched] == 0]
+        return float(self.nodes.weight[lost].sum()), lost[self.nodes.is_critical[lost]]
+
+    def restore(self, rows):
+        for r in rows:
+            self.count[self.members[r]] += 1
+
+    def gain(self, members):
+        """Area (km^2) a tower over `members` adds to the current coverage."""
+        return float(self.nodes.weight[members[self.count[members] == 0]].sum())
+
+    def place(self, row, members, uncovered):
+        self.count[members] += 1
+        self.members[row] = members
+        self.uncovered = uncovered
+
+
+def refine_placement(nodes, towers, budget, site_ok=None):
+    """
+    Local search over the fill towers after the greedy pass. Hubs stay put, so
+    every critical node keeps its anchor. Moves:
+      drop  - remove a tower if the rest still meet the 95% rule,
+      swap  - replace two nearby towers with one at a candidate site,
+      shift - move a tower to the nearby site that covers the most extra area,
+              which frees room for later drops and swaps.
+    No move uncovers a critical node or takes the uncovered share above
+    MAX_UNCOVERED_SHARE (or above where the fill left it, when the fill could
+    not reach the rule). Stops when a sweep changes nothing, after MAX_ROUNDS
+    sweeps, or once `budget` move evaluations (a drop test or a candidate
+    site scored) have been spent. Towers keep their own tech and
+    range through moves; `site_ok(node_index, tower)`, if given, limits the
+    candidate sites a tower may move to.
+    Returns (towers, stats); `nodes.covered` is updated to the result.
+    """
+    stats = {"dropped": 0, "swapped": 0, "shifted": 0}
+    fills = {i for i, t in enumerate(towers) if t["type"] != "master_hub"}
+    total = nodes.area_km2
+    if budget <= 0 or not fills or total <= 0:
+        return towers, stats
+
+    spent = [0]
+    towers = [dict(t) for t in towers]
+    state = CoverageState(nodes, towers)
+    radius = min(towers[i]["range"] for i in fills)
+    threshold = MAX_UNCOVERED_SHARE * total
+    start = state.uncovered
+
+    def meets_rule(uncovered):
+        return uncovered < threshold if start < threshold else uncovered <= start
+
+    alive = set(fills)
+    sites = candidate_sites(nodes, radius)
+    site_index = SpatialIndex(nodes.lat[sites], nodes.lng[sites], radius)
+    site_members = {}
+
+    def members_of(k, reach):
+        if (k, reach) not in site_members:
+            site_members[k, reach] = state.reach(float(nodes.lat[sites[k]]), float(nodes.lng[sites[k]]), reach)
+        return site_members[k, reach]
+
+    def try_drop(r):
+        spent[0] += 1
+        lost, crit = state.release([r])
+        if not len(crit) and meets_rule(state.uncovered + lost):
+            state.uncovered += lost
+            alive.discard(r)
+            stats["dropped"] += 1
+            return True
+        state.restore([r])
+        return False
+
+    def try_replace(rows, lat, lng, accept):
+        """Release `rows` and put rows[0] on the best site within its range of (lat, lng), if `accept` takes it."""
+        tower = towers[rows[0]]
+        reach = tower["range"]
+        lost, crit = state.release(rows)
+        found, dist = site_index.query_radius(lat, lng, reach, return_dist=True)
+        best = None
+        for k in found[np.argsort(dist, kind="stable")[:MOVE_SITES]].tolist():
+            spent[0] += 1
+            if site_ok is not None and not site_ok(int(sites[k]), tower):
+                continue
+            m = members_of(k, reach)
+            if len(crit) and not np.isin(crit, m).all():
+                continue
+            after = state.uncovered + lost - state.gain(m)
+            if best is None or after < best[1]:
+                best = (k, after)
+        if best is None or not accept(best[1]):
+            state.restore(rows)
+            return False
+        k, after = best
+        state.place(rows[0], members_of(k, reach), after)
+        tower["lat"] = float(nodes.lat[sites[k]])
+        tower["lng"] = float(nodes.lng[sites[k]])
+        alive.difference_update(rows[1:])
+        return True
+
+    def partners(r):
+        others = sorted(alive - {r})
+        if not others:
+            return []
+        d = haversine_km(towers[r]["lat"], towers[r]["lng"],
+                         np.array([towers[u]["lat"] for u in others]), np.array([towers[u]["lng"] for u in others]))
+        near = np.flatnonzero(d <= towers[r]["range"] + np.array([towers[u]["range"] for u in others]))
+        return [others[i] for i in near[np.argsort(d[near], kind="stable")][:SWAP_PARTNERS]]
+
+    # Towers whose coverage the others mostly duplicate go first; later placements break ties
+    def unique_area(r):
+        m = state.members[r]
+        return float(nodes.weight[m[state.count[m] == 1]].sum())
+
+    for r in sorted(alive, key=lambda r: (unique_area(r), -r)):
+        if spent[0] >= budget:
+            break
+        try_drop(r)
+
+    for _ in range(MAX_ROUNDS):
+        changed = False
+        for r in sorted(alive):
+            if spent[0] >= budget:
+                break
+            if r not in alive:
+                continue
+            if try_drop(r):
+                changed = True
+                continue
+            lat, lng = towers[r]["lat"], towers[r]["lng"]
+            for u in partners(r):
+                if try_replace([r, u], (lat + towers[u]["lat"]) / 2, (lng + towers[u]["lng"]) / 2, meets_rule):
+                    stats["swapped"] += 1
+                    changed = True
+                    break
+            else:
+                before = state.uncovered
+                if try_replace([r], lat, lng, lambda after: after < before - 1e-9):
+                    stats["shifted"] += 1
+                    changed = True
+        if not changed or spent[0] >= budget:
+            break
+
+    nodes.covered = state.count > 0
+    return [t for i, t in enumerate(towers) if i in alive or i not in fills], stats
@@ -0,0 +1,158 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from distance import haversine_rows
+from grid import COARSE_FRACTION, CRITICAL_REFINE
+
+# --- REPLAN CONFIG ---
+MAX_PLAN_STATES = 64   # Plans kept with their request (and node samples, once edited) for incremental replans
+
+
+class PlanState:
+    """
+    Starting point of an incremental replan: the request a plan answers, its
+    towers, and the node sample of each polygon (polygon_nodes output, aligned
+    with data.polygons). Plans record their samples when built; `blocks` is None
+    (or a polygon's entry is None) where they are unknown, and those polygons
+    are sampled afresh on the next edit.
+    """
+    def __init__(self, data, towers, blocks=None):
+        self.data = data
+        self.towers = towers
+        self.blocks = blocks
+
+
+class PlanStateStore:
+    """Thread-safe LRU of PlanStates, keyed by plan id."""
+    def __init__(self, max_entries=MAX_PLAN_STATES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, plan_id):
+        with self._lock:
+            state = self._entries.get(plan_id)
+            if state is not None:
+                self._entries.move_to_end(plan_id)
+            return state
+
+    def put(self, plan_id, state):
+        with self._lock:
+            self._entries[plan_id] = state
+            self._entries.move_to_end(plan_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def ensure(self, plan_id, data, towers, blocks=None):
+        """Keep the stored state for plan_id (adding `blocks` if it had no samples), or record a fresh one."""
+        state = self.get(plan_id)
+        if state is None:
+            state = PlanState(data, towers, blocks)
+            self.put(plan_id, state)
+        elif state.blocks is None:
+            state.blocks = blocks
+        return state
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "sampled": sum(s.blocks is not None for s in self._entries.values()),
+            }
+
+
+# --- EDITS ---
+def bbox(points):
+    """(lat_lo, lat_hi, lng_lo, lng_hi) of a polygon or point list."""
+    return (min(p.lat for p in points), max(p.lat for p in points),
+            min(p.lng for p in points), max(p.lng for p in points))
+
+
+def _check_indices(indices, n, what):
+    bad = [i for i in indices if not 0 <= i < n]
+    if bad:
+        raise ValueError(f"{what} index {bad[0]} out of range (plan has {n})")
+    if len(set(indices)) != len(indices):
+        raise ValueError(f"{what} index listed twice")
+
+
+def apply_edit(polygons, terrains, critical_nodes, edit, default_terrain):
+    """
+    Apply one edit to a plan's inputs. Indices in `edit` refer to the plan being
+    edited: moves replace entries in place, removals then drop entries, and
+    additions are appended. Raises ValueError on a bad index.
+    Returns (polygons, terrains, critical_nodes, origin, boxes, moved_critical):
+    origin[i] is the old index of polygon i if its geometry is unchanged (else None),
+    boxes the bounding boxes of old and new geometry of every edited polygon or
+    critical node, moved_critical the old and new positions of edited critical nodes.
+    """
+    moves = {m.index: m.polygon for m in edit.move_polygons}
+    _check_indices(list(moves) + edit.remove_polygons, len(polygons), "polygon")
+    _check_indices([m.index for m in edit.move_critical_nodes] + edit.remove_critical_nodes, len(critical_nodes), "critical node")
+    if set(moves) & set(edit.remove_polygons):
+        raise ValueError("polygon both moved and removed")
+    add_terrains = edit.add_polygon_terrains or [default_terrain] * len(edit.add_polygons)
+    if len(add_terrains) != len(edit.add_polygons):
+        raise ValueError("add_polygon_terrains needs one entry per added polygon")
+
+    boxes = []
+    removed = set(edit.remove_polygons)
+    new_polys, new_terrains, origin = [], [], []
+    for i, poly in enumerate(polygons):
+        if i in removed:
+            boxes.append(bbox(poly))
+            continue
+        if i in moves:
+            boxes += [bbox(p) for p in (poly, moves[i]) if p]
+            poly = moves[i]
+        new_polys.append(poly)
+        new_terrains.append(terrains[i])
+        origin.append(None if i in moves else i)
+    for poly, terrain in zip(edit.add_polygons, add_terrains):
+        if poly:
+            boxes.append(bbox(poly))
+        new_polys.append(poly)
+        new_terrains.append(terrain)
+        origin.append(None)
+
+    crit_moves = {m.index: m.point for m in edit.move_critical_nodes}
+    crit_removed = set(edit.remove_critical_nodes)
+    moved_critical = [critical_nodes[i] for i in sorted(crit_removed)] + list(edit.add_critical_nodes)
+    new_crit = []
+    for i, c in enumerate(critical_nodes):
+        if i in crit_removed:
+            continue
+        if i in crit_moves:
+            moved_critical += [c, crit_moves[i]]
+            c = crit_moves[i]
+        new_crit.append(c)
+    new_crit += edit.add_critical_nodes
+    boxes += [bbox([c]) for c in moved_critical]
+    return new_polys, new_terrains, new_crit, origin, boxes, moved_critical
+
+
+def reusable(poly, radius, mode, moved_critical):
+    """
+    Whether a polygon's old node sample still holds: the adaptive sampler only
+    refines cells within CRITICAL_REFINE * radius (plus half a cell diagonal)
+    of a critical node, and cell centres lie within half a coarse cell of the
+    polygon's bounding box, so edits to critical nodes farther out leave it unchanged.
+    """
+    if mode == "fixed" or not moved_critical or len(poly) <= 2:
+        return True
+    reach = radius * (CRITICAL_REFINE + 2 * COARSE_FRACTION)
+    lat = np.array([c.lat for c in moved_critical])
+    lng = np.array([c.lng for c in moved_critical])
+    return not (box_distance_km(lat, lng, bbox(poly)) <= reach).any()
+
+
+def box_distance_km(lat, lng, box):
+    """Distance from each point to a (lat_lo, lat_hi, lng_lo, lng_hi) box (0 inside it)."""
+    lat_lo, lat_hi, lng_lo, lng_hi = box
+    return haversine_rows(lat, lng, np.clip(lat, lat_lo, lat_hi), np.clip(lng, lng_lo, lng_hi))
@@ -0,0 +1,263 @@
+import math
+
+import numpy as np
+
+from connectivity import NetworkState, assign_drones, relay_positions
+from distance import KM_PER_DEG, haversine_pairwise
+from topology import Topology
+
+# --- SIMULATION CONFIG ---
+DEFAULT_RUNS = 1000
+MAX_RUNS = 20000          # Scenarios per request
+BATCH_RUNS = 250          # Scenarios evaluated together in one vectorized pass (and seeded together)
+EVENTS_PER_SCENARIO = 3   # Up to this many disasters strike in one scenario (at least one)
+MARGIN_KM = 5.0           # Disaster centres may fall this far outside the towers' bounding box
+CRITICAL_REACH = 1.05     # A critical node is served by a tower within 105% of its range (as analyze_critical_links)
+HISTOGRAM_BINS = 10
+
+# Spatial footprint per disaster type of weather.DISASTER_OPTIONS: an ellipse with a
+# random centre and heading. `kill` is the chance a tower inside it goes down.
+FOOTPRINTS = {
+    "Flash Flood Warning": {"length_km": (6, 25), "width_km": (0.5, 2.5), "kill": 0.9},   # River corridor
+    "Forest Fire":         {"length_km": (3, 12), "width_km": (2, 8),     "kill": 0.75},
+    "Severe Blizzard":     {"length_km": (15, 50), "width_km": (10, 40),  "kill": 0.35},  # Wide, patchy damage
+    "Landslide Alert":     {"length_km": (0.5, 4), "width_km": (0.3, 2),  "kill": 1.0},   # Small, total
+}
+DISASTER_TYPES = list(FOOTPRINTS)
+
+
+def batch_seed(seed, batch):
+    """RNG of scenario batch `batch`, so results do not depend on how batches are spread over workers."""
+    return np.random.default_rng([seed, batch])
+
+
+def draw_events(rng, runs, types, box):
+    """
+    Disasters of `runs` scenarios, as (runs, EVENTS_PER_SCENARIO) arrays in the
+    planar km frame of `box` (x0, x1, y0, y1): type index into `types` (-1 for an
+    unused slot), centre, semi-axes, heading and kill chance.
+    """
+    x0, x1, y0, y1 = box
+    shape = (runs, EVENTS_PER_SCENARIO)
+    count = rng.integers(1, EVENTS_PER_SCENARIO + 1, size=runs)
+    kind = rng.integers(0, len(types), size=shape)
+    kind[np.arange(EVENTS_PER_SCENARIO)[None, :] >= count[:, None]] = -1
+    specs = [FOOTPRINTS[t] for t in types]
+    lo_len, hi_len = (np.array([s["length_km"][i] for s in specs]) for i in (0, 1))
+    lo_wid, hi_wid = (np.array([s["width_km"][i] for s in specs]) for i in (0, 1))
+    k = np.maximum(kind, 0)
+    u = rng.random((4,) + shape)
+    return {
+        "kind": kind,
+        "cx": rng.uniform(x0 - MARGIN_KM, x1 + MARGIN_KM, size=shape),
+        "cy": rng.uniform(y0 - MARGIN_KM, y1 + MARGIN_KM, size=shape),
+        "a": (lo_len[k] + u[0] * (hi_len[k] - lo_len[k])) / 2,
+        "b": (lo_wid[k] + u[1] * (hi_wid[k] - lo_wid[k])) / 2,
+        "theta": u[2] * math.pi,
+        "kill": np.array([s["kill"] for s in specs])[k],
+    }
+
+
+def tower_damage(rng, events, x, y):
+    """(runs, towers) mask of towers knocked out: inside a footprint and unlucky, for any event."""
+    dx = x[None, None, :] - events["cx"][:, :, None]
+    dy = y[None, None, :] - events["cy"][:, :, None]
+    cos_t = np.cos(events["theta"])[:, :, None]
+    sin_t = np.sin(events["theta"])[:, :, None]
+    along = (dx * cos_t + dy * sin_t) / events["a"][:, :, None]
+    across = (dy * cos_t - dx * sin_t) / events["b"][:, :, None]
+    hit = (along**2 + across**2 <= 1) & (events["kind"] >= 0)[:, :, None]
+    hit &= rng.random(hit.shape) < events["kill"][:, :, None]
+    return hit.any(axis=1)
+
+
+def batch_components(u, v, alive):
+    """
+    Component labels of every scenario at once: each scenario's surviving graph is
+    one block of a block-diagonal graph, merged by hooking roots to the smaller
+    label and pointer jumping until no live edge joins two labels. Labels are
+    tower rows (the smallest of each component); dead towers keep their own.
+    """
+    runs, n = alive.shape
+    live = alive[:, u] & alive[:, v]
+    offset = np.arange(runs)[:, None] * n
+    src = (offset + u[None, :])[live]
+    dst = (offset + v[None, :])[live]
+    label = np.arange(runs * n)
+    while len(src):
+        ls, ld = label[src], label[dst]
+        cross = ls != ld
+        if not cross.any():
+            break
+        src, dst, ls, ld = src[cross], dst[cross], ls[cross], ld[cross]
+        np.minimum.at(label, np.maximum(ls, ld), np.minimum(ls, ld))
+        while True:
+            jumped = label[label]
+            if np.array_equal(jumped, label):
+                break
+            label = jumped
+    return (label - offset.ravel().repeat(n)).reshape(runs, n)
+
+
+def recover(topo, alive, comp, critical, covered, capacity):
+    """
+    Apply the reroute and drone logic to one damaged network: relay drones on
+    the bridges that rejoin hubless pieces to a hub (NetworkState.repair_plan),
+    then capacity-limited dispatch (assign_drones) to critical nodes no live
+    tower covers. Returns (relay drones, dispatched drones, critical nodes served after).
+    """
+    state = NetworkState.from_components(topo, alive, comp)
+    if not any(h > 0 for h in state.hubs.values()):
+        return 0, 0, np.zeros(len(critical), dtype=bool)   # NO_HUB: nothing to reroute to
+    relays = 0
+    for a, b, dist, _ in state.repair_plan():
+        relays += len(relay_positions(float(topo.lat[a]), float(topo.lng[a]), float(topo.range[a]),
+                                      float(topo.lat[b]), float(topo.lng[b]), float(topo.range[b]), dist))
+    served = covered.copy()
+    stranded = np.flatnonzero(~covered)
+    if len(stranded):
+        affected = [{"id": f"critical-{j}", "lat": critical[j][0], "lng": critical[j][1]} for j in stranded.tolist()]
+        for j, (k, _) in zip(stranded.tolist(), assign_drones(affected, topo, capacity, dead=~alive)):
+            served[j] = k is not None
+    return relays, int(served.sum() - covered.sum()), served
+
+
+def simulate_batches(towers, critical, seed, batches, runs, types, capacity):
+    """
+    Worker entry point: scenario batches `batches` (indices of BATCH_RUNS-sized
+    blocks out of `runs`) against one tower layout. Returns per-scenario arrays
+    plus per-critical-node served counts.
+    """
+    topo = Topology(towers)
+    n = len(topo)
+    lat0 = float(topo.lat.mean()) if n else 0.0
+    x = (topo.lng - (float(topo.lng.mean()) if n else 0.0)) * KM_PER_DEG * math.cos(math.radians(lat0))
+    y = (topo.lat - lat0) * KM_PER_DEG
+    box = (float(x.min()), float(x.max()), float(y.min()), float(y.max())) if n else (0.0, 0.0, 0.0, 0.0)
+    u = np.repeat(np.arange(n), np.diff(topo.indptr))
+    v = topo.indices
+    u, v = u[u < v], v[u < v]
+
+    crit_lat = np.array([c[0] for c in critical], dtype=np.float64)
+    crit_lng = np.array([c[1] for c in critical], dtype=np.float64)
+    reach = haversine_pairwise(crit_lat, crit_lng, topo.lat, topo.lng) <= topo.range[None, :] * CRITICAL_REACH
+
+    out = {key: [] for key in ("towers_lost", "before", "after", "relays", "dispatched", "no_hub", "kinds")}
+    served_before = np.zeros(len(critical), dtype=np.int64)
+    served_after = np.zeros(len(critical), dtype=np.int64)
+    recovered = {}   # Surviving-tower mask -> recover() result
+    for batch in batches:
+        size = min(BATCH_RUNS, runs - batch * BATCH_RUNS)
+        rng = batch_seed(seed, batch)
+        events = draw_events(rng, size, types, box)
+        alive = ~tower_damage(rng, events, x, y)
+        comp = batch_components(u, v, alive)
+
+        hub_live = alive & topo.is_hub[None, :]
+        has_hub = np.zeros((size, n), dtype=bool)
+        has_hub[np.nonzero(hub_live)[0], comp[hub_live]] = True
+        linked = alive & np.take_along_axis(has_hub, comp, axis=1)
+        connected = (linked.astype(np.float32) @ reach.T.astype(np.float32)) > 0
+        covered = (alive.astype(np.float32) @ reach.T.astype(np.float32)) > 0
+        no_hub = ~hub_live.any(axis=1)
+
+        relays = np.zeros(size, dtype=np.int64)
+        dispatched = np.zeros(size, dtype=np.int64)
+        after = connected.copy()
+        # Scenarios where every live tower still reaches a hub and every critical node is covered need no recovery
+        hubless = (alive & ~linked).any(axis=1)
+        for r in np.flatnonzero(~no_hub & (hubless | ~covered.all(axis=1))).tolist():
+            # Many scenarios leave the same towers standing (often all of them); recover each layout once
+            key = np.packbits(alive[r]).tobytes()
+            if key not in recovered:
+                recovered[key] = recover(topo, alive[r], comp[r], critical, covered[r], capacity)
+            relays[r], dispatched[r], after[r] = recovered[key]
+
+        out["towers_lost"].append(n - alive.sum(axis=1))
+        out["before"].append(connected.sum(axis=1))
+        out["after"].append(after.sum(axis=1))
+        out["relays"].append(relays)
+        out["dispatched"].append(dispatched)
+        out["no_hub"].append(no_hub)
+        out["kinds"].append(events["kind"])
+        served_before += connected.sum(axis=0)
+        served_after += after.sum(axis=0)
+
+    result = {key: np.concatenate(parts) if parts else np.empty(0) for key, parts in out.items()}
+    result["served_before"] = served_before
+    result["served_after"] = served_after
+    return result
+
+
+def plan_batches(runs, jobs):
+    """Contiguous runs of batch indices, one per job."""
+    n_batches = math.ceil(runs / BATCH_RUNS)
+    jobs = max(1, min(jobs, n_batches))
+    edges = np.linspace(0, n_batches, jobs + 1).round().astype(int)
+    return [list(range(edges[i], edges[i + 1])) for i in range(jobs)]
+
+
+def merge_results(parts):
+    """Concatenate per-job results (in batch order)."""
+    merged = {key: np.concatenate([p[key] for p in parts]) for key in parts[0] if key not in ("served_before", "served_after")}
+    merged["served_before"] = sum(p["served_before"] for p in parts)
+    merged["served_after"] = sum(p["served_after"] for p in parts)
+    return merged
+
+
+def distribution(values, lo=None, hi=None):
+    """Summary statistics and an equal-width histogram of one per-scenario measure."""
+    values = np.asarray(values, dtype=np.float64)
+    lo = float(values.min()) if lo is None else lo
+    hi = float(values.max()) if hi is None else hi
+    counts, edges = np.histogram(values, bins=HISTOGRAM_BINS, range=(lo, max(hi, lo + 1e-9)))
+    p5, p50, p95 = np.percentile(values, [5, 50, 95])
+    return {
+        "mean": round(float(values.mean()), 4),
+        "p5": round(float(p5), 4),
+        "p50": round(float(p50), 4),
+        "p95": round(float(p95), 4),
+        "min": round(float(values.min()), 4),
+        "max": round(float(values.max()), 4),
+        "histogram": {"edges": [round(float(e), 4) for e in edges], "counts": counts.tolist()},
+    }
+
+
+def summarize(result, types, critical, relay_cost):
+    """Response body: connectivity, drone and damage distributions, per disaster type and per critical node."""
+    runs = len(result["towers_lost"])
+    n_crit = len(critical)
+    share = (lambda c: c / n_crit) if n_crit else (lambda c: np.ones_like(c, dtype=np.float64))
+    before, after = share(result["before"]), share(result["after"])
+    drones = result["relays"] + result["dispatched"]
+    by_type = {}
+    for i, name in enumerate(types):
+        hit = (result["kinds"] == i).any(axis=1)
+        if hit.any():
+            by_type[name] = {
+                "scenarios": int(hit.sum()),
+                "mean_towers_lost": round(float(result["towers_lost"][hit].mean()), 3),
+                "mean_critical_connected_after": round(float(after[hit].mean()), 4),
+                "mean_drones": round(float(drones[hit].mean()), 3),
+            }
+    return {
+        "runs": runs,
+        "critical_connectivity": {
+            "before_recovery": {**distribution(before, 0.0, 1.0), "all_connected_rate": round(float((before >= 1).mean()), 4)},
+            "after_recovery": {**distribution(after, 0.0, 1.0), "all_connected_rate": round(float((after >= 1).mean()), 4)},
+        },
+        "drones_needed": {
+            **distribution(drones),
+            "relay_mean": round(float(result["relays"].mean()), 3),
+            "dispatch_mean": round(float(result["dispatched"].mean()), 3),
+            "mean_cost": round(float(drones.mean()) * relay_cost),
+        },
+        "towers_lost": distribution(result["towers_lost"]),
+        "no_hub_rate": round(float(result["no_hub"].mean()), 4),
+        "by_disaster": by_type,
+        "critical_nodes": [
+            {"lat": c[0], "lng": c[1],
+             "connected_before": round(float(b) / runs, 4), "connected_after": round(float(a) / runs, 4)}
+            for c, b, a in zip(critical, result["served_before"].tolist(), result["served_after"].tolist())
+        ],
+    }
@@ -0,0 +1,155 @@
+import math
+import numpy as np
+
+from distance import EARTH_RADIUS_KM, KM_PER_DEG, cos_lat, haversine_km, within_km, within_pairwise
+
+
+def lng_span_deg(lat, radius_km):
+    """Half-width in degrees of longitude of the bounding box of a radius circle (None = whole globe)."""
+    s = math.sin(min(radius_km / EARTH_RADIUS_KM, math.pi / 2))
+    c = math.cos(math.radians(lat))
+    if s >= c:
+        return None
+    return math.degrees(math.asin(s / c))
+
+
+class SpatialIndex:
+    """
+    Uniform lat/lng bucket hash over a fixed point set.
+    Points are sorted by bucket key (row-major), so each bucket row of a query
+    box is one contiguous slice of `order`; only those slices get an exact
+    haversine check, which keeps queries proportional to the output size.
+    """
+    def __init__(self, lat, lng, cell_km):
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.lng = np.asarray(lng, dtype=np.float64)
+        self.cos_lat = cos_lat(self.lat)
+        self.cell_km = max(float(cell_km), 1e-3)
+        n = len(self.lat)
+
+        if n:
+            self.lat0, self.lng0 = float(self.lat.min()), float(self.lng.min())
+            lat_ref = min(float(np.abs(self.lat).max()), 89.0)
+        else:
+            self.lat0 = self.lng0 = 0.0
+            lat_ref = 0.0
+        self.dlat = self.cell_km / KM_PER_DEG
+        self.dlng = self.cell_km / (KM_PER_DEG * math.cos(math.radians(lat_ref)))
+
+        rows = np.floor((self.lat - self.lat0) / self.dlat).astype(np.int64)
+        cols = np.floor((self.lng - self.lng0) / self.dlng).astype(np.int64)
+        self.nrows = int(rows.max()) + 1 if n else 0
+        self.ncols = int(cols.max()) + 1 if n else 0
+
+        keys = rows * self.ncols + cols
+        self.order = np.argsort(keys, kind="stable")
+        self.keys = keys[self.order]
+
+    def __len__(self):
+        return len(self.lat)
+
+    def _cell(self, lat, lng):
+        return (int(math.floor((lat - self.lat0) / self.dlat)),
+                int(math.floor((lng - self.lng0) / self.dlng)))
+
+    def query_box(self, lat_min, lat_max, lng_min=None, lng_max=None):
+        """Indices of all points in the buckets overlapping a lat/lng box (lng None = unbounded)."""
+        if not len(self):
+            return np.empty(0, dtype=np.int64)
+
+        i0 = max(0, self._cell(lat_min, 0)[0])
+        i1 = min(self.nrows - 1, self._cell(lat_max, 0)[0])
+        j0 = 0 if lng_min is None else max(0, self._cell(0, lng_min)[1])
+        j1 = self.ncols - 1 if lng_max is None else min(self.ncols - 1, self._cell(0, lng_max)[1])
+        if i0 > i1 or j0 > j1:
+            return np.empty(0, dtype=np.int64)
+
+        row_base = np.arange(i0, i1 + 1, dtype=np.int64) * self.ncols
+        starts = np.searchsorted(self.keys, row_base + j0, side="left")
+        stops = np.searchsorted(self.keys, row_base + j1, side="right")
+        slices = [self.order[a:b] for a, b in zip(starts, stops) if b > a]
+        if not slices:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate(slices)
+
+    def _candidates(self, lat, lng, radius_km):
+        if radius_km < 0:
+            return np.empty(0, dtype=np.int64)
+        half_lat = radius_km / KM_PER_DEG
+        half_lng = lng_span_deg(lat, radius_km)
+        if half_lng is None:
+            return self.query_box(lat - half_lat, lat + half_lat)
+        return self.query_box(lat - half_lat, lat + half_lat, lng - half_lng, lng + half_lng)
+
+    def query_radius(self, lat, lng, radius_km, return_dist=False):
+        """Indices (ascending) of all points within radius_km of (lat, lng)."""
+        cand = np.sort(self._candidates(lat, lng, radius_km))
+        if not return_dist:
+            return cand[within_km(lat, lng, self.lat[cand], self.lng[cand], radius_km, self.cos_lat[cand])]
+        d = haversine_km(lat, lng, self.lat[cand], self.lng[cand], self.cos_lat[cand])
+        keep = d <= radius_km
+        return cand[keep], d[keep]
+
+    def nearest(self, lat, lng, exclude=None):
+        """
+        Nearest point to (lat, lng), ignoring rows where `exclude` is True.
+        Returns (index, dist_km) or (None, inf). Ties go to the lowest index.
+        """
+        allowed = np.ones(len(self), dtype=bool) if exclude is None else ~np.asarray(exclude, dtype=bool)
+        if not allowed.any():
+            return None, float('inf')
+
+        radius = self.cell_km
+        max_radius = math.pi * EARTH_RADIUS_KM
+        while True:
+            idx, d = self.query_radius(lat, lng, radius, return_dist=True)
+            ok = allowed[idx]
+            if ok.any():
+                # Every allowed point within `radius` is present, so the minimum here is global
+                k = int(np.argmin(np.where(ok, d, np.inf)))
+                return int(idx[k]), float(d[k])
+            if radius >= max_radius:
+                return None, float('inf')
+            radius = min(radius * 2, max_radius)
+
+    def sum_within(self, lats, lngs, radius_km, weights):
+        """
+        For each query point, sum `weights` (one per indexed point) over indexed
+        points within radius_km. Queries are grouped by bucket so each group
+        does one box lookup and one distance matrix instead of a query per point.
+        """
+        lats = np.asarray(lats, dtype=np.float64)
+        lngs = np.asarray(lngs, dtype=np.float64)
+        weights = np.asarray(weights)
+        if weights.dtype == bool:
+            weights = weights.astype(np.int64)
+        out = np.zeros(len(lats), dtype=np.float64 if weights.dtype.kind == "f" else np.int64)
+        if not len(lats) or not len(self):
+            return out
+
+        rows = np.floor((lats - self.lat0) / self.dlat).astype(np.int64)
+        cols = np.floor((lngs - self.lng0) / self.dlng).astype(np.int64)
+        keys = rows * (self.ncols + 1) + cols
+        order = np.argsort(keys, kind="stable")
+        bounds = np.flatnonzero(np.diff(keys[order])) + 1
+        half_lat = radius_km / KM_PER_DEG
+
+        for group in np.split(order, bounds):
+            g_lat, g_lng = lats[group], lngs[group]
+            lat_lo, lat_hi = float(g_lat.min()), float(g_lat.max())
+            half_lng = lng_span_deg(max(abs(lat_lo), abs(lat_hi)), radius_km)
+            if half_lng is None:
+                box = self.query_box(lat_lo - half_lat, lat_hi + half_lat)
+            else:
+                box = self.query_box(lat_lo - half_lat, lat_hi + half_lat,
+                                     float(g_lng.min()) - half_lng, float(g_lng.max()) + half_lng)
+            if not len(box):
+                continue
+            w = weights[box]
+            live = w != 0
+            box, w = box[live], w[live]
+            if not len(box):
+                continue
+            hit = within_pairwise(g_lat, g_lng, self.lat[box], self.lng[box], radius_km, cos_b=self.cos_lat[box])
+            out[group] = hit @ w
+        return out
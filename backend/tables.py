@@ -0,0 +1,106 @@
+# Static tables behind plans and emergency responses. Plain Python, built once at
+# import, so they load without numpy, pydantic or the app.
+
+# --- CONFIG: TECH MATRIX (MARKET-ACCURATE TCO) ---
+# Costs in INR (₹). Represents CAPEX + 1 Year Critical Maintenance/License.
+TECH_MATRIX = {
+    "valley": {
+        "tech": "Optical Fiber (GPON)",   
+        "range": 0.8,  
+        "cost": 350000,       # ₹3.5L: Aerial Fiber Rollout (Pole-to-Pole) in rural flats.
+        "legacy_tech": "Standard Macro Tower",
+        "legacy_cost": 2500000 # ₹25L: Cost of 40m GBT Tower + Civil Work + Diesel GenSet.
+    }, 
+    "snow": {
+        "tech": "L-Band Satellite Mesh",      
+        "range": 2.0,  
+        "cost": 1250000,      # ₹12.5L: VSAT Terminal + 5-Year High-Bandwidth Emergency Plan.
+        "legacy_tech": "Deep-Earth Fiber Trenching",
+        "legacy_cost": 8500000 # ₹85L: Specialized excavation in permafrost/avalanche zones.
+    },
+    "rocky": {
+        "tech": "Microwave Backhaul",         
+        "range": 1.5,  
+        "cost": 650000,       # ₹6.5L: E-Band P2P Radios + Spectrum License Fees.
+        "legacy_tech": "Bedrock Cabling",
+        "legacy_cost": 4500000 # ₹45L: Diamond drilling through hard rock for cabling.
+    }
+}
+
+# Fallback for undefined terrains
+DEFAULT_TECH = {
+    "tech": "Standard Tower", 
+    "range": 5.0, 
+    "cost": 2500000, 
+    "legacy_cost": 3000000 
+}
+
+# --- MULTI-TERRAIN PLANS ---
+TERRAIN_CODES = list(TECH_MATRIX) + ["default"]  # NodeSet.terrain codes; unknown terrains plan as "default"
+TECH_OPTIONS = [TECH_MATRIX.get(t, DEFAULT_TECH) for t in TERRAIN_CODES]
+
+# --- DRONE CONFIGURATION ---
+DRONE_CONFIG = {
+    "type": "Mesh-Relay Drone",
+    "speed_kmh": 50,  # ~14 m/s for rural deployment
+    "range": 2.5,  # Can relay up to 2.5km
+    "cost": 150000,  # ₹1.5L per deployment
+    "setup_time_sec": 5,  # Time to deploy
+    "max_per_tower": 2  # Drones one tower can dispatch in a batch incident
+}
+IMPACT_TIME_SEC = 15  # Warning window before impact
+
+# --- EMERGENCY SERVICES & BANDWIDTH PRIORITY ---
+EMERGENCY_SERVICES = {
+    "critical": [
+        "emergency.gov.in",
+        "ndma.gov.in", 
+        "icmr.gov.in",
+        "helpline.in",
+        "police.gov.in",
+        "ambulance.gov.in",
+        "sos-alert.com",
+        "disaster-alert.in"
+    ],
+    "blocked": [
+        "netflix.com",
+        "youtube.com", 
+        "instagram.com",
+        "facebook.com",
+        "twitter.com",
+        "tiktok.com",
+        "gaming.com",
+        "streaming.com"
+    ],
+    "throttled": [
+        "gmail.com",
+        "whatsapp.com",
+        "telegram.com",
+        "email-services.com"
+    ]
+}
+
+# Bandwidth policy during an emergency; static, so built once and shared (read-only) by every response
+SERVICES_STATUS = {
+    "critical": [
+        {"service": s, "status": "ONLINE", "priority": "CRITICAL", "bandwidth": "UNLIMITED"}
+        for s in EMERGENCY_SERVICES["critical"]
+    ],
+    "blocked": [
+        {"service": s, "status": "BLOCKED", "priority": "NON-ESSENTIAL", "bandwidth": "0%"}
+        for s in EMERGENCY_SERVICES["blocked"]
+    ],
+    "throttled": [
+        {"service": s, "status": "THROTTLED", "priority": "LOW", "bandwidth": "25%"}
+        for s in EMERGENCY_SERVICES["throttled"]
+    ]
+}
+
+# Drone block of every dispatch response
+DRONE_INFO = {
+    "type": DRONE_CONFIG["type"],
+    "speed_kmh": DRONE_CONFIG["speed_kmh"],
+    "relay_range_km": DRONE_CONFIG["range"],
+    "cost": DRONE_CONFIG["cost"],
+    "status": "EN_ROUTE"
+}
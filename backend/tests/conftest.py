@@ -0,0 +1,22 @@
+import os
+import sys
+
+import pytest
+
+# Backend modules import each other flat (as uvicorn runs them from backend/)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Plan jobs in a thread, not a process pool
+os.environ.setdefault("PLANNER_WORKERS", "0")
+
+
+def tower(tid, lat, lng, range_km=2.0, kind="standard_tower"):
+    return {"id": tid, "lat": lat, "lng": lng, "range": range_km, "type": kind}
+
+
+@pytest.fixture
+def client():
+    from fastapi.testclient import TestClient
+    import main
+    with TestClient(main.app) as c:
+        yield c
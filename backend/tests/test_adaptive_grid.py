@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from grid import (COARSE_FRACTION, REFINE_LEVELS, adaptive_polygon_nodes, build_adaptive_node_set,
+                  build_node_set, points_in_polygon, polygon_area_km2)
+from distance import haversine_km
+from planning import Point
+
+RADIUS = 2.0
+LAT = [30.0, 30.08, 30.08, 30.04, 30.0]
+LNG = [78.0, 78.0, 78.09, 78.04, 78.09]
+
+
+def test_weights_sum_to_the_polygon_area():
+    _, _, w = adaptive_polygon_nodes(LAT, LNG, RADIUS, np.empty(0), np.empty(0))
+    assert w.sum() == pytest.approx(polygon_area_km2(LAT, LNG), rel=0.03)
+
+
+def test_samples_lie_inside_and_are_far_fewer_than_the_lattice():
+    lat, lng, _ = adaptive_polygon_nodes(LAT, LNG, RADIUS, np.empty(0), np.empty(0))
+    assert points_in_polygon(lat, lng, LAT, LNG).all()
+    polygon = [[Point(lat=a, lng=b) for a, b in zip(LAT, LNG)]]
+    assert len(lat) * 10 < len(build_node_set(polygon, []))
+
+
+def test_cells_refine_near_critical_nodes():
+    crit_lat, crit_lng = np.array([30.06]), np.array([78.02])
+    lat, lng, w = adaptive_polygon_nodes(LAT, LNG, RADIUS, crit_lat, crit_lng)
+    finest = (RADIUS * COARSE_FRACTION / 2 ** REFINE_LEVELS) ** 2
+    near = haversine_km(30.06, 78.02, lat, lng) < RADIUS * 0.4
+    assert near.any() and (w[near] < finest * 1.5).all()
+
+
+def test_sliver_polygons_keep_one_node():
+    lat, lng, w = adaptive_polygon_nodes([30.0, 30.0001, 30.0], [78.0, 78.0, 78.0001], RADIUS, np.empty(0), np.empty(0))
+    assert len(lat) == 1 and w[0] > 0
+
+
+def test_node_set_keeps_criticals_first():
+    polygon = [[Point(lat=a, lng=b) for a, b in zip(LAT, LNG)]]
+    nodes = build_adaptive_node_set(polygon, [Point(lat=30.06, lng=78.02)], RADIUS)
+    assert nodes.n_critical == 1 and nodes.is_critical[0] and nodes.weight[0] == 0
+    assert nodes.area_km2 == pytest.approx(polygon_area_km2(LAT, LNG), rel=0.03)
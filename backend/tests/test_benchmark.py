@@ -0,0 +1,36 @@
+import benchmark
+from plan_cache import plan_key
+
+
+def run(wall_sec, towers=10):
+    return {"direct": {"stages": {"build_plan": {"wall_sec": wall_sec, "peak_mb": 10.0}}, "towers": towers}}
+
+
+def test_synthetic_requests_are_reproducible():
+    a = benchmark.synthetic_request("valley", 4, 8, 1.5, 4, seed=3)
+    b = benchmark.synthetic_request("valley", 4, 8, 1.5, 4, seed=3)
+    assert plan_key(a) == plan_key(b)
+    assert plan_key(benchmark.synthetic_request("valley", 4, 8, 1.5, 4, seed=4)) != plan_key(a)
+    assert len(a.polygons) == 4 and all(len(p) == 8 for p in a.polygons) and len(a.critical_nodes) == 4
+
+
+def test_mixed_workloads_tag_every_polygon():
+    data = benchmark.synthetic_request("mixed", 4, 6, 1.0, 2)
+    assert data.polygon_terrains and len(set(data.polygon_terrains)) > 1
+
+
+def test_workloads_cover_every_terrain():
+    names = [name for name, _ in benchmark.workloads("quick")]
+    assert len(names) == len(benchmark.SUITES["quick"]) * len(benchmark.TERRAINS)
+
+
+def test_compare_flags_only_real_regressions():
+    baseline = {"results": {"w": run(1.0)}}
+    assert benchmark.compare({"results": {"w": run(1.1)}}, baseline) == []
+    assert benchmark.compare({"results": {"w": run(1.0, towers=12)}}, {"results": {"w": run(1.0, towers=12)}}) == []
+    slow = benchmark.compare({"results": {"w": run(2.0)}}, baseline)
+    assert [(name, metric) for name, _, metric, _, _ in slow] == [("w", "build_plan.wall_sec")]
+    grown = benchmark.compare({"results": {"w": run(1.0, towers=20)}}, baseline)
+    assert [metric for _, _, metric, _, _ in grown] == ["towers"]
+    # Tiny absolute slowdowns are noise, whatever the ratio
+    assert benchmark.compare({"results": {"w": run(0.004)}}, {"results": {"w": run(0.001)}}) == []
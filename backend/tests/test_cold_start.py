@@ -0,0 +1,35 @@
+import json
+import os
+import subprocess
+import sys
+
+from fastapi.testclient import TestClient
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROBE = "import json, sys; __import__(sys.argv[1]); print(json.dumps(sorted(sys.modules)))"
+REGION = [{"lat": 30.7, "lng": 78.7}, {"lat": 30.72, "lng": 78.7}, {"lat": 30.72, "lng": 78.72}]
+
+
+def loaded_by(module):
+    out = subprocess.run([sys.executable, "-c", PROBE, module], capture_output=True, text=True, cwd=BACKEND, check=True)
+    return set(json.loads(out.stdout))
+
+
+def test_planning_core_imports_without_the_app():
+    loaded = loaded_by("planning")
+    assert not {"fastapi", "main", "index", "compact", "msgpack", "brotli", "multiprocessing"} & loaded
+
+
+def test_serverless_entry_defers_optional_and_pool_imports():
+    loaded = loaded_by("index")
+    assert "fastapi" in loaded
+    assert not {"main", "compact", "msgpack", "brotli", "multiprocessing"} & loaded
+
+
+def test_index_serves_the_same_plans_as_main(client):
+    import index
+    body = {"polygons": [REGION], "critical_nodes": [{"lat": 30.71, "lng": 78.71}], "seed": 2, "refine_ms": 0}
+    with TestClient(index.app) as serverless:
+        assert serverless.post("/calculate-plan", json=body).json() == client.post("/calculate-plan", json=body).json()
+        compact = serverless.post("/calculate-plan?format=compact", json=body).json()
+    assert compact["format"] == "compact"
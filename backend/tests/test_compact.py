@@ -0,0 +1,71 @@
+import base64
+import gzip
+import json
+
+import numpy as np
+import pytest
+
+import planning
+from compact import COMPRESS_MIN_BYTES, LINK_STATUSES, TOWER_TYPES, compact_plan, coverage_raster, encode_response
+from grid import polygon_area_km2
+from planning import PlanningRequest, Point
+
+REGION = [{"lat": 30.4, "lng": 78.4}, {"lat": 30.45, "lng": 78.4}, {"lat": 30.45, "lng": 78.45}, {"lat": 30.4, "lng": 78.45}]
+BODY = {"polygons": [REGION], "critical_nodes": [{"lat": 30.41, "lng": 78.41}, {"lat": 30.44, "lng": 78.44}],
+        "seed": 6, "refine_ms": 0}
+
+
+@pytest.fixture(scope="module")
+def plan():
+    return planning.build_plan(PlanningRequest(**BODY))
+
+
+def test_compact_plan_round_trips_towers_and_links(plan):
+    c = compact_plan(plan)
+    cols = c["towers"]
+    towers = [{"id": cols["id"][i], "lat": cols["lat"][i], "lng": cols["lng"][i],
+               "type": TOWER_TYPES[cols["type"][i]], **c["techs"][cols["tech"][i]]} for i in range(len(cols["id"]))]
+    for full, back in zip(plan["towers"], towers):
+        assert {**full, "lat": back["lat"], "lng": back["lng"]} == back
+        assert back["lat"] == pytest.approx(full["lat"], abs=1e-6) and back["lng"] == pytest.approx(full["lng"], abs=1e-6)
+    assert [cols["id"][i] for i in c["links"]["to"]] == [l["to_id"] for l in plan["links"]]
+    assert [LINK_STATUSES[s] for s in c["critical_analysis"]["status"]] == [a["status"] for a in plan["critical_analysis"]]
+    assert len(json.dumps(c)) < len(json.dumps(plan))
+
+
+def test_raster_covers_only_inside_cells():
+    polygons = [[Point(**p) for p in REGION]]
+    towers = [{"lat": 30.42, "lng": 78.42, "range": 1.0}]
+    r = coverage_raster(polygons, towers)
+    inside = np.unpackbits(np.frombuffer(r["inside"], dtype=np.uint8))[:r["rows"] * r["cols"]].astype(bool)
+    covered = np.unpackbits(np.frombuffer(r["covered"], dtype=np.uint8))[:r["rows"] * r["cols"]].astype(bool)
+    assert not (covered & ~inside).any()
+    assert r["inside_cells"] * r["cell_km"] ** 2 == pytest.approx(polygon_area_km2([p["lat"] for p in REGION],
+                                                                                 [p["lng"] for p in REGION]), rel=0.05)
+    assert r["covered_cells"] * r["cell_km"] ** 2 == pytest.approx(np.pi, rel=0.1)
+    assert coverage_raster([polygons[0][:2]], towers) is None
+
+
+def test_negotiation_picks_body_and_coding():
+    payload = {"blob": b"\x01\x02", "pad": "x" * COMPRESS_MIN_BYTES}
+    plain = encode_response(payload, "", "gzip;q=0")
+    assert plain.media_type == "application/json" and "content-encoding" not in plain.headers
+    assert base64.b64decode(json.loads(plain.body)["blob"]) == b"\x01\x02"
+    zipped = encode_response(payload, "", "gzip")
+    assert zipped.headers["content-encoding"] == "gzip" and json.loads(gzip.decompress(zipped.body)) == json.loads(plain.body)
+    assert "content-encoding" not in encode_response({"small": 1}, "", "gzip").headers
+
+
+def test_msgpack_when_accepted():
+    msgpack = pytest.importorskip("msgpack")
+    response = encode_response({"blob": b"\x01"}, "application/msgpack")
+    assert response.media_type == "application/msgpack" and msgpack.unpackb(response.body) == {"blob": b"\x01"}
+
+
+def test_endpoint_serves_compact_and_raster(client, plan):
+    full = client.post("/calculate-plan", json=BODY).json()
+    c = client.post("/calculate-plan?format=compact&raster=true", json=BODY).json()
+    assert full["towers"] == plan["towers"]
+    assert c["format"] == "compact" and c["plan_id"] == full["plan_id"]
+    assert c["towers"]["id"] == [t["id"] for t in full["towers"]]
+    assert c["raster"]["covered_cells"] > 0
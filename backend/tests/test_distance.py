@@ -0,0 +1,55 @@
+import math
+
+import numpy as np
+import pytest
+
+from distance import (EARTH_RADIUS_KM, haversine_km, haversine_pairwise, haversine_rows, within_km,
+                      within_pairwise)
+
+
+def scalar_km(lat1, lng1, lat2, lng2):
+    """The per-pair formula the endpoints used before the shared kernel."""
+    dlat, dlng = math.radians(lat2 - lat1), math.radians(lng2 - lng1)
+    a = math.sin(dlat / 2)**2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlng / 2)**2
+    return EARTH_RADIUS_KM * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+
+@pytest.fixture(scope="module")
+def points():
+    rng = np.random.default_rng(11)
+    return rng.uniform(-85, 85, 400), rng.uniform(-180, 180, 400)
+
+
+def test_kernels_match_the_scalar_formula(points):
+    lat, lng = points
+    expected = np.array([scalar_km(lat[0], lng[0], a, b) for a, b in zip(lat, lng)])
+    assert np.allclose(haversine_km(lat[0], lng[0], lat, lng), expected, rtol=1e-12, atol=1e-9)
+    pair = haversine_pairwise(lat[:5], lng[:5], lat, lng)
+    assert pair.shape == (5, len(lat)) and np.allclose(pair[0], expected, rtol=1e-12, atol=1e-9)
+    assert np.allclose(haversine_rows(lat[:5], lng[:5], lat[5:10], lng[5:10]),
+                       [scalar_km(lat[i], lng[i], lat[i + 5], lng[i + 5]) for i in range(5)], rtol=1e-12)
+
+
+@pytest.mark.parametrize("centre", [(30.0, 78.0), (-45.0, 170.0), (0.0, 179.99), (84.0, 10.0)])
+@pytest.mark.parametrize("radius", [0.01, 0.5, 2.5, 5.0, 25.0])
+def test_within_km_matches_exact_distances(centre, radius):
+    # Dense around the circle edge, where the equirectangular shortcut has to defer to the exact test
+    rng = np.random.default_rng(3)
+    lat0, lng0 = centre
+    bearing = rng.uniform(0, 2 * math.pi, 4000)
+    dist = radius * rng.uniform(0.97, 1.03, 4000)
+    lat = lat0 + np.degrees(dist / EARTH_RADIUS_KM) * np.cos(bearing)
+    lng = lng0 + np.degrees(dist / EARTH_RADIUS_KM) * np.sin(bearing) / math.cos(math.radians(lat0))
+    lng = (lng + 180) % 360 - 180
+    mask = within_km(lat0, lng0, lat, lng, radius)
+    assert np.array_equal(mask, haversine_km(lat0, lng0, lat, lng) <= radius)
+
+
+def test_within_pairwise_matches_exact_distances(points):
+    lat, lng = points
+    assert np.array_equal(within_pairwise(lat[:20], lng[:20], lat, lng, 3000.0),
+                          haversine_pairwise(lat[:20], lng[:20], lat, lng) <= 3000.0)
+
+
+def test_negative_radius_matches_nothing():
+    assert not within_km(30.0, 78.0, np.array([30.0]), np.array([78.0]), -1).any()
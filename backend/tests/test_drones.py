@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from conftest import tower
+from connectivity import assign_drones
+from distance import haversine_pairwise
+from topology import Topology
+
+
+def dense_assignment(affected, topo, capacity, dead=None):
+    """Reference: every (node, tower) pair, shortest first."""
+    d = haversine_pairwise([n["lat"] for n in affected], [n["lng"] for n in affected], topo.lat, topo.lng)
+    d[:, [topo.row[n["id"]] for n in affected if n["id"] in topo.row]] = np.inf
+    if dead is not None:
+        d[:, dead] = np.inf
+    result, load = [None] * len(affected), np.zeros(len(topo), dtype=int)
+    for flat in np.argsort(d, axis=None, kind="stable"):
+        i, k = divmod(int(flat), len(topo))
+        if np.isfinite(d[i, k]) and result[i] is None and load[k] < capacity:
+            result[i], load[k] = k, load[k] + 1
+    return result
+
+
+@pytest.mark.parametrize("seed,capacity", [(0, 1), (1, 2), (2, 3)])
+def test_matches_dense_shortest_pair_first(seed, capacity):
+    rng = np.random.default_rng(seed)
+    towers = [tower(f"T{i}", 30 + rng.uniform(0, 0.5), 78 + rng.uniform(0, 0.5), rng.choice([0.8, 1.5, 2.0]))
+              for i in range(80)]
+    topo = Topology(towers)
+    affected = [{"id": f"N{i}", "lat": 30 + rng.uniform(-0.1, 0.6), "lng": 78 + rng.uniform(-0.1, 0.6)} for i in range(120)]
+    affected += [{"id": "T3", "lat": towers[3]["lat"], "lng": towers[3]["lng"]}]   # A failed tower cannot dispatch
+    dead = rng.random(len(towers)) < 0.2
+    got = assign_drones(affected, topo, capacity, dead=dead)
+    assert [k for k, _ in got] == dense_assignment(affected, topo, capacity, dead)
+    for node, (k, km) in zip(affected, got):
+        if k is not None:
+            assert not dead[k] and k != 3
+            assert km == pytest.approx(haversine_pairwise([node["lat"]], [node["lng"]], [topo.lat[k]], [topo.lng[k]])[0, 0])
+
+
+def test_far_node_still_reaches_a_tower():
+    topo = Topology([tower("T1", 30.0, 78.0)])
+    (k, km), = assign_drones([{"id": "far", "lat": 35.0, "lng": 85.0}], topo, 1)
+    assert k == 0 and km > 500
+
+
+def test_batch_serves_located_nodes_when_one_has_no_position(client):
+    towers = [tower("T1", 30.0, 78.0), tower("T2", 30.02, 78.0)]
+    body = {"towers": towers, "affected_nodes": [{"id": "A", "lat": 30.01, "lng": 78.0}, {"id": "ghost"}]}
+    res = client.post("/drone-deploy/batch", json=body)
+    assert res.status_code == 200
+    out = res.json()
+    assert out["dispatched"] == 1 and out["unknown_location"] == 1
+    assert [d["status"] for d in out["deployments"]] == ["EN_ROUTE", "UNKNOWN_LOCATION"]
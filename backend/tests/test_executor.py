@@ -0,0 +1,83 @@
+import asyncio
+import threading
+
+import pytest
+from starlette.exceptions import HTTPException
+
+from executor import PlanningExecutor
+
+
+def wait_for(event):
+    event.wait(5)
+    return "done"
+
+
+def reporting(n, progress):
+    for i in range(n):
+        progress("step", i)
+    return n
+
+
+def test_overload_is_refused_with_retry_after():
+    async def scenario():
+        planner = PlanningExecutor(workers=0, max_pending=1, timeout=5)
+        release = threading.Event()
+        first = asyncio.ensure_future(planner.run(wait_for, release))
+        await asyncio.sleep(0.05)
+        with pytest.raises(HTTPException) as busy:
+            await planner.run(wait_for, release)
+        release.set()
+        assert await first == "done"
+        assert planner.pending == 0
+        planner.shutdown()
+        return busy.value
+    busy = asyncio.run(scenario())
+    assert busy.status_code == 429 and "Retry-After" in busy.headers
+
+
+def test_slow_job_times_out_with_504():
+    async def scenario():
+        planner = PlanningExecutor(workers=0, max_pending=2, timeout=0.05)
+        release = threading.Event()
+        try:
+            with pytest.raises(HTTPException) as slow:
+                await planner.run(wait_for, release)
+        finally:
+            release.set()
+            planner.shutdown()
+        return slow.value
+    assert asyncio.run(scenario()).status_code == 504
+
+
+def test_run_many_is_admitted_as_a_whole():
+    async def scenario():
+        planner = PlanningExecutor(workers=0, max_pending=2, timeout=5)
+        with pytest.raises(HTTPException):
+            await planner.run_many(pow, [(2, 1), (2, 2), (2, 3)])
+        assert planner.pending == 0
+        results = await planner.run_many(pow, [(2, 1), (2, 2)])
+        planner.shutdown()
+        return results
+    assert asyncio.run(scenario()) == [2, 4]
+
+
+def test_progress_is_forwarded_before_results_return():
+    events = []
+
+    async def scenario():
+        planner = PlanningExecutor(workers=0, max_pending=4, timeout=5)
+        results = await planner.run_many(reporting, [(2,), (3,)], progress=lambda kind, i: events.append((kind, i)))
+        planner.shutdown()
+        return results
+    assert asyncio.run(scenario()) == [2, 3]
+    assert sorted(events) == sorted([("step", i) for i in range(2)] + [("step", i) for i in range(3)])
+
+
+def test_process_pool_runs_jobs_off_the_loop():
+    async def scenario():
+        planner = PlanningExecutor(workers=1, max_pending=2, timeout=30)
+        try:
+            return await planner.run(pow, 2, 10)
+        finally:
+            planner.shutdown()
+    assert asyncio.run(scenario()) == 1024
@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+import planning
+from distance import haversine_km
+from grid import GRID_STEP, NodeSet, build_node_set
+from planning import Point
+
+
+def baseline_grid(polygons, critical_nodes):
+    """The original scalar walk: `curr += step` rows and columns through is_inside."""
+    points = [(c.lat, c.lng) for c in critical_nodes]
+    for poly in polygons:
+        if len(poly) > 2:
+            lats, lngs = [p.lat for p in poly], [p.lng for p in poly]
+            curr_lat = min(lats)
+            while curr_lat < max(lats):
+                curr_lng = min(lngs)
+                while curr_lng < max(lngs):
+                    if planning.is_inside(curr_lat, curr_lng, poly):
+                        points.append((curr_lat, curr_lng))
+                    curr_lng += GRID_STEP
+                curr_lat += GRID_STEP
+    return points
+
+
+def polygon(*coords):
+    return [Point(lat=lat, lng=lng) for lat, lng in coords]
+
+
+SHAPES = {
+    "square": [polygon((30.0, 78.0), (30.012, 78.0), (30.012, 78.012), (30.0, 78.012))],
+    "concave": [polygon((30.0, 78.0), (30.02, 78.0), (30.02, 78.02), (30.01, 78.005), (30.0, 78.02))],
+    "vertical_edges": [polygon((12.0, 77.0), (12.0, 77.0104), (12.0072, 77.0104), (12.0072, 77.0))],
+    "several": [polygon((30.0, 78.0), (30.01, 78.0), (30.005, 78.01)),
+                polygon((30.02, 78.02), (30.03, 78.02), (30.03, 78.03), (30.02, 78.03)),
+                polygon((30.0, 78.0), (30.01, 78.0))],  # Under 3 vertices: skipped
+}
+
+
+@pytest.mark.parametrize("name", sorted(SHAPES))
+def test_fixed_grid_matches_the_scalar_walk(name):
+    crit = [Point(lat=30.004, lng=78.004)]
+    nodes = build_node_set(SHAPES[name], crit)
+    expected = baseline_grid(SHAPES[name], crit)
+    assert len(nodes) == len(expected)
+    assert np.array_equal(nodes.lat, [p[0] for p in expected])
+    assert np.array_equal(nodes.lng, [p[1] for p in expected])
+
+
+def test_critical_nodes_lead_and_are_never_area():
+    crit = [Point(lat=30.1, lng=78.1), Point(lat=30.2, lng=78.2)]
+    nodes = build_node_set(SHAPES["square"], crit)
+    assert nodes.n_critical == 2 and list(nodes.is_critical[:2]) == [True, True]
+    assert not nodes.is_critical[2:].any()
+    assert (nodes.weight[:2] == 0).all() and (nodes.weight[2:] > 0).all()
+
+
+def test_mark_covered_matches_a_distance_scan():
+    nodes = build_node_set(SHAPES["concave"], [])
+    nodes.mark_covered(30.01, 78.01, 0.5)
+    assert np.array_equal(nodes.covered, haversine_km(30.01, 78.01, nodes.lat, nodes.lng) <= 0.5)
+
+
+def test_uncovered_share_weighs_area():
+    nodes = NodeSet([0.0, 0.0, 0.0], [0.0, 0.1, 0.2], [True, False, False], weight=[0.0, 1.0, 3.0])
+    nodes.covered[2] = True
+    assert nodes.uncovered_share() == pytest.approx(0.25)
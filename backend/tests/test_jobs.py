@@ -0,0 +1,47 @@
+import asyncio
+
+import pytest
+
+from jobs import PlanJobStore
+
+
+def test_store_refuses_new_jobs_when_full_of_live_ones():
+    async def scenario():
+        store = PlanJobStore(max_jobs=3)
+        jobs = [store.create(f"k{i}") for i in range(3)]
+        with pytest.raises(OverflowError):
+            store.create("k3")
+        assert store.live == 3
+
+        jobs[0].finish({"logs": [], "towers": []})
+        assert store.live == 2
+        store.create("k3")          # The finished job makes room
+        assert len(store) == 3 and store.get(jobs[0].id) is None
+    asyncio.run(scenario())
+
+
+def test_job_stream_replays_events_in_order():
+    async def scenario():
+        store = PlanJobStore()
+        job = store.create("key")
+        job.replay({"logs": ["INIT"], "towers": [{"id": "TWR-01"}]})
+        job.finish({"logs": ["INIT"], "towers": [{"id": "TWR-01"}], "kpis": {}})
+        events = [e async for e in job.follow()]
+        assert [e["type"] for e in events] == ["log", "tower", "result"]
+        assert [e["seq"] for e in events] == [0, 1, 2]
+        assert job.towers_placed == 1
+    asyncio.run(scenario())
+
+
+def test_create_plan_job_counts_live_jobs_not_just_planner(client, monkeypatch):
+    import main
+
+    async def fill():
+        store = PlanJobStore()
+        for i in range(main.PLANNER.max_pending):
+            store.create(f"k{i}")   # Queued jobs the planner has not seen yet
+        return store
+    monkeypatch.setattr(main, "PLAN_JOBS", client.portal.call(fill))
+    body = {"polygons": [], "critical_nodes": []}
+    res = client.post("/plans", json=body)
+    assert res.status_code == 429 and "Retry-After" in res.headers
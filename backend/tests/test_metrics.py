@@ -0,0 +1,40 @@
+import metrics
+import planning
+from planning import PlanningRequest
+
+REGION = [{"lat": 30.2, "lng": 78.2}, {"lat": 30.22, "lng": 78.2}, {"lat": 30.22, "lng": 78.22}]
+
+
+def test_histogram_buckets_are_cumulative():
+    hist = metrics.Histogram("h", "Test.", (1, 5), ("stage",))
+    for value in (0.5, 3, 7):
+        hist.observe(value, "grid")
+    lines = hist.render()
+    assert 'h_bucket{stage="grid",le="1"} 1' in lines
+    assert 'h_bucket{stage="grid",le="5"} 2' in lines
+    assert 'h_bucket{stage="grid",le="+Inf"} 3' in lines
+    assert 'h_count{stage="grid"} 3' in lines and 'h_sum{stage="grid"} 10.500000' in lines
+
+
+def test_timed_call_records_stages_and_counts():
+    data = PlanningRequest(polygons=[REGION], critical_nodes=[], seed=1, refine_ms=0)
+    result, timings = metrics.timed_call(planning.build_plan, data)
+    assert {"grid", "fill", "links"} <= set(timings["stages"])
+    assert timings["counts"]["towers"] == len(result["towers"])
+    assert timings["counts"]["nodes"] > 0
+
+
+def test_stages_outside_a_plan_are_no_ops():
+    assert metrics.stage("grid") is metrics._NULL
+    metrics.count("nodes", 5)  # No plan recording: dropped, not raised
+
+
+def test_metrics_endpoint_exposes_plans_and_requests(client):
+    client.post("/calculate-plan", json={"polygons": [REGION], "critical_nodes": [], "refine_ms": 0, "seed": 9})
+    response = client.get("/metrics")
+    assert response.status_code == 200 and response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert 'vyomsetu_request_seconds_count{endpoint="calculate_plan"}' in body
+    assert 'vyomsetu_plan_stage_seconds_bucket{stage="grid",le="+Inf"}' in body
+    assert "vyomsetu_planner_inflight 0" in body
+    assert "vyomsetu_plan_cache_entries" in body
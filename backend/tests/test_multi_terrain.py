@@ -0,0 +1,44 @@
+import planning
+from planning import PlanningRequest
+
+
+def square(lat, lng, size):
+    return [{"lat": lat, "lng": lng}, {"lat": lat + size, "lng": lng},
+            {"lat": lat + size, "lng": lng + size}, {"lat": lat, "lng": lng + size}]
+
+
+VALLEY = square(30.00, 78.00, 0.04)
+ROCKY = square(30.00, 78.045, 0.04)   # Shares a border strip with VALLEY
+
+
+def plan(terrains, polygons=(VALLEY, ROCKY)):
+    return planning.build_plan(PlanningRequest(polygons=list(polygons), critical_nodes=[], polygon_terrains=terrains,
+                                               seed=1, refine_ms=0))
+
+
+def test_each_polygon_builds_its_own_tech():
+    result = plan(["valley", "rocky"])
+    fiber, microwave = planning.TECH_MATRIX["valley"]["tech"], planning.TECH_MATRIX["rocky"]["tech"]
+    assert set(result["terrain_breakdown"]["towers_by_tech"]) <= {fiber, microwave}
+    for t in result["towers"]:
+        inside_valley = planning.is_inside(t["lat"], t["lng"], [planning.Point(**p) for p in VALLEY])
+        assert t["tech"] == (fiber if inside_valley else microwave)
+
+
+def test_polygon_tech_does_not_depend_on_neighbours():
+    mixed = plan(["valley", "rocky"])
+    alone = plan(["valley", "valley"])
+    valley_techs = lambda r: {t["tech"] for t in r["towers"] if t["lng"] < 78.04}
+    assert valley_techs(mixed) == valley_techs(alone) == {planning.TECH_MATRIX["valley"]["tech"]}
+
+
+def test_mixed_plan_reports_radius_per_tech():
+    breakdown = plan(["valley", "rocky"])["terrain_breakdown"]
+    assert breakdown["tech"] == "Mixed" and breakdown["radius"] is None
+    assert breakdown["radius_by_tech"] == {planning.TECH_MATRIX[t]["tech"]: planning.TECH_MATRIX[t]["range"]
+                                           for t in ("valley", "rocky")}
+
+
+def test_legacy_capex_is_summed_per_tower():
+    result = plan(["valley", "rocky"])
+    assert result["kpis"]["legacy_capex"] == sum(t["legacy_cost"] for t in result["towers"])
@@ -0,0 +1,49 @@
+import asyncio
+
+import planning
+from partition import balance_groups, cluster_polygons
+from planning import PlanningRequest, Point
+
+
+def square(lat, lng, size=0.02):
+    return [{"lat": lat, "lng": lng}, {"lat": lat + size, "lng": lng},
+            {"lat": lat + size, "lng": lng + size}, {"lat": lat, "lng": lng + size}]
+
+
+# Two neighbours and one far-off polygon: two clusters
+POLYGONS = [square(30.0, 78.0), square(30.0, 78.03), square(30.5, 78.5)]
+REQUEST = PlanningRequest(polygons=POLYGONS, critical_nodes=[{"lat": 30.01, "lng": 78.01}, {"lat": 30.51, "lng": 78.51}],
+                          seed=2, refine_ms=0)
+
+
+def test_polygons_cluster_by_gap():
+    polys = [[Point(**p) for p in poly] for poly in POLYGONS]
+    assert cluster_polygons(polys, 4.0) == [[0, 1], [2]]
+    assert cluster_polygons(polys, 0.5) == [[0], [1], [2]]
+    assert cluster_polygons(polys + [polys[0][:2]], 4.0) == [[0, 1], [2]]  # Degenerate polygon skipped
+
+
+def test_groups_balance_by_weight():
+    assert balance_groups([5.0, 1.0, 1.0, 3.0], 2) == [[0], [1, 2, 3]]
+    assert balance_groups([1.0, 1.0], 8) == [[0], [1]]
+
+
+def test_cluster_results_do_not_depend_on_grouping():
+    clusters = cluster_polygons(REQUEST.polygons, 4.0)
+    assigned = planning.assign_critical_nodes(REQUEST.polygons, REQUEST.critical_nodes, clusters, planning.get_centroid)
+    together = planning.plan_clusters(REQUEST, list(enumerate(clusters)), assigned, 2)
+    apart = [planning.plan_clusters(REQUEST, [(ci, c)], [assigned[ci]], 2)[0] for ci, c in enumerate(clusters)]
+    assert [t for t, _, _ in together] == [t for t, _, _ in apart]
+
+
+def test_merged_plan_streams_its_final_towers():
+    events = []
+    result, _, _ = asyncio.run(planning.run_plan(REQUEST, 2, progress=lambda kind, p: events.append((kind, p))))
+    assert any(line.startswith("MERGE: 2 regions") for line in result["logs"])
+    assert [t["id"] for t in result["towers"]] == [f"TWR-{i:02d}" for i in range(1, len(result["towers"]) + 1)]
+    assert result["kpis"]["coverage_pct"] >= 95.0
+    events = [e for e in events if e[0] != "end"]
+    kinds = [kind for kind, _ in events]
+    assert kinds[-1] == "merged" and kinds.count("merged") == 1
+    assert events[-1][1] == result["towers"]
+    assert {p["cluster"] for kind, p in events if kind == "tower" and "cluster" in p} == {0, 1}
@@ -0,0 +1,54 @@
+import planning
+from plan_cache import PlanCache, plan_key
+from planning import PlanningRequest
+
+REGION = [{"lat": 30.0, "lng": 78.0}, {"lat": 30.02, "lng": 78.0}, {"lat": 30.02, "lng": 78.02}]
+
+
+def request(**overrides):
+    body = {"polygons": [REGION], "critical_nodes": [{"lat": 30.01, "lng": 78.01}], **overrides}
+    return PlanningRequest(**body)
+
+
+def test_plan_key_is_canonical():
+    assert plan_key(request()) == plan_key(request())
+    jitter = [{"lat": 30.0 + 1e-9, "lng": 78.0}] + REGION[1:]
+    assert plan_key(request(polygons=[jitter])) == plan_key(request())
+    assert plan_key(request(seed=1)) != plan_key(request())
+    assert plan_key(request(algorithm="lazy_greedy")) != plan_key(request())
+    assert plan_key(request(terrain_type="rocky")) != plan_key(request())
+
+
+def test_uniform_polygon_terrains_share_the_single_terrain_key():
+    assert plan_key(request(polygon_terrains=["rocky"])) == plan_key(request(terrain_type="rocky"))
+
+
+def test_cache_evicts_least_recently_used():
+    cache = PlanCache(max_entries=2)
+    cache.put("a", {"n": 1})
+    cache.put("b", {"n": 2})
+    assert cache.get("a") == {"n": 1}
+    cache.put("c", {"n": 3})
+    assert cache.get("b") is None and cache.get("a") and cache.get("c")
+    assert cache.stats()["evictions"] == 1
+
+
+def test_cache_is_bounded_by_size():
+    cache = PlanCache(max_bytes=40)
+    cache.put("big", {"blob": "x" * 100})
+    assert cache.get("big") is None
+    cache.put("a", {"blob": "x" * 15})
+    cache.put("b", {"blob": "x" * 15})
+    stats = cache.stats()
+    assert stats["entries"] == 1 and stats["bytes"] <= 40
+
+
+def test_endpoint_serves_repeats_from_cache(client):
+    planning.PLAN_CACHE.clear()
+    body = {"polygons": [REGION], "critical_nodes": [{"lat": 30.01, "lng": 78.01}], "refine_ms": 0}
+    first = client.post("/calculate-plan?timing=true", json=body).json()
+    second = client.post("/calculate-plan?timing=true", json=body).json()
+    assert (first["timing"]["cache"], second["timing"]["cache"]) == ("miss", "hit")
+    strip = lambda r: {k: v for k, v in r.items() if k != "timing"}
+    assert strip(first) == strip(second)
+    assert first["plan_id"] == plan_key(PlanningRequest(**body))
@@ -0,0 +1,42 @@
+import pytest
+
+import planning
+import refine
+from benchmark import synthetic_request
+from distance import haversine_km
+
+
+@pytest.fixture(scope="module")
+def plans():
+    data = synthetic_request("valley", 2, 8, 2.0, 3, seed=5)
+    plain = planning.build_plan(data.model_copy(update={"refine_ms": 0}))
+    refined = planning.build_plan(data.model_copy(update={"refine_ms": 500}))
+    return data, plain, refined
+
+
+def test_refine_saves_towers_within_the_coverage_rule(plans):
+    _, plain, refined = plans
+    assert refined["kpis"]["total_towers"] < plain["kpis"]["total_towers"]
+    assert refined["kpis"]["coverage_pct"] >= 95.0
+    assert any(line.startswith("REFINE:") for line in refined["logs"])
+    assert [t["id"] for t in refined["towers"]] == [f"TWR-{i:02d}" for i in range(1, len(refined["towers"]) + 1)]
+
+
+def test_hubs_stay_and_critical_nodes_stay_covered(plans):
+    data, plain, refined = plans
+    hubs = lambda r: [(t["lat"], t["lng"]) for t in r["towers"] if t["type"] == "master_hub"]
+    assert hubs(refined) == hubs(plain)
+    for c in data.critical_nodes:
+        assert any(haversine_km(c.lat, c.lng, t["lat"], t["lng"]) <= t["range"] for t in refined["towers"])
+
+
+def test_refined_plans_repeat_for_a_seed(plans):
+    data, _, refined = plans
+    assert planning.build_plan(data.model_copy(update={"refine_ms": 500}))["towers"] == refined["towers"]
+
+
+def test_budget_is_capped_and_counted_in_evaluations():
+    assert refine.refine_budget(0) == 0
+    assert refine.refine_budget(10) == 10 * refine.EVALS_PER_MS
+    assert refine.refine_budget(10 ** 9) == refine.refine_budget(refine.REFINE_MAX_BUDGET_MS)
+    assert refine.refine_budget() == int(refine.REFINE_BUDGET_MS * refine.EVALS_PER_MS)
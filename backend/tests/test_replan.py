@@ -0,0 +1,47 @@
+import numpy as np
+
+import planning
+from conftest import tower  # noqa: F401  (shared helpers live in conftest)
+
+
+def square(lat, lng, size=0.02):
+    return [{"lat": lat, "lng": lng}, {"lat": lat + size, "lng": lng},
+            {"lat": lat + size, "lng": lng + size}, {"lat": lat, "lng": lng + size}]
+
+
+def request(polygons, critical=()):
+    return {"polygons": polygons, "critical_nodes": list(critical), "terrain_type": "valley", "seed": 4, "refine_ms": 0}
+
+
+def resampled(result):
+    line = next(l for l in result["logs"] if l.startswith("REPLAN"))
+    return int(line.split()[1])
+
+
+def first_edit(client, body):
+    plan = client.post("/calculate-plan", json=body).json()
+    state = planning.PLAN_STATES.get(plan["plan_id"])
+    assert state.blocks is not None
+    edit = {"plan_id": plan["plan_id"], "move_polygons": [{"index": 0, "polygon": square(30.001, 78.001)}]}
+    return client.post("/calculate-plan/replan", json=edit).json()
+
+
+def test_first_edit_resamples_only_the_changed_polygon(client):
+    body = request([square(30.0, 78.0), square(30.0, 78.03), square(30.03, 78.0)], [{"lat": 30.04, "lng": 78.01}])
+    assert resampled(first_edit(client, body)) == 1
+
+
+def test_first_edit_of_multi_cluster_plan(client):
+    # Far apart: planned as separate clusters, samples come back from each cluster
+    body = request([square(30.0, 78.0), square(30.5, 78.5), square(31.0, 79.0)], [{"lat": 30.51, "lng": 78.51}])
+    assert resampled(first_edit(client, body)) == 1
+
+
+def test_stored_samples_match_a_fresh_grid(client):
+    body = request([square(30.0, 78.0), square(30.0, 78.03)], [{"lat": 30.01, "lng": 78.04}])
+    plan = client.post("/calculate-plan", json=body).json()
+    data = planning.PlanningRequest(**body)
+    fresh = planning.generate_grid(data.polygons, data.critical_nodes, data.terrain_type, data.grid)
+    for stored, block in zip(planning.PLAN_STATES.get(plan["plan_id"]).blocks, fresh.blocks):
+        for a, b in zip(stored, block):
+            np.testing.assert_array_equal(a, b)
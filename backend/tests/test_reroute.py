@@ -0,0 +1,86 @@
+from conftest import tower
+
+# 0.01 deg of latitude ~ 1.11 km
+MESH = [
+    tower("TWR-01", 30.00, 78.00, kind="master_hub"),
+    tower("TWR-02", 30.02, 78.00),
+    tower("TWR-03", 30.04, 78.00),
+    tower("TWR-04", 30.02, 78.02),
+]
+
+
+def test_single_failure_always_links_nearest_in_range_neighbour(client):
+    for dead in ("TWR-01", "TWR-02"):
+        res = client.post("/reroute-network", json={"towers": MESH, "dead_node_id": dead}).json()
+        assert res["status"] == "REROUTED"
+        assert len(res["new_links"]) == 1
+        link = res["new_links"][0]
+        assert link["to_id"] == dead
+        assert link["in_range"] and link["relays"] == []
+        dead_tower = next(t for t in MESH if t["id"] == dead)
+        assert link["to"] == [dead_tower["lat"], dead_tower["lng"]]
+
+
+def test_single_failure_bridges_gap_with_relays():
+    import planning
+    from planning import RerouteRequest
+    far = [tower("H", 30.0, 78.0, kind="master_hub"), tower("A", 30.0, 78.05), tower("B", 30.0, 78.6)]
+    res = planning.reroute(RerouteRequest(towers=far, dead_node_id="B"))
+    link, = res["new_links"]
+    assert link["from_id"] == "A" and not link["in_range"]
+    assert res["drones_needed"] == len(link["relays"]) > 0
+
+
+def test_in_range_neighbour_beats_nearer_out_of_range_tower():
+    import planning
+    from planning import RerouteRequest
+    # C is nearer to the dead tower but its small disc does not reach; W overlaps it
+    towers = [tower("D", 30.0, 78.0, range_km=1.0), tower("C", 30.0, 78.025, range_km=0.2),
+              tower("W", 30.0, 77.965, range_km=3.0)]
+    res = planning.reroute(RerouteRequest(towers=towers, dead_node_id="D"))
+    assert res["new_links"][0]["from_id"] == "W"
+
+
+def test_unknown_tower(client):
+    res = client.post("/reroute-network", json={"towers": MESH, "dead_node_id": "nope"}).json()
+    assert res == {"error": "Node not found"}
+
+
+CHAIN = [tower("HUB", 30.00, 78.00, kind="master_hub")] + [tower(f"T{i}", 30.00 + 0.03 * i, 78.00) for i in range(1, 5)]
+
+
+def test_incident_failures_accumulate_per_token(client):
+    first = client.post("/reroute-network/multi", json={"towers": CHAIN, "dead_node_ids": ["T1"]}).json()
+    token = first["incident_id"]
+    assert first["failed"] == ["T1"] and first["status"] == "REROUTED"
+
+    # A second client on the same towers gets its own incident
+    other = client.post("/reroute-network/multi", json={"towers": CHAIN, "dead_node_ids": ["T3"]}).json()
+    assert other["incident_id"] != token and other["failed"] == ["T3"]
+
+    more = client.post("/reroute-network/multi", json={"incident_id": token, "dead_node_ids": ["T3"]}).json()
+    assert more["incident_id"] == token and more["failed"] == ["T1", "T3"]
+
+    reset = client.post("/reroute-network/multi", json={"incident_id": token, "dead_node_ids": [], "reset": True}).json()
+    assert reset["failed"] == [] and reset["status"] == "CONNECTED"
+
+
+def test_unknown_incident(client):
+    res = client.post("/reroute-network/multi", json={"incident_id": "missing", "dead_node_ids": ["T1"]})
+    assert res.status_code == 404
+
+
+def test_incidents_expire_and_survive_topology_eviction():
+    from connectivity import IncidentStore
+    from topology import Topology
+    store = IncidentStore(max_entries=2, ttl_sec=0)
+    token, _ = store.start(Topology(CHAIN))
+    assert store.get(token) is None   # Expired at once
+
+    store = IncidentStore(max_entries=2)
+    token, state = store.start(Topology(CHAIN))
+    state.fail(1)
+    assert store.get(token) is state and store.get(token).failed == [1]
+    store.start(Topology(CHAIN))
+    store.start(Topology(CHAIN))
+    assert store.get(token) is None   # Least recently used goes past max_entries
@@ -0,0 +1,55 @@
+import numpy as np
+
+from conftest import tower
+from simulate import BATCH_RUNS, DISASTER_TYPES, merge_results, plan_batches, simulate_batches
+
+TOWERS = [tower("HUB", 30.0, 78.0, 3.0, "master_hub")] + [tower(f"T{i}", 30.0 + 0.02 * i, 78.0 + 0.01 * i) for i in range(1, 9)]
+CRITICAL = [(30.0, 78.001), (30.08, 78.04), (30.16, 78.08)]
+REGION = [{"lat": 30.6, "lng": 78.6}, {"lat": 30.64, "lng": 78.6}, {"lat": 30.64, "lng": 78.64}, {"lat": 30.6, "lng": 78.64}]
+
+
+def body(**overrides):
+    return {"towers": TOWERS, "critical_nodes": [{"lat": a, "lng": b} for a, b in CRITICAL], "runs": 600, "seed": 8, **overrides}
+
+
+def test_results_do_not_depend_on_how_batches_are_split():
+    runs = 3 * BATCH_RUNS
+    whole = simulate_batches(TOWERS, CRITICAL, 8, [0, 1, 2], runs, DISASTER_TYPES, 2)
+    split = merge_results([simulate_batches(TOWERS, CRITICAL, 8, b, runs, DISASTER_TYPES, 2) for b in plan_batches(runs, 3)])
+    for key in whole:
+        assert np.array_equal(whole[key], split[key]), key
+    assert plan_batches(runs, 3) == [[0], [1], [2]] and plan_batches(10, 4) == [[0]]
+
+
+def test_recovery_never_loses_connectivity():
+    result = simulate_batches(TOWERS, CRITICAL, 1, [0, 1], 2 * BATCH_RUNS, DISASTER_TYPES, 2)
+    assert (result["after"] >= result["before"]).all()
+    assert (result["after"] <= len(CRITICAL)).all()
+    assert (result["towers_lost"] > 0).any()
+
+
+def test_seed_fixes_the_answer(client):
+    strip = lambda r: {k: v for k, v in r.items() if k != "elapsed_sec"}
+    first = client.post("/simulate-resilience", json=body()).json()
+    assert strip(first) == strip(client.post("/simulate-resilience", json=body()).json())
+    assert strip(first) != strip(client.post("/simulate-resilience", json=body(seed=9)).json())
+    assert first["runs"] == 600 and first["seed"] == 8 and len(first["critical_nodes"]) == 3
+    assert sum(v["scenarios"] for v in first["by_disaster"].values()) >= 600
+
+
+def test_disaster_subset(client):
+    result = client.post("/simulate-resilience", json=body(disasters=[DISASTER_TYPES[0]])).json()
+    assert list(result["by_disaster"]) == [DISASTER_TYPES[0]]
+
+
+def test_plan_id_supplies_the_critical_nodes(client):
+    plan = client.post("/calculate-plan", json={"polygons": [REGION], "critical_nodes": [{"lat": 30.62, "lng": 78.62}],
+                                                "seed": 1, "refine_ms": 0}).json()
+    result = client.post("/simulate-resilience", json={"plan_id": plan["plan_id"], "runs": 50, "seed": 1}).json()
+    assert result["towers"] == len(plan["towers"]) and len(result["critical_nodes"]) == 1
+
+
+def test_bad_requests(client):
+    assert client.post("/simulate-resilience", json=body(runs=0)).status_code == 422
+    assert client.post("/simulate-resilience", json=body(disasters=["Meteor"])).status_code == 422
+    assert client.post("/simulate-resilience", json={"towers": TOWERS, "runs": 10}).status_code == 422
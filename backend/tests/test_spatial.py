@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from distance import haversine_km
+from spatial import SpatialIndex
+
+
+@pytest.fixture(scope="module")
+def points():
+    rng = np.random.default_rng(7)
+    return rng.uniform(29.9, 30.1, 2000), rng.uniform(77.9, 78.1, 2000)
+
+
+@pytest.mark.parametrize("radius", [0.05, 0.4, 1.5, 6.0, 40.0])
+def test_query_radius_matches_brute_force(points, radius):
+    lat, lng = points
+    index = SpatialIndex(lat, lng, 1.0)
+    for qlat, qlng in [(30.0, 78.0), (29.9, 77.9), (30.13, 78.02), (25.0, 70.0)]:
+        expected = np.flatnonzero(haversine_km(qlat, qlng, lat, lng) <= radius)
+        assert np.array_equal(index.query_radius(qlat, qlng, radius), expected)
+
+
+def test_query_radius_returns_distances(points):
+    lat, lng = points
+    idx, d = SpatialIndex(lat, lng, 1.0).query_radius(30.0, 78.0, 2.0, return_dist=True)
+    assert np.allclose(d, haversine_km(30.0, 78.0, lat[idx], lng[idx]))
+    assert (d <= 2.0).all()
+
+
+def test_nearest_matches_brute_force(points):
+    lat, lng = points
+    index = SpatialIndex(lat, lng, 0.5)
+    exclude = np.zeros(len(lat), dtype=bool)
+    exclude[::3] = True
+    for qlat, qlng in [(30.0, 78.0), (30.5, 78.5), (10.0, 10.0)]:
+        d = haversine_km(qlat, qlng, lat, lng)
+        i, dist = index.nearest(qlat, qlng)
+        assert i == int(np.argmin(d)) and dist == pytest.approx(d.min())
+        i, dist = index.nearest(qlat, qlng, exclude=exclude)
+        assert i == int(np.argmin(np.where(exclude, np.inf, d)))
+
+
+def test_nearest_with_nothing_allowed():
+    index = SpatialIndex([30.0], [78.0], 1.0)
+    assert index.nearest(30.0, 78.0, exclude=[True]) == (None, float("inf"))
+    assert SpatialIndex([], [], 1.0).nearest(30.0, 78.0) == (None, float("inf"))
+
+
+def test_sum_within_matches_pairwise_counts(points):
+    lat, lng = points
+    weights = np.arange(len(lat)) % 5
+    index = SpatialIndex(lat, lng, 0.8)
+    qlat, qlng = lat[::50], lng[::50]
+    expected = [int(weights[haversine_km(a, b, lat, lng) <= 0.8].sum()) for a, b in zip(qlat, qlng)]
+    assert index.sum_within(qlat, qlng, 0.8, weights).tolist() == expected
@@ -0,0 +1,56 @@
+import numpy as np
+
+from conftest import tower
+from distance import haversine_km
+from topology import DEFAULT_RANGE_KM, Topology, TopologyStore
+
+REGION = [{"lat": 30.3, "lng": 78.3}, {"lat": 30.33, "lng": 78.3}, {"lat": 30.33, "lng": 78.33}, {"lat": 30.3, "lng": 78.33}]
+
+
+def test_adjacency_links_towers_whose_ranges_overlap():
+    rng = np.random.default_rng(1)
+    towers = [tower(f"T{i}", 30 + a, 78 + b, r) for i, (a, b, r) in
+              enumerate(zip(rng.uniform(0, 0.1, 60), rng.uniform(0, 0.1, 60), rng.uniform(0.5, 3, 60)))]
+    topo = Topology(towers)
+    for i, t in enumerate(towers):
+        d = haversine_km(t["lat"], t["lng"], topo.lat, topo.lng)
+        expected = np.flatnonzero((d <= t["range"] + topo.range) & (np.arange(len(towers)) != i))
+        assert np.array_equal(np.sort(topo.neighbors(i)), expected)
+
+
+def test_towers_without_a_range_use_the_default():
+    topo = Topology([{"id": 7, "lat": 30.0, "lng": 78.0}])
+    assert topo.ids == ["7"] and topo.range[0] == DEFAULT_RANGE_KM
+
+
+def test_nearest_skips_excluded_rows():
+    topo = Topology([tower("A", 30.0, 78.0), tower("B", 30.01, 78.0), tower("C", 30.05, 78.0)])
+    assert topo.nearest(30.0, 78.0)[0] == 0
+    assert topo.nearest(30.0, 78.0, [0])[0] == 1
+    assert topo.nearest(30.0, 78.0, [0, 1, 2]) == (None, float("inf"))
+
+
+def test_store_keeps_the_first_topology_and_evicts_lru():
+    store = TopologyStore(max_entries=2)
+    first = store.ensure("a", [tower("A", 30.0, 78.0)])
+    assert store.ensure("a", [tower("Z", 31.0, 79.0)]) is first
+    store.ensure("b", [])
+    store.get("a")
+    store.ensure("c", [])
+    assert store.get("b") is None and store.get("a") is first and len(store) == 2
+
+
+def test_calls_by_plan_id_match_calls_with_the_tower_list(client):
+    plan = client.post("/calculate-plan", json={"polygons": [REGION], "critical_nodes": [{"lat": 30.31, "lng": 78.31}],
+                                                "seed": 3, "refine_ms": 0}).json()
+    dead = plan["towers"][-1]["id"]
+    by_id = client.post("/reroute-network", json={"dead_node_id": dead, "plan_id": plan["plan_id"]}).json()
+    by_list = client.post("/reroute-network", json={"dead_node_id": dead, "towers": plan["towers"]}).json()
+    assert by_id == by_list
+    drone = client.post("/drone-deploy", json={"affected_node_id": dead, "plan_id": plan["plan_id"]}).json()
+    assert drone == client.post("/drone-deploy", json={"affected_node_id": dead, "towers": plan["towers"]}).json()
+
+
+def test_unknown_plan_and_missing_towers(client):
+    assert client.post("/reroute-network", json={"dead_node_id": "TWR-01", "plan_id": "nope"}).status_code == 404
+    assert client.post("/reroute-network", json={"dead_node_id": "TWR-01"}).status_code == 422
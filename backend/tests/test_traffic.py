@@ -0,0 +1,81 @@
+import pytest
+
+import weather
+from tables import EMERGENCY_SERVICES
+from traffic import THROTTLED_PCT, DomainMatcher, FlowTally, TrafficPolicy, classify_lines, log_host, normalize_host
+
+FLOOD = weather.SOS_POLICIES["Flash Flood Warning"]
+LANDSLIDE = weather.SOS_POLICIES["Landslide Alert"]
+
+
+@pytest.mark.parametrize("host, expected", [
+    ("example.com", "apex"), ("a.example.com", "apex"), ("deep.a.example.com", "apex"),
+    ("cdn.example.com", "cdn"), ("x.cdn.example.com", "cdn"),
+    ("img.example.com", "apex"), ("x.img.example.com", "img-subs"),
+    ("mail.delhi.gov.in", "mail-wild"), ("mail.up.gov.in", "mail-wild"), ("web.delhi.gov.in", "gov"),
+    ("mail.gov.in", "gov"), ("notexample.com", None), ("com", None),
+])
+def test_most_specific_rule_wins(host, expected):
+    matcher = DomainMatcher([("example.com", "apex"), ("cdn.example.com", "cdn"), ("*.img.example.com", "img-subs"),
+                             ("gov.in", "gov"), ("mail.*.gov.in", "mail-wild")])
+    assert matcher.match(host) == expected
+
+
+def test_fast_path_agrees_with_the_wildcard_walk():
+    rules = [("example.com", 1), ("cdn.example.com", 2), ("*.img.example.com", 3), ("gov.in", 4)]
+    plain, walked = DomainMatcher(rules), DomainMatcher(rules + [("x.*.zz", 5)])
+    assert not plain.wildcards and walked.wildcards
+    for host in ("example.com", "a.cdn.example.com", "img.example.com", "b.img.example.com", "x.gov.in", "in", "other.org"):
+        assert plain.match(host) == walked.match(host)
+
+
+def test_first_duplicate_pattern_wins():
+    assert DomainMatcher([("a.com", 1), ("a.com", 2)]).match("x.a.com") == 1
+
+
+def test_hosts_are_normalized():
+    assert normalize_host("  WWW.Example.COM.:443 ") == "www.example.com"
+    assert normalize_host("[::1]:443") == ""
+    assert log_host("10:00:01 src=1.2.3.4 sni=Video.YouTube.com:443 bytes=10") == "video.youtube.com"
+    assert log_host("api.whatsapp.com 512") == "api.whatsapp.com"
+
+
+def test_sos_policy_classes():
+    policy = TrafficPolicy(EMERGENCY_SERVICES, FLOOD)
+    assert policy.classify("ndma.gov.in") == ("critical", 100)
+    assert policy.classify("newsonair.gov.in") == ("critical", 100)     # Govt Radio is an allowed app
+    assert policy.classify("r3.googlevideo.com") == ("blocked", 0)      # YouTube is a blocked app
+    assert policy.classify("web.whatsapp.com") == ("throttled", THROTTLED_PCT)
+    assert policy.classify("news.example.org") == ("throttled", FLOOD["bandwidth_cap"])
+
+
+def test_landslide_blocks_everything_not_critical():
+    policy = TrafficPolicy(EMERGENCY_SERVICES, LANDSLIDE)
+    assert policy.classify("news.example.org") == ("blocked", 0)
+    assert policy.classify("helpline.in") == ("critical", 100)
+
+
+def test_standard_access_only_marks_critical():
+    policy = TrafficPolicy(EMERGENCY_SERVICES, weather.STANDARD_POLICY)
+    assert policy.classify_many(["YouTube.com", "sos-alert.com"]) == [("standard", 100), ("critical", 100)]
+
+
+def test_log_lines_are_tallied():
+    tally = FlowTally()
+    classify_lines(TrafficPolicy(EMERGENCY_SERVICES, FLOOD), [b"host=netflix.com", b"", "ndma.gov.in x", b"netflix.com"], tally)
+    summary = tally.summary()
+    assert summary["flows"] == 3
+    assert summary["by_class"] == {"critical": 1, "throttled": 0, "blocked": 2, "standard": 0}
+    assert summary["top_hosts"]["blocked"] == [("netflix.com", 2)]
+
+
+def test_endpoints_follow_the_village_policy(client):
+    weather.VILLAGES.clear()
+    hosts = {"hosts": ["youtube.com", "ndma.gov.in"]}
+    assert client.post("/traffic/classify", json=hosts).json()["class"] == ["standard", "critical"]
+    client.get("/weather-resilience/T-1", params={"tech_type": "fiber", "simulate": True})
+    sos = client.post("/traffic/classify", json={**hosts, "village_id": "T-1"}).json()
+    assert sos["class"] == ["blocked", "critical"] and sos["policy"] == FLOOD["status"]
+    summary = client.post("/traffic/classify/stream?village_id=T-1",
+                          content=b"sni=youtube.com\nsni=ndma.gov.in\nsni=youtube.com").json()
+    assert summary["by_class"]["blocked"] == 2 and summary["by_class"]["critical"] == 1
@@ -0,0 +1,74 @@
+import threading
+
+import weather
+from weather import VillageStates
+
+STABLE = ("condition", "severity_score", "network_policy")
+
+
+def same_reading(a, b):
+    return all(a.get(k) == b.get(k) for k in STABLE + ("impact_timestamp",))
+
+
+def test_villages_keep_their_own_state():
+    states = VillageStates()
+    sos = states.check("V-1", simulate=True)
+    normal = states.check("V-2")
+    assert sos["is_sos_triggered"] and not normal["is_sos_triggered"]
+    assert same_reading(states.check("V-1", simulate=True), sos)
+    assert not states.check("V-2", simulate=False)["is_sos_triggered"]
+
+
+def test_sos_holds_until_a_normal_poll():
+    states = VillageStates()
+    first = states.check("V-1", simulate=True)
+    for _ in range(3):
+        assert same_reading(states.check("V-1", simulate=True), first)
+    assert not states.check("V-1")["is_sos_triggered"]
+
+
+def test_normal_readings_are_reused_until_they_expire():
+    states = VillageStates()
+    first = states.check("V-1")
+    assert same_reading(states.check("V-1"), first) and states.stats()["hits"] == 1
+    expired = VillageStates(ttl_sec=0)
+    expired.check("V-1")
+    expired.check("V-1")
+    assert expired.stats()["hits"] == 0 and expired.stats()["misses"] == 2
+
+
+def test_least_recently_polled_villages_go_first():
+    states = VillageStates(max_villages=2)
+    states.check("A", simulate=True)
+    states.check("B")
+    states.check("A", simulate=True)
+    states.check("C")
+    assert len(states) == 2
+    assert states.check("A", simulate=True)["is_sos_triggered"] and states.stats()["sos_active"] == 1
+
+
+def test_concurrent_polls_agree_on_one_reading():
+    states = VillageStates()
+    seen = []
+
+    def poll():
+        for _ in range(50):
+            seen.append(states.check("V-1", simulate=True))
+    threads = [threading.Thread(target=poll) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert states.stats()["misses"] == 1
+    assert all(same_reading(r, seen[0]) for r in seen)
+
+
+def test_batch_endpoint(client):
+    weather.VILLAGES.clear()
+    body = client.post("/weather-resilience/batch", json={"village_ids": ["X-1", "X-2", "X-1"], "simulate": True}).json()
+    assert list(body["villages"]) == ["X-1", "X-2"]
+    assert all(r["is_sos_triggered"] for r in body["villages"].values())
+    single = client.get("/weather-resilience/X-1", params={"tech_type": "fiber", "simulate": True}).json()
+    assert same_reading(single, body["villages"]["X-1"])
+    too_many = {"village_ids": [f"V-{i}" for i in range(weather.MAX_BATCH_VILLAGES + 1)]}
+    assert client.post("/weather-resilience/batch", json=too_many).status_code == 422
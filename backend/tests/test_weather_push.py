@@ -0,0 +1,67 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from weather_push import WeatherHub
+
+
+class States:
+    """Stand-in for weather.VILLAGES: current() hands out whatever reading is set."""
+    def __init__(self):
+        self.reading = self.normal()
+
+    @staticmethod
+    def normal(policy="STANDARD"):
+        return {"is_sos_triggered": False, "network_policy": {"status": policy}, "impact_timestamp": None,
+                "timestamp": datetime.now().isoformat()}
+
+    @staticmethod
+    def sos(impact):
+        return {"is_sos_triggered": True, "network_policy": {"status": "SOS"}, "impact_timestamp": impact, "condition": "Flood"}
+
+    def current(self, village_id):
+        return self.reading
+
+
+def test_only_state_transitions_are_pushed():
+    async def scenario():
+        states = States()
+        hub = WeatherHub(states)
+        sub = hub.subscribe(["V-1"])
+        hub._task.cancel()
+        kinds = lambda: [e["type"] for e in sub.events]
+
+        states.reading = States.normal()          # TTL renewal, same state
+        hub.tick()
+        assert kinds() == []
+
+        states.reading = States.normal("OTHER")   # Policy change
+        hub.tick()
+        assert kinds() == ["reading"]
+        sub.events.clear()
+
+        impact = (datetime.now() + timedelta(seconds=30)).isoformat()
+        states.reading = States.sos(impact)
+        hub.tick()
+        states.reading = States.sos(impact)       # Renewed SOS, same impact
+        hub.tick()
+        assert kinds() == ["sos"]
+        sub.events.clear()
+
+        states.reading = States.normal()
+        hub.tick()
+        assert kinds() == ["clear"]
+        hub.unsubscribe(sub)
+    asyncio.run(scenario())
+
+
+def test_socket_errors_are_sequenced_and_keep_the_subscription(client):
+    with client.websocket_connect("/weather/ws") as ws:
+        ws.send_text("{not json")
+        first = ws.receive_json()
+        ws.send_json([1])
+        second = ws.receive_json()
+        ws.send_json({"subscribe": ["V-1"]})
+        snapshot = ws.receive_json()
+        assert [first["type"], second["type"], snapshot["type"]] == ["error", "error", "snapshot"]
+        assert [first["seq"], second["seq"], snapshot["seq"]] == [0, 1, 2]
+        assert snapshot["data"]["village_id"] == "V-1"
@@ -0,0 +1,108 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from distance import haversine_pairwise
+from spatial import SpatialIndex
+
+# --- TOPOLOGY CONFIG ---
+MAX_TOPOLOGIES = 256   # Plans whose tower networks are kept for reroute / drone calls
+DEFAULT_RANGE_KM = 2.5 # Range assumed for towers posted without one (the drone relay range)
+PAIR_CACHE_MAX = 1024  # Towers up to which the full tower-to-tower distance matrix is kept (8 MB)
+
+
+class Topology:
+    """
+    Tower network of one plan.
+    Towers live in parallel arrays (row i = the i-th tower of the plan) with a
+    bucket index over their positions and a CSR adjacency list: two towers are
+    neighbours when their coverage discs overlap (distance <= range_a + range_b).
+    """
+    def __init__(self, towers):
+        self.ids = [str(t["id"]) for t in towers]
+        self.row = {tid: i for i, tid in enumerate(self.ids)}
+        self.lat = np.array([t["lat"] for t in towers], dtype=np.float64)
+        self.lng = np.array([t["lng"] for t in towers], dtype=np.float64)
+        self.range = np.array([t.get("range") or DEFAULT_RANGE_KM for t in towers], dtype=np.float64)
+        self.is_hub = np.array([t.get("type") == "master_hub" for t in towers], dtype=bool)
+        max_range = float(self.range.max()) if len(self.ids) else DEFAULT_RANGE_KM
+        self.index = SpatialIndex(self.lat, self.lng, max_range)
+        self.indptr, self.indices = self._build_adjacency(max_range)
+        self._pair_km = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _build_adjacency(self, max_range):
+        indptr = [0]
+        chunks = []
+        for i in range(len(self)):
+            cand, d = self.index.query_radius(self.lat[i], self.lng[i], self.range[i] + max_range, return_dist=True)
+            keep = (d <= self.range[i] + self.range[cand]) & (cand != i)
+            chunks.append(cand[keep])
+            indptr.append(indptr[-1] + int(keep.sum()))
+        indices = np.concatenate(chunks) if chunks else np.empty(0, dtype=np.int64)
+        return np.array(indptr, dtype=np.int64), indices
+
+    def distances(self, rows, cols):
+        """Tower-to-tower km between `rows` and `cols`; small networks compute the full matrix once and reuse it."""
+        if len(self) > PAIR_CACHE_MAX:
+            return haversine_pairwise(self.lat[rows], self.lng[rows], self.lat[cols], self.lng[cols])
+        if self._pair_km is None:
+            self._pair_km = haversine_pairwise(self.lat, self.lng, self.lat, self.lng)
+        return self._pair_km[np.ix_(rows, cols)]
+
+    def neighbors(self, i):
+        return self.indices[self.indptr[i]:self.indptr[i + 1]]
+
+    def tower(self, i):
+        return {"id": self.ids[i], "lat": float(self.lat[i]), "lng": float(self.lng[i]),
+                "range": float(self.range[i]), "type": "master_hub" if self.is_hub[i] else "standard_tower"}
+
+    def nearest(self, lat, lng, exclude_rows=()):
+        """Nearest tower row to (lat, lng) outside `exclude_rows`, with its distance; (None, inf) if none."""
+        exclude = None
+        if len(exclude_rows):
+            exclude = np.zeros(len(self), dtype=bool)
+            exclude[list(exclude_rows)] = True
+        return self.index.nearest(lat, lng, exclude)
+
+
+class TopologyStore:
+    """Thread-safe LRU of plan topologies, keyed by plan id."""
+    def __init__(self, max_entries=MAX_TOPOLOGIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, plan_id):
+        with self._lock:
+            topo = self._entries.get(plan_id)
+            if topo is not None:
+                self._entries.move_to_end(plan_id)
+            return topo
+
+    def ensure(self, plan_id, towers):
+        """Return the stored topology for plan_id, building it from `towers` if missing."""
+        topo = self.get(plan_id)
+        if topo is not None:
+            return topo
+        topo = Topology(towers)
+        with self._lock:
+            self._entries[plan_id] = topo
+            self._entries.move_to_end(plan_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return topo
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "towers": sum(len(t) for t in self._entries.values()),
+            }
@@ -0,0 +1,217 @@
+import re
+
+# --- TRAFFIC CONFIG ---
+THROTTLED_PCT = 25       # Bandwidth share of the throttled list during an SOS (as in SERVICES_STATUS)
+HOST_CACHE_MAX = 1 << 16 # Classified hosts remembered per policy; relay logs repeat the same hosts heavily
+MAX_POLICIES = 32        # Compiled policies kept (one per distinct network_policy)
+MAX_JSON_HOSTS = 10000   # Hosts per JSON classify request; bigger batches go through the log stream
+TALLY_HOSTS_MAX = 10000  # Distinct hosts counted per class in a bulk summary; later ones only add to the class total
+
+# Domains behind the app names weather.py puts in a network_policy
+APP_DOMAINS = {
+    "Netflix": ["netflix.com", "nflxvideo.net", "nflximg.net"],
+    "YouTube": ["youtube.com", "googlevideo.com", "ytimg.com", "youtu.be"],
+    "Instagram": ["instagram.com", "cdninstagram.com"],
+    "Gaming": ["gaming.com"],
+    "Govt Radio": ["newsonair.gov.in", "prasarbharati.gov.in"],
+}
+
+CLASSES = ("critical", "throttled", "blocked", "standard")
+
+_HOST_FIELD = re.compile(r"(?:^|\s)(?:sni|host|server_name)=(\S+)")
+_SELF, _SUB = "\0self", "\0sub"   # Trie keys for "domain and subdomains" / "subdomains only" rules
+
+
+def normalize_host(host):
+    """Lowercase hostname without a trailing dot or :port; '' if there is none."""
+    host = host.strip().lower()
+    if host.startswith("["):
+        return ""   # IPv6 literal, never matches a domain rule
+    host = host.rsplit(":", 1)[0] if host.count(":") == 1 else host
+    return host.rstrip(".")
+
+
+def log_host(line):
+    """Hostname of one relay log line: a sni= / host= / server_name= field, else the first token."""
+    m = _HOST_FIELD.search(line)
+    if m:
+        return normalize_host(m.group(1))
+    parts = line.split(None, 1)
+    return normalize_host(parts[0]) if parts else ""
+
+
+def _better(a, b):
+    """The more specific of two compiled rules (either may be None)."""
+    if a is None:
+        return b
+    return b if b is not None and b[:3] > a[:3] else a
+
+
+class DomainMatcher:
+    """
+    Domain patterns compiled into a trie over reversed labels
+    ("ndma.gov.in" is stored as in -> gov -> ndma):
+      example.com       - the domain and every subdomain
+      *.example.com     - subdomains only
+      mail.*.gov.in     - `*` elsewhere stands for exactly one label
+    match() walks one label at a time, so the cost depends on the hostname's
+    depth, not on the number of rules. The most specific rule wins: more
+    labels first, then fewer wildcards, then the order values were added in.
+    """
+    def __init__(self, rules=()):
+        self.root = {}
+        self.wildcards = False
+        self._order = 0
+        for pattern, value in rules:
+            self.add(pattern, value)
+
+    def add(self, pattern, value):
+        labels = normalize_host(pattern).split(".")[::-1]
+        kind = _SELF
+        if labels[-1] == "*":
+            labels, kind = labels[:-1], _SUB
+        node = self.root
+        for label in labels:
+            node = node.setdefault(label, {})
+        self.wildcards |= "*" in labels
+        if kind not in node:   # First one added wins a duplicate pattern
+            node[kind] = (len(labels), -labels.count("*"), -self._order, value)
+            self._order += 1
+
+    def match(self, host):
+        """Value of the most specific rule covering `host` (already normalized), or None."""
+        labels = host.split(".")[::-1]
+        n = len(labels)
+        if not self.wildcards:
+            best, node = None, self.root
+            for i, label in enumerate(labels):
+                node = node.get(label)
+                if node is None:
+                    break
+                rule = node.get(_SELF)
+                if i < n - 1:
+                    rule = _better(rule, node.get(_SUB))
+                if rule is not None:
+                    best = rule   # Deeper rules are always more specific
+            return None if best is None else best[3]
+
+        best = None
+        stack = [(self.root, 0)]
+        while stack:
+            node, i = stack.pop()
+            if i:
+                best = _better(best, node.get(_SELF))
+                if i < n:
+                    best = _better(best, node.get(_SUB))
+            if i < n:
+                for key in (labels[i], "*"):
+                    child = node.get(key)
+                    if child is not None:
+                        stack.append((child, i + 1))
+        return None if best is None else best[3]
+
+
+class TrafficPolicy:
+    """
+    Flow classifier for one network_policy (see weather.py).
+    Under an SOS policy: critical services keep full bandwidth, the blocked
+    list and the policy's blocked apps get none, the throttled list gets
+    THROTTLED_PCT, and everything else the policy's bandwidth_cap, reported
+    as "blocked" when that cap is 0 (e.g. landslide).
+    Under standard access only critical services are told apart.
+    classify() returns (class, bandwidth %) from CLASSES.
+    """
+    def __init__(self, services, network_policy):
+        self.status = network_policy["status"]
+        self.sos = network_policy["bandwidth_cap"] < 100 or bool(network_policy["blocked_apps"])
+        rules = [(d, "critical") for d in services["critical"]]
+        rules += [(d, "critical") for app in network_policy["allowed_apps"] for d in APP_DOMAINS.get(app, ())]
+        if self.sos:
+            rules += [(d, "throttled") for d in services["throttled"]]
+            rules += [(d, "blocked") for d in services["blocked"]]
+            rules += [(d, "blocked") for app in network_policy["blocked_apps"] for d in APP_DOMAINS.get(app, ())]
+            cap = network_policy["bandwidth_cap"]
+            self.default = ("throttled", cap) if cap > 0 else ("blocked", 0)
+        else:
+            self.default = ("standard", 100)
+        share = {"critical": 100, "throttled": THROTTLED_PCT, "blocked": 0}
+        # Critical rules go in first, so they win a pattern listed twice
+        self.matcher = DomainMatcher((d, (c, share[c])) for d, c in rules)
+        self._cache = {}
+
+    def classify(self, host):
+        decision = self._cache.get(host)
+        if decision is None:
+            if len(self._cache) >= HOST_CACHE_MAX:
+                self._cache.clear()
+            decision = (self.matcher.match(host) if host else None) or self.default
+            self._cache[host] = decision
+        return decision
+
+    def classify_many(self, hosts):
+        """(class, bandwidth %) per raw hostname, in order."""
+        classify = self.classify
+        return [classify(normalize_host(h)) for h in hosts]
+
+
+class TrafficPolicies:
+    """Compiled TrafficPolicy per distinct network_policy, built on first use."""
+    def __init__(self, services, max_policies=MAX_POLICIES):
+        self.services = services
+        self.max_policies = max_policies
+        self._policies = {}
+
+    def get(self, network_policy):
+        key = (network_policy["status"], network_policy["bandwidth_cap"],
+               tuple(network_policy["allowed_apps"]), tuple(network_policy["blocked_apps"]))
+        policy = self._policies.get(key)
+        if policy is None:
+            if len(self._policies) >= self.max_policies:
+                self._policies.clear()
+            policy = self._policies[key] = TrafficPolicy(self.services, network_policy)
+        return policy
+
+
+class FlowTally:
+    """Running per-class counts (and per-class host counts) over a stream of classified flows."""
+    def __init__(self):
+        self.flows = 0
+        self.by_class = dict.fromkeys(CLASSES, 0)
+        self.hosts = {c: {} for c in CLASSES}
+
+    def add(self, host, decision):
+        cls = decision[0]
+        self.flows += 1
+        self.by_class[cls] += 1
+        counts = self.hosts[cls]
+        if host in counts:
+            counts[host] += 1
+        elif len(counts) < TALLY_HOSTS_MAX:
+            counts[host] = 1
+
+    def summary(self, top=10):
+        return {
+            "flows": self.flows,
+            "by_class": self.by_class,
+            "top_hosts": {c: sorted(h.items(), key=lambda kv: (-kv[1], kv[0]))[:top] for c, h in self.hosts.items() if h},
+        }
+
+
+def classify_lines(policy, lines, tally):
+    """Classify relay log lines (bytes or str, see log_host) into `tally`; blank lines are skipped."""
+    classify = policy.classify
+    for line in lines:
+        host = log_host(line.decode("utf-8", "replace") if isinstance(line, bytes) else line)
+        if host:
+            tally.add(host, classify(host))
+
+
+async def classify_stream(policy, chunks, tally):
+    """Feed an async stream of byte chunks through classify_lines, one complete line at a time."""
+    rest = b""
+    async for chunk in chunks:
+        lines = (rest + chunk).split(b"\n")
+        rest = lines.pop()
+        classify_lines(policy, lines, tally)
+    classify_lines(policy, [rest], tally)
+    return tally
@@ -1,71 +1,160 @@
 import random
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
 
-# Global state to prevent UI flickering
-CURRENT_STATE = None
+# --- RESILIENCE STATE CONFIG ---
+ASSESSMENT_TTL_SEC = 30   # A normal reading is served again for this long, so the UI does not flicker
+MAX_VILLAGES = 4096       # Villages tracked at once; the least recently polled go first
+MAX_BATCH_VILLAGES = 500  # Villages per bulk request
+IMPACT_LEAD_SEC = 15      # Fixed demo time: impact 15 seconds after the SOS triggers
 
-def check_resilience(village_id, tech_type, simulate=False):
-    global CURRENT_STATE
-    
-    base_conditions = ["Clear Sky", "Light Breeze", "Partly Cloudy", "Sunny", "Mist"]
-    
-    if simulate:
-        if CURRENT_STATE and CURRENT_STATE.get("is_sos_triggered"):
-            CURRENT_STATE["timestamp"] = datetime.now().strftime("%H:%M:%S")
-            return CURRENT_STATE
-
-        # --- DEMO MODE: RANDOM DISASTER SELECTION ---
-        # 1. Flash Flood (Blue)
-        # 2. Forest Fire (Red)
-        # 3. Blizzard (White)
-        # 4. Landslide (Brown)
-        disaster_options = [
-            {"type": "Flash Flood Warning", "severity": 95, "cap": 15, "color": "#3b82f6"}, 
-            {"type": "Forest Fire",         "severity": 99, "cap": 5,  "color": "#ef4444"}, 
-            {"type": "Severe Blizzard",     "severity": 88, "cap": 10, "color": "#e5e7eb"}, 
-            {"type": "Landslide Alert",     "severity": 92, "cap": 0,  "color": "#78350f"}  
-        ]
-        scenario = random.choice(disaster_options)
-        
-        # --- FIXED DEMO TIME: IMPACT IN 15 SECONDS ---
+BASE_CONDITIONS = ["Clear Sky", "Light Breeze", "Partly Cloudy", "Sunny", "Mist"]
+
+# --- DEMO MODE: RANDOM DISASTER SELECTION ---
+# 1. Flash Flood (Blue)
+# 2. Forest Fire (Red)
+# 3. Blizzard (White)
+# 4. Landslide (Brown)
+DISASTER_OPTIONS = [
+    {"type": "Flash Flood Warning", "severity": 95, "cap": 15, "color": "#3b82f6"},
+    {"type": "Forest Fire",         "severity": 99, "cap": 5,  "color": "#ef4444"},
+    {"type": "Severe Blizzard",     "severity": 88, "cap": 10, "color": "#e5e7eb"},
+    {"type": "Landslide Alert",     "severity": 92, "cap": 0,  "color": "#78350f"}
+]
+
+# Policies are shared by every reading; responses are read-only
+STANDARD_POLICY = {
+    "status": "STANDARD ACCESS",
+    "bandwidth_cap": 100,
+    "allowed_apps": ["All Services Active"],
+    "blocked_apps": []
+}
+SOS_POLICIES = {
+    s["type"]: {
+        "status": "SOS PROTOCOL: THROTTLED",
+        "bandwidth_cap": s["cap"],
+        "allowed_apps": ["Emergency Calls Only", "Govt Radio"],
+        "blocked_apps": ["Netflix", "YouTube", "Instagram", "Gaming"]
+    }
+    for s in DISASTER_OPTIONS
+}
+
+
+def sos_reading(now, rng=random):
+    scenario = rng.choice(DISASTER_OPTIONS)
+    impact_dt = now + timedelta(seconds=IMPACT_LEAD_SEC)
+    return {
+        "is_sos_triggered": True,
+        "condition": scenario["type"],
+        "severity_score": scenario["severity"],
+        "connectivity_score": 10,
+        "network_policy": SOS_POLICIES[scenario["type"]],
+        "alert_message": f"CRITICAL: {scenario['type'].upper()} IMMINENT.",
+        "impact_time_display": impact_dt.strftime("%H:%M:%S"),
+        "impact_timestamp": impact_dt.isoformat(),
+        "timestamp": now.strftime("%H:%M:%S"),
+        "visual_color": scenario["color"] # Sends color to frontend
+    }
+
+
+def normal_reading(now, rng=random):
+    return {
+        "is_sos_triggered": False,
+        "condition": rng.choice(BASE_CONDITIONS),
+        "severity_score": rng.randint(2, 10),
+        "connectivity_score": 100,
+        "network_policy": STANDARD_POLICY,
+        "alert_message": "System Normal.",
+        "timestamp": now.strftime("%H:%M:%S")
+    }
+
+
+class VillageStates:
+    """
+    Thread-safe LRU of the latest reading per village.
+    A normal reading is reused for `ttl_sec`. An SOS reading holds until the
+    village is polled without `simulate`, as the single global state did. Past
+    `max_villages`, the least recently polled villages are dropped.
+    Repeat polls get the stored reading with a fresh timestamp.
+    """
+    def __init__(self, max_villages=MAX_VILLAGES, ttl_sec=ASSESSMENT_TTL_SEC):
+        self.max_villages = max_villages
+        self.ttl_sec = ttl_sec
+        self._entries = OrderedDict()  # village_id -> (reading, expires_at monotonic; None for SOS)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def check(self, village_id, simulate=False):
+        now = datetime.now()
+        mono = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(village_id)
+            if entry is not None:
+                reading, expires = entry
+                if (reading["is_sos_triggered"] if simulate else expires is not None and mono < expires):
+                    self._entries.move_to_end(village_id)
+                    self.hits += 1
+                    return {**reading, "timestamp": now.strftime("%H:%M:%S")}
+
+            self.misses += 1
+            if simulate:
+                return self._store(village_id, sos_reading(now), None)
+            return self._store(village_id, normal_reading(now), mono + self.ttl_sec)
+
+    def current(self, village_id):
+        """
+        Reading of a watched village without a poll: a missing or expired normal
+        reading is renewed, an SOS reading is left as it is. Returns the stored
+        reading itself, so a changed reading is a different object.
+        """
         now = datetime.now()
-        impact_dt = now + timedelta(seconds=15)
-        
-        policy = {
-            "status": "SOS PROTOCOL: THROTTLED",
-            "bandwidth_cap": scenario["cap"],
-            "allowed_apps": ["Emergency Calls Only", "Govt Radio"],
-            "blocked_apps": ["Netflix", "YouTube", "Instagram", "Gaming"]
-        }
-        
-        CURRENT_STATE = {
-            "is_sos_triggered": True,
-            "condition": scenario["type"],
-            "severity_score": scenario["severity"],
-            "connectivity_score": 10,
-            "network_policy": policy,
-            "alert_message": f"CRITICAL: {scenario['type'].upper()} IMMINENT.",
-            "impact_time_display": impact_dt.strftime("%H:%M:%S"), 
-            "impact_timestamp": impact_dt.isoformat(),
-            "timestamp": now.strftime("%H:%M:%S"),
-            "visual_color": scenario["color"] # Sends color to frontend
-        }
-        return CURRENT_STATE
-
-    else:
-        CURRENT_STATE = None 
-        condition = random.choice(base_conditions)
-        return {
-            "is_sos_triggered": False,
-            "condition": condition,
-            "severity_score": random.randint(2, 10),
-            "connectivity_score": 100,
-            "network_policy": {
-                "status": "STANDARD ACCESS",
-                "bandwidth_cap": 100,
-                "allowed_apps": ["All Services Active"],
-                "blocked_apps": []
-            },
-            "alert_message": "System Normal.",
-            "timestamp": datetime.now().strftime("%H:%M:%S")
-        }
\ No newline at end of file
+        mono = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(village_id)
+            if entry is not None and (entry[1] is None or mono < entry[1]):
+                self._entries.move_to_end(village_id)
+                return entry[0]
+            return self._store(village_id, normal_reading(now), mono + self.ttl_sec)
+
+    def _store(self, village_id, reading, expires):
+        self._entries[village_id] = (reading, expires)
+        self._entries.move_to_end(village_id)
+        while len(self._entries) > self.max_villages:
+            self._entries.popitem(last=False)
+        return reading
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "villages": len(self._entries),
+                "sos_active": sum(r["is_sos_triggered"] for r, _ in self._entries.values()),
+                "max_villages": self.max_villages,
+                "ttl_sec": self.ttl_sec,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+# Shared by main.py and index.py
+VILLAGES = VillageStates()
+
+
+def check_resilience(village_id, tech_type, simulate=False):
+    return VILLAGES.check(village_id, simulate)
+
+
+def check_many(village_ids, tech_type, simulate=False):
+    """Readings for many villages at once, keyed by village id (repeated ids are read once)."""
+    return {vid: VILLAGES.check(vid, simulate) for vid in dict.fromkeys(village_ids)}
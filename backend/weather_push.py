@@ -0,0 +1,197 @@
+import asyncio
+from collections import deque
+from datetime import datetime
+
+# --- PUSH CONFIG ---
+TICK_SEC = 1.0                      # Scheduler period: readings are re-checked and countdowns advanced this often
+KEEPALIVE_SEC = 15                  # Idle connections get a ping this often (keeps proxies from closing them)
+QUEUE_MAX = 32                      # Undelivered events per connection; on overflow the backlog becomes one resync
+MAX_SUBSCRIBERS = 10000             # Open subscriptions per worker
+COUNTDOWN_MARKS = (10, 5, 3, 2, 1)  # Seconds before impact at which a countdown event goes out
+
+
+class Subscriber:
+    """
+    One push connection: the villages it watches and a bounded backlog of
+    events it has not read yet. `stale` asks the reader to send a fresh
+    snapshot instead (on subscribe, and after the backlog overflowed).
+    """
+    __slots__ = ("villages", "events", "stale", "seq", "wake")
+
+    def __init__(self):
+        self.villages = set()
+        self.events = deque()
+        self.stale = set()
+        self.seq = 0
+        self.wake = asyncio.Event()
+
+    def push(self, event):
+        if len(self.events) >= QUEUE_MAX:
+            # A slow reader resyncs from current state instead of replaying a long backlog
+            self.events.clear()
+            self.stale |= self.villages
+        else:
+            self.events.append(event)
+        self.wake.set()
+
+
+def push_state(reading):
+    """The part of a reading a push is about: SOS status, network policy and, during SOS, the impact time."""
+    sos = reading["is_sos_triggered"]
+    return sos, reading["network_policy"], reading["impact_timestamp"] if sos else None
+
+
+class Watch:
+    """Last reading of a watched village the hub has announced, with its countdown progress."""
+    __slots__ = ("reading", "impact", "marks")
+
+    def __init__(self, reading):
+        self.reading = reading
+        self.impact = None
+        self.marks = deque()
+        if reading["is_sos_triggered"]:
+            self.impact = datetime.fromisoformat(reading["impact_timestamp"])
+            left = (self.impact - datetime.now()).total_seconds()
+            self.marks.extend(m for m in COUNTDOWN_MARKS if m < left)
+            if left <= 0:
+                self.impact = None   # Impact already passed before the village was watched
+
+
+class WeatherHub:
+    """
+    Pushes state transitions of watched villages to subscribers, as events
+    {"seq", "type", "data"} where data carries the village_id.
+    One scheduler task, started with the first subscription and ended with the
+    last, reads every watched village once per TICK_SEC and fans each change
+    out to that village's subscribers:
+      sos       - SOS triggered (full reading, with its throttled network policy)
+      countdown - COUNTDOWN_MARKS seconds left before impact
+      impact    - the impact time has passed
+      clear     - SOS over, back to a normal reading and policy
+      reading   - a normal reading came back with a different network policy
+    A renewed reading whose push_state is unchanged sends nothing.
+    Connections hold no timers or loops of their own. Event-loop use only.
+    """
+    def __init__(self, states):
+        self.states = states
+        self._subs = set()
+        self._watchers = {}   # village_id -> set of Subscribers
+        self._watch = {}      # village_id -> Watch
+        self._task = None
+        self.sent = 0
+
+    def __len__(self):
+        return len(self._subs)
+
+    def subscribe(self, village_ids=()):
+        """Open a subscription; raises OverflowError past MAX_SUBSCRIBERS."""
+        if len(self._subs) >= MAX_SUBSCRIBERS:
+            raise OverflowError("too many subscribers")
+        sub = Subscriber()
+        self._subs.add(sub)
+        self.update(sub, add=village_ids)
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self.run())
+        return sub
+
+    def update(self, sub, add=(), remove=()):
+        for vid in remove:
+            if vid in sub.villages:
+                sub.villages.discard(vid)
+                sub.stale.discard(vid)
+                self._unwatch(vid, sub)
+        for vid in add:
+            if vid not in sub.villages:
+                sub.villages.add(vid)
+                sub.stale.add(vid)
+                self._watchers.setdefault(vid, set()).add(sub)
+                if vid not in self._watch:
+                    # Changes from here on are transitions, even before the next tick
+                    self._watch[vid] = Watch(self.states.current(vid))
+        sub.wake.set()
+
+    def unsubscribe(self, sub):
+        for vid in sub.villages:
+            self._unwatch(vid, sub)
+        sub.villages.clear()
+        self._subs.discard(sub)
+
+    def _unwatch(self, vid, sub):
+        watchers = self._watchers.get(vid)
+        if watchers is not None:
+            watchers.discard(sub)
+            if not watchers:
+                del self._watchers[vid]
+                self._watch.pop(vid, None)
+
+    def _emit(self, vid, kind, data):
+        event = {"type": kind, "data": {"village_id": vid, **data}}
+        for sub in self._watchers.get(vid, ()):
+            sub.push(event)
+            self.sent += 1
+
+    def tick(self):
+        """One scheduler step over every watched village."""
+        now = datetime.now()
+        for vid in list(self._watchers):
+            reading = self.states.current(vid)
+            watch = self._watch.get(vid)
+            if watch is None or (reading is not watch.reading and push_state(reading) != push_state(watch.reading)):
+                was_sos = watch is not None and watch.reading["is_sos_triggered"]
+                if watch is not None:
+                    if reading["is_sos_triggered"]:
+                        self._emit(vid, "sos", reading)
+                    else:
+                        self._emit(vid, "clear" if was_sos else "reading", reading)
+                watch = self._watch[vid] = Watch(reading)
+            if watch.impact is not None:
+                left = (watch.impact - now).total_seconds()
+                while watch.marks and left <= watch.marks[0]:
+                    self._emit(vid, "countdown", {"seconds_left": watch.marks.popleft(),
+                                                  "impact_timestamp": reading["impact_timestamp"]})
+                if left <= 0:
+                    self._emit(vid, "impact", {"condition": reading["condition"], "impact_timestamp": reading["impact_timestamp"]})
+                    watch.impact = None
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        last_ping = loop.time()
+        while self._subs:
+            self.tick()
+            if loop.time() - last_ping >= KEEPALIVE_SEC:
+                last_ping = loop.time()
+                for sub in self._subs:
+                    if not sub.events:
+                        sub.push({"type": "ping", "data": {}})
+            await asyncio.sleep(TICK_SEC)
+
+    async def follow(self, sub):
+        """
+        Events for one subscriber, numbered per connection: a snapshot (the full
+        current reading) per newly watched or resynced village, then transitions.
+        """
+        while True:
+            if sub.stale:
+                stale, sub.stale = sub.stale, set()
+                for vid in sorted(stale):
+                    yield self._numbered(sub, {"type": "snapshot", "data": {"village_id": vid, **self.states.current(vid)}})
+            while sub.events and not sub.stale:
+                yield self._numbered(sub, sub.events.popleft())
+            if not sub.events and not sub.stale:
+                sub.wake.clear()
+                await sub.wake.wait()
+
+    @staticmethod
+    def _numbered(sub, event):
+        event = {"seq": sub.seq, **event}
+        sub.seq += 1
+        return event
+
+    def stats(self):
+        return {
+            "subscribers": len(self._subs),
+            "max_subscribers": MAX_SUBSCRIBERS,
+            "villages_watched": len(self._watchers),
+            "events_sent": self.sent,
+            "scheduler_running": self._task is not None and not self._task.done(),
+        }